@@ -0,0 +1,100 @@
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+from threading import *
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+# positional file input/output used by the shared file handler
+from shared_file_handler import file_io
+
+"""
+    Contention benchmark for the file input/output of shared file handler.
+    Multiple threads (like peers) concurrently write / read random blocks of
+    the file, the positional I/O (pread/pwrite) without any lock is compared
+    against the earlier implementation which moved the shared file offset
+    (lseek followed by read/write) under a single process wide lock
+"""
+
+BLOCK_SIZE = 2 ** 14
+
+"""
+    earlier implementation of the file I/O, all operations move the shared
+    file offset hence they are serialized by the shared file lock
+"""
+class locked_file_io():
+    def __init__(self, file_path):
+        self.file_descriptor = os.open(file_path, os.O_RDWR | os.O_CREAT)
+        self.shared_file_lock = Lock()
+
+    def write(self, byte_stream, file_position):
+        with self.shared_file_lock:
+            os.lseek(self.file_descriptor, file_position, os.SEEK_SET)
+            os.write(self.file_descriptor, byte_stream)
+
+    def read(self, buffer_size, file_position):
+        with self.shared_file_lock:
+            os.lseek(self.file_descriptor, file_position, os.SEEK_SET)
+            return os.read(self.file_descriptor, buffer_size)
+
+
+"""
+    function runs the given number of threads each doing random block
+    operations on file, returns the total operations done per second
+"""
+def run_benchmark(file_handle, file_size, thread_count, operations, write_ratio):
+    blocks_count = file_size // BLOCK_SIZE
+    data_block = os.urandom(BLOCK_SIZE)
+
+    def peer_operations(seed):
+        generator = random.Random(seed)
+        for _ in range(operations):
+            file_position = generator.randrange(blocks_count) * BLOCK_SIZE
+            if generator.random() < write_ratio:
+                file_handle.write(data_block, file_position)
+            else:
+                file_handle.read(BLOCK_SIZE, file_position)
+
+    threads = [Thread(target = peer_operations, args = (i,)) for i in range(thread_count)]
+    start_time = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    time_taken = time.perf_counter() - start_time
+    return (thread_count * operations) / time_taken
+
+
+def main(options):
+    with tempfile.TemporaryDirectory(dir = options.directory) as directory:
+        file_path = os.path.join(directory, 'contention.bin')
+        file_size = options.file_size * (2 ** 20)
+        with open(file_path, 'wb') as benchmark_file:
+            benchmark_file.truncate(file_size)
+
+        implementations = [('lseek + lock', locked_file_io(file_path)),
+                           ('pread/pwrite', file_io(file_path))]
+
+        print('threads'.ljust(10) + ''.join(name.rjust(16) for name, _ in implementations) + 'speedup'.rjust(10))
+        for thread_count in options.threads:
+            results = []
+            for name, file_handle in implementations:
+                results.append(run_benchmark(file_handle, file_size, thread_count,
+                                             options.operations, options.write_ratio))
+            row  = str(thread_count).ljust(10)
+            row += ''.join((str(int(result)) + ' op/s').rjust(16) for result in results)
+            row += (str(round(results[1] / results[0], 2)) + 'x').rjust(10)
+            print(row)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='shared file handler I/O contention benchmark')
+    parser.add_argument('--file_size', type=int, default=256, help='size of benchmark file in MB')
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 2, 4, 8, 16], help='thread counts')
+    parser.add_argument('--operations', type=int, default=5000, help='block operations per thread')
+    parser.add_argument('--write_ratio', type=float, default=0.5, help='fraction of write operations')
+    parser.add_argument('--directory', default=None, help='directory for the benchmark file')
+    main(parser.parse_args())
@@ -0,0 +1,69 @@
+import asyncio
+from threading import *
+
+# torrent logger module for execution logging
+from torrent_logger import *
+
+"""
+    The asyncio engine runs a single event loop in its own thread, all the
+    peer connections of the swarm (handshake, bitfield exchange, downloading
+    and uploading) are driven as coroutines on this one event loop instead of
+    having a blocking thread for every peer connection
+"""
+class async_engine():
+
+    def __init__(self, engine_name = 'async_engine'):
+        # event loop on which all the coroutines are executed
+        self.loop = asyncio.new_event_loop()
+
+        # thread in which the event loop runs
+        self.engine_thread = Thread(target = self.run_event_loop, name = engine_name)
+        self.engine_started = False
+
+        # engine logger object
+        self.engine_logger = torrent_logger(engine_name, SWARM_LOG_FILE, DEBUG)
+
+    """
+        function runs the event loop forever untill engine is stopped
+        and then cancels all the pending coroutines on the event loop
+    """
+    def run_event_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+        # cancel all the coroutines which are still pending
+        pending_tasks = asyncio.all_tasks(self.loop)
+        for task in pending_tasks:
+            task.cancel()
+        self.loop.run_until_complete(asyncio.gather(*pending_tasks, return_exceptions=True))
+        self.loop.close()
+        self.engine_logger.log('Event loop stopped !')
+
+    """
+        starts the thread running the event loop
+    """
+    def start(self):
+        if not self.engine_started:
+            self.engine_started = True
+            self.engine_thread.start()
+
+    """
+        function schedules the coroutine on event loop from any thread
+        returns the concurrent future of the coroutine result
+    """
+    def submit(self, coroutine):
+        self.start()
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+    """
+        function runs the coroutine on event loop and blocks untill
+        the coroutine is completed, returns result of coroutine
+    """
+    def run(self, coroutine):
+        return self.submit(coroutine).result()
+
+    """
+        stops the event loop, function can be called from any thread
+    """
+    def stop(self):
+        if self.engine_started and not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self.loop.stop)
@@ -0,0 +1,507 @@
+import time
+import asyncio
+import hashlib
+from collections import deque
+
+# user defined libraries
+from peer import peer
+from torrent_error import *
+from torrent_logger import *
+from peer_wire_messages import *
+from peer_state import *
+
+"""
+    asyncio based peer connection, the peer wire protocol messages are
+    recieved by asyncio protocol on the event loop and are dispatched to
+    the message handlers of peer class. The handshake, bitfield exchange
+    and downloading FSM of peer are implemented as coroutines
+"""
+
+"""
+    peer socket implemented over asyncio transport, the class provides same
+    interface as the blocking peer socket class for sending the data
+"""
+class async_peer_socket():
+
+    def __init__(self, peer_IP, peer_port):
+        # asyncio transport for the peer connection
+        self.transport = None
+        # peer connection
+        self.peer_connection = False
+
+        self.timeout = 3
+        # timeout for the connection attempt
+        self.connect_timeout = self.timeout
+
+        # IP and port of the peer
+        self.IP         = peer_IP
+        self.port       = peer_port
+        self.unique_id  = self.IP + ' ' + str(self.port)
+
+        # logger for peer socket
+        self.socket_logger = torrent_logger(self.unique_id, SOCKET_LOG_FILE, DEBUG)
+
+        # rate limiters of data sent / recieved (None if not limited)
+        self.upload_limiter = None
+        self.download_limiter = None
+        # data waiting to be sent untill the upload limit allows
+        self.pending_writes = deque()
+        # timer handle of the delayed write (None if no write is delayed)
+        self.delayed_write = None
+
+    """
+        function sets the rate limiters of the connection, limiters which
+        do not limit any rate are not used
+    """
+    def set_rate_limiters(self, upload_limiter, download_limiter):
+        self.upload_limiter = upload_limiter if upload_limiter.limited() else None
+        self.download_limiter = download_limiter if download_limiter.limited() else None
+
+    """
+        attempts to connect the peer using TCP connection
+    """
+    async def request_connection(self, protocol_factory):
+        loop = asyncio.get_running_loop()
+        try:
+            connection = loop.create_connection(protocol_factory, self.IP, self.port)
+            await asyncio.wait_for(connection, self.connect_timeout)
+        except Exception as err:
+            self.peer_connection = False
+            connection_log = 'Socket connection failed for ' + self.unique_id + ' : '
+            self.socket_logger.log(connection_log + err.__str__())
+        return self.peer_connection
+
+    """
+        function is called by the protocol when connection is made
+    """
+    def connection_made(self, transport):
+        self.transport = transport
+        self.peer_connection = True
+
+    """
+        function helps send raw data by the transport, note that the data
+        is buffered by the transport and is sent by the event loop
+    """
+    def send_data(self, raw_data):
+        if not self.peer_connection or self.transport.is_closing():
+            return False
+        if self.upload_limiter is None:
+            self.transport.write(raw_data)
+            return True
+        # data is sent in order after the time given by the upload limit
+        self.pending_writes.append(raw_data)
+        if self.delayed_write is None:
+            self.write_pending_data()
+        return True
+
+    """
+        function writes the pending data untill upload limit is reached, the
+        rest of the data is written once the bucket debt is repaid
+    """
+    def write_pending_data(self):
+        self.delayed_write = None
+        while self.pending_writes:
+            if not self.peer_connection or self.transport.is_closing():
+                self.pending_writes.clear()
+                return
+            raw_data = self.pending_writes.popleft()
+            self.transport.write(raw_data)
+            wait_time = self.upload_limiter.reserve(len(raw_data))
+            if wait_time > 0 and self.pending_writes:
+                loop = asyncio.get_running_loop()
+                self.delayed_write = loop.call_later(wait_time, self.write_pending_data)
+                return
+
+    """
+        checks if the peer connection is active or not
+    """
+    def peer_connection_active(self):
+        return self.peer_connection
+
+    """
+        disconnects the transport
+    """
+    def disconnect(self):
+        if self.delayed_write is not None:
+            self.delayed_write.cancel()
+            self.delayed_write = None
+        self.pending_writes.clear()
+        if self.transport is not None:
+            self.transport.close()
+        self.peer_connection = False
+
+
+"""
+    asyncio protocol for the peer connection, the data from peer is recieved
+    directly in buffer of the frame reader (recv_into) and the handshake and
+    the peer wire messages are extracted from the stream of data recieved
+"""
+class async_peer_protocol(asyncio.BufferedProtocol):
+
+    def __init__(self, peer):
+        self.peer = peer
+        # buffered reader for the data recieved from peer
+        self.frame_reader = peer_frame_reader(max_message_length(peer.torrent))
+        # first message recieved from the peer is handshake
+        self.handshake_recieved = False
+        # reading is paused by the download limit or untill the data
+        # buffered by the transport is sent to the peer
+        self.limit_paused = False
+        self.writing_paused = False
+
+    def connection_made(self, transport):
+        self.peer.connection_made(transport)
+
+    def get_buffer(self, sizehint):
+        return self.frame_reader.writable_buffer(not self.handshake_recieved)
+
+    def buffer_updated(self, nbytes):
+        self.frame_reader.recieved(nbytes)
+        self.limit_download(nbytes)
+        # the handshake message is not length prefixed
+        if not self.handshake_recieved:
+            raw_handshake = self.frame_reader.extract_handshake()
+            if raw_handshake is None:
+                return
+            self.handshake_recieved = True
+            self.peer.recieved_raw_handshake(raw_handshake)
+        # dispatch all the complete messages recieved
+        try:
+            for peer_message in self.frame_reader.extract_messages():
+                self.peer.recieved_message(peer_message)
+        except torrent_error as err_msg:
+            # used for EXCECUTION LOGGING
+            recieve_log = self.peer.unique_id + ' ' + err_msg.__str__() + ' ' + FAILURE
+            self.peer.peer_logger.log(recieve_log)
+            self.peer.close_peer_connection()
+
+    def connection_lost(self, exc):
+        self.peer.connection_lost()
+
+    # stop reading requests untill the buffered data is sent to peer
+    def pause_writing(self):
+        self.writing_paused = True
+        self.update_reading()
+
+    def resume_writing(self):
+        self.writing_paused = False
+        self.update_reading()
+
+    # stop reading the data from peer untill the download limit allows
+    def limit_download(self, nbytes):
+        download_limiter = self.peer.peer_sock.download_limiter
+        if download_limiter is None:
+            return
+        wait_time = download_limiter.reserve(nbytes)
+        if wait_time > 0 and not self.limit_paused:
+            self.limit_paused = True
+            self.update_reading()
+            asyncio.get_running_loop().call_later(wait_time, self.resume_limited_download)
+
+    def resume_limited_download(self):
+        self.limit_paused = False
+        self.update_reading()
+
+    # reading is resumed only when it is not paused for any reason
+    def update_reading(self):
+        transport = self.peer.peer_sock.transport
+        if transport is None or transport.is_closing():
+            return
+        if self.limit_paused or self.writing_paused:
+            transport.pause_reading()
+        else:
+            transport.resume_reading()
+
+
+"""
+    function returns the sha1 hash of the piece, used by the hashing pool
+"""
+def piece_sha1(piece):
+    return hashlib.sha1(piece).digest()
+
+
+"""
+    peer class instance whose messages are exchanged by the asyncio event loop
+    Note that the message handlers are inherited from the peer class and the
+    functions waiting for the messages from the peer are coroutines
+"""
+class async_peer(peer):
+
+    def __init__(self, peer_IP, peer_port, torrent):
+        super().__init__(peer_IP, peer_port, torrent)
+        # raw handshake recieved from the peer
+        self.raw_handshake_response = None
+        # pool of threads hashing the pieces (None if hashed on event loop)
+        self.hashing_pool = None
+        # event set whenever message is recieved from the peer, note that
+        # asyncio event must be created by the coroutine on the event loop
+        self.message_event = None
+
+    """
+        creates the asyncio transport socket used for communicating with peer
+    """
+    def create_peer_socket(self, init_peer_socket):
+        return async_peer_socket(self.IP, self.port)
+
+    """
+        creates the event for notifying messages recieved from the peer
+    """
+    def initialize_message_event(self):
+        if self.message_event is None:
+            self.message_event = asyncio.Event()
+
+    """
+        ======================================================================
+                              ASYNCIO PROTOCOL CALLBACKS
+        ======================================================================
+    """
+
+    def connection_made(self, transport):
+        self.initialize_message_event()
+        self.peer_sock.connection_made(transport)
+        self.keep_alive_timer = time.time()
+
+    def recieved_raw_handshake(self, raw_handshake_response):
+        self.raw_handshake_response = raw_handshake_response
+        self.message_event.set()
+
+    """
+        function decodes and reacts to the peer wire message recieved
+    """
+    def recieved_message(self, peer_message):
+        # keep alive timer updated
+        self.keep_alive_timer = time.time()
+        # DECODE the peer wire message into appropriate peer wire message type type
+        decoded_message = PEER_MESSAGE_DECODER.decode(peer_message)
+        if decoded_message is None:
+            return
+        # used for EXCECUTION LOGGING
+        recieved_message_log = 'recieved message <----- ' + decoded_message.__str__()
+        self.peer_logger.log(recieved_message_log)
+        # REACT to the message accordingly
+        self.handle_message(decoded_message)
+        self.message_event.set()
+
+    def connection_lost(self):
+        self.state.set_null()
+        self.peer_sock.peer_connection = False
+        self.remove_piece_availability()
+        self.message_event.set()
+
+    """
+        ======================================================================
+                           CHOKER FUNCTIONS (RUN BY SWARM)
+        ======================================================================
+    """
+
+    def peer_interested(self):
+        return self.state.peer_interested is True
+
+    def client_choking(self):
+        return self.state.am_choking is not False
+
+    def transferred_bytes(self):
+        return (self.torrent.statistics.num_bytes_uploaded, self.torrent.statistics.num_bytes_downloaded)
+
+    def choke_peer(self):
+        if self.peer_sock.peer_connection_active():
+            self.send_choke()
+
+    def unchoke_peer(self):
+        if self.peer_sock.peer_connection_active():
+            self.send_unchoke()
+
+    """
+        function waits for any message recieved from the peer
+        returns false if no message is recieved within timeout
+    """
+    async def wait_for_message(self, timeout = None):
+        if timeout is None:
+            timeout = self.peer_sock.timeout
+        try:
+            await asyncio.wait_for(self.message_event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        self.message_event.clear()
+        return True
+
+    """
+        ======================================================================
+                            HANDSHAKE AND BITFIELD COROUTINES
+        ======================================================================
+    """
+
+    """
+        attempts to connect the peer using TCP connection
+        returns success/failure for the peer connection
+    """
+    async def send_connection(self):
+        self.initialize_message_event()
+        connection_log = 'SEND CONNECTION STATUS : ' + self.unique_id + ' '
+        protocol_factory = lambda : async_peer_protocol(self)
+        if await self.peer_sock.request_connection(protocol_factory):
+            connection_log += SUCCESS
+            connection_status = True
+        else:
+            connection_log += FAILURE
+            connection_status = False
+        self.peer_logger.log(connection_log)
+        return connection_status
+
+    """
+        coroutine initiates handshake with peer connection
+        returns success/failure result of handshake
+    """
+    async def initiate_handshake(self):
+        # only do handshake if not earlier and established TCP connection
+        if not self.handshake_flag and await self.send_connection():
+            # send handshake message
+            self.send_handshake()
+            # recieve handshake message
+            raw_handshake_response = await self.recieve_handshake(self.peer_sock.timeout)
+            if raw_handshake_response is None:
+                return False
+            # validate the hanshake message recieved obtained
+            handshake_response = self.handshake_validation(raw_handshake_response)
+            if handshake_response is None:
+                return False
+            # get the client peer id for the handshake response
+            self.peer_id = handshake_response.client_peer_id
+            self.handshake_flag = True
+            return True
+        # already attempted handshake with the peer
+        return False
+
+    """
+        coroutine waits for the hanshake message from peer
+        returns handshake recieved on success else returns None
+    """
+    async def recieve_handshake(self, timeout):
+        handshake_deadline = time.time() + timeout
+        while self.raw_handshake_response is None and self.peer_sock.peer_connection_active():
+            time_left = handshake_deadline - time.time()
+            if time_left <= 0 or not await self.wait_for_message(time_left):
+                break
+        if self.raw_handshake_response is None:
+            # used for EXCECUTION LOGGING
+            handshake_res_log = 'Handshake not recived from ' + self.unique_id
+            self.peer_logger.log(handshake_res_log)
+            return None
+        # used for EXCECUTION LOGGING
+        handshake_res_log = 'Handshake recived   <----- ' + self.unique_id
+        self.peer_logger.log(handshake_res_log)
+        return self.raw_handshake_response
+
+    """
+        coroutine waits for the bitfield and have messages send by the peer
+        immediately after handshake, returns the bitfield obtained by the peer
+    """
+    async def initialize_bitfield(self):
+        while self.peer_sock.peer_connection_active() and self.handshake_flag:
+            if len(self.bitfield_pieces) != 0:
+                break
+            if not await self.wait_for_message():
+                break
+        return self.bitfield_pieces
+
+    """
+        ======================================================================
+                                DOWNLOADING COROUTINES
+        ======================================================================
+    """
+
+    """
+        downloading finite state machine(FSM) for bittorrent client
+        the below coroutine implements the FSM for downloading piece from peer
+    """
+    async def piece_downlaod_FSM(self, piece_index):
+        # if the peer doesn't have the piece or piece is already verified
+        if not self.have_piece(piece_index) or self.piece_verified(piece_index):
+            return False
+        # initializing keep alive timer
+        self.keep_alive_timer = time.time()
+        self.selected_piece_index = piece_index
+        self.download_cancelled = False
+        # download status of piece
+        download_status = False
+        # exchanges message with
+        exchange_messages = True
+        while exchange_messages and not self.download_cancelled:
+            # checking for timeouts in states
+            if(self.check_keep_alive_timeout()):
+                self.state.set_null()
+            # client state 0    : (client = not interested, peer = choking)
+            if(self.state.downloading_state() == DSTATE0):
+                self.send_interested()
+            # client state 2    : (client = interested,     peer = not choking)
+            elif(self.state.downloading_state() == DSTATE2):
+                download_status = await self.download_piece(piece_index)
+                exchange_messages = False
+            # client state 3    : (client = None,           peer = None)
+            elif(self.state.downloading_state() == DSTATE3):
+                exchange_messages = False
+            # client state 1    : (client = interested,     peer = choking)
+            else:
+                await self.wait_for_message()
+        return download_status
+
+    """
+        coroutine downloads the given piece from the peer by pipelining
+        block requests, the blocks are recieved by piece message handler
+    """
+    async def download_piece(self, piece_index):
+        if not self.have_piece(piece_index) or not self.download_possible():
+            return False
+
+        # initialize the blocks to be downloaded for the piece
+        self.initialize_piece_download(piece_index)
+
+        # loop untill you download all the blocks in the piece
+        while self.download_possible() and not self.piece_download_complete():
+            if self.download_cancelled:
+                break
+            # requests lost by the peer are made again, checked on every
+            # message since peer may keep sending other messages
+            self.requeue_expired_requests()
+            # fill the pipeline with block requests
+            self.request_pipelined_blocks()
+            await self.wait_for_message()
+
+        if self.hashing_pool is None:
+            # validate the piece recieved from the peer
+            return self.verify_downloaded_piece(piece_index)
+
+        # sha1 hash of complete piece is computed by the pool of threads
+        # hashing the pieces, so that event loop is not blocked by hashing
+        piece_complete = self.piece_download_complete()
+        recieved_piece = self.finalize_piece_download()
+        piece_hash = None
+        if piece_complete and not self.download_cancelled:
+            loop = asyncio.get_running_loop()
+            piece_hash = await loop.run_in_executor(self.hashing_pool, piece_sha1, recieved_piece)
+        return self.verify_recieved_piece(recieved_piece, piece_index, piece_hash)
+
+    """
+        function cancels downloading of the given piece and wakes up the
+        downloading coroutine waiting for the messages from peer
+    """
+    def cancel_piece_download(self, piece_index):
+        super().cancel_piece_download(piece_index)
+        if self.message_event is not None:
+            self.message_event.set()
+
+    """
+        recieved request        : peer has requested some piece from client
+                                  the upload statistics are updated for request
+    """
+    def recieved_request(self, request_message):
+        if not super().recieved_request(request_message):
+            return
+        # torrent statistics stopping the timer
+        self.torrent.statistics.stop_time()
+        piece_index = request_message.piece_index
+        block_length = request_message.block_length
+        self.torrent.statistics.update_upload_rate(piece_index, block_length)
+        self.peer_logger.log(self.torrent.statistics.get_upload_statistics())
+        # torrent statistics starting the timer for next request
+        self.torrent.statistics.start_time()
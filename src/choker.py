@@ -0,0 +1,123 @@
+import time
+import random
+from collections import deque
+
+"""
+    Choker decides which of the interested peers are unchoked by the client,
+    hence which peers get the upload bandwidth. Every rechoke interval the
+    interested peers are ranked by their rolling transfer rate and the top
+    peers are given the upload slots, one slot is given to the optimistic
+    unchoke which is rotated every optimistic unchoke interval so that the
+    new peers get the chance to show their rate.
+
+    * downloading   : peers are ranked by the rate at which they upload to
+                      the client (tit-for-tat)
+    * seeding       : peers are ranked by the rate at which the client
+                      uploads to them, the fastest leechers are kept
+
+    Choker is run as single periodic task over all the peers of torrent, the
+    peers are expected to provide the following functions
+    * peer_interested()     : true if peer is interested in the client
+    * client_choking()      : true if client is choking the peer
+    * transferred_bytes()   : (bytes uploaded, bytes downloaded) to the peer
+    * choke_peer()          : client chokes the peer
+    * unchoke_peer()        : client unchokes the peer
+"""
+
+# time after which the peers are ranked again (seconds)
+RECHOKE_INTERVAL = 10
+# time after which the optimistic unchoke is rotated (seconds)
+OPTIMISTIC_UNCHOKE_INTERVAL = 30
+# number of peers unchoked at a time including the optimistic unchoke
+UPLOAD_SLOTS = 4
+# rate of peer is measured over the given number of rechoke intervals
+RATE_SAMPLES = 2
+
+class choker():
+
+    def __init__(self, upload_slots = UPLOAD_SLOTS, seeding = False):
+        self.upload_slots = max(1, upload_slots)
+        self.seeding = seeding
+
+        # samples of bytes transferred : peer -> deque of (time, bytes)
+        self.transfer_samples = {}
+        # peer optimistically unchoked and the time it was unchoked
+        self.optimistic_peer = None
+        self.optimistic_time = 0
+
+    """
+        function records the bytes transferred with the peers and returns
+        the rolling rate of every peer (bytes per second) used for ranking
+    """
+    def update_rates(self, peers):
+        current_time = time.monotonic()
+        peer_rates = {}
+        for peer in peers:
+            uploaded_bytes, downloaded_bytes = peer.transferred_bytes()
+            transfer_bytes = uploaded_bytes if self.seeding else downloaded_bytes
+            samples = self.transfer_samples.get(peer)
+            if samples is None:
+                samples = deque(maxlen = RATE_SAMPLES + 1)
+                self.transfer_samples[peer] = samples
+            samples.append((current_time, transfer_bytes))
+            first_time, first_bytes = samples[0]
+            if current_time > first_time:
+                peer_rates[peer] = (transfer_bytes - first_bytes) / (current_time - first_time)
+            else:
+                peer_rates[peer] = 0
+        # samples of the peers which are disconnected are removed
+        for peer in list(self.transfer_samples.keys()):
+            if peer not in peer_rates:
+                del self.transfer_samples[peer]
+        return peer_rates
+
+    """
+        function picks the optimistic unchoke among the interested peers
+        which are not unchoked for their rate, the choked peers are preferred
+    """
+    def rotate_optimistic_unchoke(self, candidate_peers):
+        choked_peers = [peer for peer in candidate_peers if peer.client_choking()]
+        candidate_peers = choked_peers or candidate_peers
+        if candidate_peers:
+            self.optimistic_peer = random.choice(candidate_peers)
+        else:
+            self.optimistic_peer = None
+        self.optimistic_time = time.monotonic()
+
+    """
+        function ranks the peers and chokes / unchokes them, returns the
+        set of peers which are unchoked after the rechoke
+    """
+    def rechoke(self, peers):
+        peers = list(peers)
+        peer_rates = self.update_rates(peers)
+        interested_peers = [peer for peer in peers if peer.peer_interested()]
+
+        # fastest interested peers are given all the slots except one
+        ranked_peers = sorted(interested_peers, key = lambda peer : peer_rates[peer], reverse = True)
+        unchoked_peers = set(ranked_peers[:self.upload_slots - 1])
+
+        # optimistic unchoke is rotated once the interval elapsed or the
+        # peer is no longer interested / unchoked for its own rate
+        candidate_peers = [peer for peer in interested_peers if peer not in unchoked_peers]
+        if (self.optimistic_peer not in candidate_peers or
+            time.monotonic() - self.optimistic_time >= OPTIMISTIC_UNCHOKE_INTERVAL):
+            self.rotate_optimistic_unchoke(candidate_peers)
+        if self.optimistic_peer is not None:
+            unchoked_peers.add(self.optimistic_peer)
+
+        for peer in peers:
+            if peer in unchoked_peers:
+                if peer.client_choking():
+                    peer.unchoke_peer()
+            elif not peer.client_choking():
+                peer.choke_peer()
+        return unchoked_peers
+
+    """
+        function returns true if the peer which just became interested can
+        be unchoked right away, i.e. not all the upload slots are used
+    """
+    def unchoke_slot_free(self, peers):
+        unchoked_count = sum(1 for peer in peers if not peer.client_choking())
+        return unchoked_count < self.upload_slots
@@ -1,4 +1,6 @@
+import os
 import sys
+from threading import Thread, Lock
 
 # torrent file hander module for reading .torrent files
 from torrent_file_handler import torrent_file_reader
@@ -12,18 +14,42 @@ from torrent import *
 # swarm module controls the operations over the multiple peers
 from swarm import swarm
 
+# tracker announcer module periodically reannounces to the tracker
+from tracker_announcer import tracker_announcer
+
 # share file handler module provides file I/O interface
 from shared_file_handler import torrent_shared_file_handler
 
+# fast resume module keeps the pieces verified across restarts
+from fast_resume import fast_resume
+
+# piece recheck module verifies the pieces of file on disk
+from piece_recheck import piece_recheck
+
+# peer cache module keeps the peers recieved from trackers across restarts
+from peer_cache import peer_cache
+
 # torrent logger module for execution logging
 from torrent_logger import *
 
+# torrent error module for handling the exception
+from torrent_error import *
+
 TORRENT_FILE_PATH = 'torrent_file_path'
 DOWNLOAD_DIR_PATH = 'download_directory_path'
 SEEDING_DIR_PATH  = 'seeding_directory_path'
 MAX_PEERS         = 'max_peers'
+MAX_CONNECTIONS   = 'max_connections'
 RATE_LIMIT        = 'rate_limit'
+PEER_RATE_LIMIT   = 'peer_rate_limit'
+UPLOAD_SLOTS      = 'upload_slots'
 AWS               = 'AWS'
+READ_CACHE        = 'read_cache'
+CACHE_POLICY      = 'cache_policy'
+STORAGE_MODE      = 'storage'
+PREALLOCATION     = 'preallocate'
+MAX_ACTIVE_TORRENTS     = 'max_active_torrents'
+MAX_SESSION_CONNECTIONS = 'max_session_connections'
 
 """
     Torrent client would help interacting with the tracker server and
@@ -33,9 +59,10 @@ AWS               = 'AWS'
 class bittorrent_client():
     """
         initialize the BTP client with torrent file and user arguments 
-        reads the torrent file and creates torrent class object
+        reads the torrent file and creates torrent class object, client
+        can be given the session whose resources are shared by torrents
     """
-    def __init__(self, user_arguments):
+    def __init__(self, user_arguments, session = None):
         # extract the torrent file path 
         torrent_file_path = user_arguments[TORRENT_FILE_PATH]
         
@@ -51,7 +78,10 @@ class bittorrent_client():
         # decide whether the user want to download or seed the torrent
         self.client_request = {'seeding' : None,               'downloading': None,
                                'uploading rate' : sys.maxsize,  'downloading rate' : sys.maxsize,
-                               'max peers' : 4, 'AWS' : False}
+                               'max peers' : 4, 'AWS' : False,  'max connections' : 30,
+                               'peer rate' : sys.maxsize,       'upload slots' : 4,
+                               'read cache size' : 0,           'read cache policy' : 'lru',
+                               'storage mode' : 'file',         'preallocation mode' : 'sparse'}
         
         # user wants to download the torrent file
         if user_arguments[DOWNLOAD_DIR_PATH]:
@@ -64,10 +94,36 @@ class bittorrent_client():
             if user_arguments[RATE_LIMIT]:
                 self.client_request['uploading rate'] = int(user_arguments[RATE_LIMIT])
         
+        # upload / download limit of every peer connection
+        if user_arguments[PEER_RATE_LIMIT]:
+            self.client_request['peer rate'] = int(user_arguments[PEER_RATE_LIMIT])
+        
+        # peers unchoked at a time by the choker
+        if user_arguments[UPLOAD_SLOTS]:
+            self.client_request['upload slots'] = int(user_arguments[UPLOAD_SLOTS])
+        
         # max peer connections 
         if user_arguments[MAX_PEERS]:
             self.client_request['max peers'] = int(user_arguments[MAX_PEERS])
         
+        # max peer connections made concurrently from candidate peers
+        if user_arguments[MAX_CONNECTIONS]:
+            self.client_request['max connections'] = int(user_arguments[MAX_CONNECTIONS])
+        
+        # read cache for the pieces uploaded (given in MB)
+        if user_arguments[READ_CACHE]:
+            self.client_request['read cache size'] = int(user_arguments[READ_CACHE]) * (2 ** 20)
+        if user_arguments[CACHE_POLICY]:
+            self.client_request['read cache policy'] = user_arguments[CACHE_POLICY]
+        
+        # storage mode of the file (positional file I/O or memory mapped)
+        if user_arguments[STORAGE_MODE]:
+            self.client_request['storage mode'] = user_arguments[STORAGE_MODE]
+        
+        # preallocation of the file before downloading
+        if user_arguments[PREALLOCATION]:
+            self.client_request['preallocation mode'] = user_arguments[PREALLOCATION]
+        
         # AWS Cloud test
         if user_arguments[AWS]:
             self.client_request['AWS'] = True
@@ -79,6 +135,24 @@ class bittorrent_client():
          
         self.bittorrent_logger.log(str(self.torrent))
         
+        # peers cached by the earlier run of client for the downloading torrent
+        self.peer_cache = None
+        if self.client_request['downloading'] != None:
+            download_file_path = self.client_request['downloading'] + self.torrent.torrent_metadata.file_name
+            self.peer_cache = peer_cache(download_file_path, self.torrent)
+        self.cached_peers_data = None
+
+        # session running the torrent with other torrents (None if not shared)
+        self.session = session
+
+        # trackers may respond after the swarm and announcer are created
+        self.trackers_lock = Lock()
+        self.trackers_contacted = False
+        self.active_tracker = None
+        self.announcer = None
+        self.swarm = None
+        # file handler of the file downloaded / seeded
+        self.file_handler = None
 
     """
         functions helps in contacting the trackers requesting for 
@@ -90,10 +164,47 @@ class bittorrent_client():
         # get list of torrent tracker object from torrent file
         self.trackers_list = torrent_tracker(self.torrent)
         
-        # get active tracker object from the list the trackers
-        self.active_tracker = self.trackers_list.request_connection()
-         
-        self.bittorrent_logger.log(str(self.active_tracker))
+        # restarted download connects the cached peers without waiting
+        # for the trackers, which are then contacted in background
+        if self.client_request['downloading'] != None and not self.client_request['AWS']:
+            self.cached_peers_data = self.peer_cache.load()
+        
+        if self.cached_peers_data:
+            self.bittorrent_logger.log('Connecting to cached peers, trackers are contacted in background ...')
+            Thread(target = self.announce_trackers, name = 'trackers', daemon = True).start()
+        else:
+            self.announce_trackers()
+
+    """
+        function announces the trackers and gives the active tracker to the
+        swarm and announcer if they are already created
+    """
+    def announce_trackers(self):
+        active_tracker = None
+        try:
+            # get active tracker object from the list the trackers
+            active_tracker = self.trackers_list.request_connection()
+            if active_tracker is not None:
+                self.bittorrent_logger.log(str(active_tracker))
+            else:
+                self.bittorrent_logger.log('No tracker responded ! ' + FAILURE)
+        finally:
+            with self.trackers_lock:
+                self.active_tracker = active_tracker
+                self.trackers_contacted = True
+                if self.announcer is not None and active_tracker is not None:
+                    self.announcer.set_tracker(active_tracker)
+                if self.swarm is not None:
+                    self.swarm.awaiting_peers(False)
+        self.save_peer_cache()
+
+    """
+        function caches the peers recieved from the trackers for restarts
+    """
+    def save_peer_cache(self):
+        if self.client_request['downloading'] == None or self.active_tracker is None:
+            return
+        self.peer_cache.save(list(self.trackers_list.peers_list), self.active_tracker.interval)
 
     """
         function initilizes swarm from the active tracker connection 
@@ -102,19 +213,36 @@ class bittorrent_client():
     def initialize_swarm(self):
         self.bittorrent_logger.log('Initializing the swarm of peers ...')
         
-        # get the peer data from the recieved from the tracker
-        peers_data = self.active_tracker.get_peers_data()
+        # get the peer data from the recieved from the tracker (or cache)
+        if self.cached_peers_data:
+            peers_data = dict(self.cached_peers_data)
+        elif self.active_tracker is not None:
+            peers_data = self.active_tracker.get_peers_data()
+        elif self.client_request['downloading'] != None:
+            raise torrent_error('No tracker responded and no cached peers, cannot download the torrent !')
+        else:
+            # seeder waits for the leechers even if no tracker responded
+            peers_data = {'interval' : None, 'peers' : [], 'seeders' : None, 'leechers' : None}
             
         if self.client_request['downloading'] != None:
 
-            # create swarm instance from the list of peers 
-            self.swarm = swarm(peers_data, self.torrent)
+            # create swarm instance from the list of peers, swarm waits for
+            # the peers while trackers have not responded
+            with self.trackers_lock:
+                self.swarm = swarm(peers_data, self.torrent)
+                if self.session is not None:
+                    self.swarm.add_session(self.session)
+                self.swarm.awaiting_peers(not self.trackers_contacted)
+            # peers from all the trackers are merged into the swarm
+            self.trackers_list.add_peers_listener(self.swarm.add_peers)
         
         if self.client_request['seeding'] != None:
             # no need for peers recieved from tracker
             peers_data['peers'] = []
             # create swarm instance for seeding 
             self.swarm = swarm(peers_data, self.torrent)
+            if self.session is not None:
+                self.swarm.add_session(self.session)
 
     
     """
@@ -124,17 +252,46 @@ class bittorrent_client():
     def seed(self):
         self.bittorrent_logger.log('Client started seeding ... ')
         
-        # download file initialization 
+        # seeding file is given by the user, in session the seeding directory
+        # is given which contains the files of all the torrents seeded
         upload_file_path = self.client_request['seeding'] 
+        if self.session is not None:
+            upload_file_path = os.path.join(upload_file_path, self.torrent.torrent_metadata.file_name)
         
         # create file handler for downloading data from peers
-        file_handler = torrent_shared_file_handler(upload_file_path, self.torrent)
+        file_handler = torrent_shared_file_handler(upload_file_path, self.torrent, self.descriptor_cache())
+        self.file_handler = file_handler
         
         # add the file handler  
         self.swarm.add_shared_file_handler(file_handler)
+
+        # verify the pieces of file, only the valid pieces are seeded
+        self.bittorrent_logger.log('Checking the pieces of file before seeding ...')
+        hashing_pool = self.session.hashing_pool if self.session is not None else None
+        seeding_pieces = piece_recheck(self.torrent, file_handler, executor = hashing_pool).verify_all_pieces()
         
-        # start seeding the file 
-        self.swarm.seed_file()
+        # start seeding the file, tracker is reannounced while seeding
+        self.start_announcer()
+        if self.session is not None:
+            # torrent is seeded by the server of session in background, the
+            # session calls stop_seeding once it is stopped
+            self.swarm.seed_file(seeding_pieces)
+            return
+        try:
+            self.swarm.seed_file(seeding_pieces)
+        finally:
+            self.announcer.stop()
+            file_handler.close()
+
+    """
+        function stops seeding the torrent seeded in background by session,
+        the trackers are announced that client has stopped. Note that file
+        is closed hence the seeding server must not serve the leechers
+    """
+    def stop_seeding(self):
+        self.swarm.stop_seeding()
+        self.announcer.stop()
+        self.file_handler.close()
 
 
     """
@@ -148,19 +305,52 @@ class bittorrent_client():
         self.bittorrent_logger.log('Initializing the file handler for peers in swarm ... ')
 
         # create file handler for downloading data from peers
-        file_handler = torrent_shared_file_handler(download_file_path, self.torrent)
+        file_handler = torrent_shared_file_handler(download_file_path, self.torrent, self.descriptor_cache())
+        self.file_handler = file_handler
+
+        # load the pieces verified in earlier download before file is modified
+        resume = fast_resume(download_file_path, self.torrent, file_handler)
+        resume_pieces = resume.load()
 
         # initialize file handler for downloading
         file_handler.initialize_for_download()
         
         # distribute file handler among all peers for reading/writing
         self.swarm.add_shared_file_handler(file_handler)
+
+        # pieces client already has are not downloaded again
+        self.swarm.add_fast_resume(resume, resume_pieces)
         
         self.bittorrent_logger.log('Client started downloading (check torrent statistics) ... ')
         
-        # lastly download the whole file
-        self.swarm.download_file() 
+        # lastly download the whole file, tracker is reannounced while downloading
+        self.start_announcer()
+        try:
+            if self.swarm.download_file():
+                self.announcer.completed()
+        finally:
+            self.announcer.stop()
+            self.save_peer_cache()
+            file_handler.close()
 
+    """
+        function returns the cache of open files shared by the torrents of
+        session, None if the client is not part of session
+    """
+    def descriptor_cache(self):
+        if self.session is None:
+            return None
+        return self.session.descriptor_cache
+
+    """
+        function starts reannouncing the responding trackers periodically,
+        the peers recieved are added in the swarm
+    """
+    def start_announcer(self):
+        with self.trackers_lock:
+            self.announcer = tracker_announcer(self.trackers_list, self.active_tracker, 
+                                               self.swarm.transfer_statistics, self.swarm.add_peers)
+        self.announcer.start()
 
 
     """
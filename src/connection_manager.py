@@ -0,0 +1,154 @@
+import asyncio
+from collections import deque
+from threading import Lock
+
+# torrent logger module for execution logging
+from torrent_logger import *
+
+# torrent error module for handling the exception
+from torrent_error import *
+
+"""
+    Connection manager keeps the peers recieved from the trackers as a pool
+    of candidate addresses, the peer objects (socket, logger, torrent copy)
+    are created only when the connection to the peer is made. The number of
+    connections made concurrently is bounded and every connect attempt fails
+    fast, the connections which are closed are replaced from the pool.
+"""
+
+# timeout for connecting the peer (seconds)
+PEER_CONNECT_TIMEOUT = 1.5
+
+"""
+    limit on the number of peer connections shared by all the torrents of
+    session (both connections made and accepted), can be used from any thread
+"""
+class connection_limit():
+
+    def __init__(self, max_connections):
+        self.max_connections = max_connections
+        # number of connections currently holding the limit
+        self.connections = 0
+        self.limit_lock = Lock()
+
+    # returns true if new connection can be made, the connection is counted
+    def acquire(self):
+        with self.limit_lock:
+            if self.connections >= self.max_connections:
+                return False
+            self.connections += 1
+            return True
+
+    # connection counted by the limit is closed
+    def release(self):
+        with self.limit_lock:
+            self.connections = max(self.connections - 1, 0)
+
+
+class connection_manager():
+
+    def __init__(self, max_connections, connect_timeout = PEER_CONNECT_TIMEOUT):
+        # maximum number of peer connections active at a time
+        self.max_connections = max_connections
+        # timeout for every connection attempt
+        self.connect_timeout = connect_timeout
+
+        # addresses of peers which are not yet connected : (IP, port)
+        self.candidate_peers = deque()
+        # all the peer addresses added to the pool, used to remove duplicates
+        self.known_peers = set([])
+
+        # active peer connections : task of peer -> peer
+        self.active_connections = dict()
+        # true while more candidates are expected (trackers not responded)
+        self.awaiting_candidates = False
+        # limit of connections shared with other torrents (None if not shared)
+        self.connection_limit = None
+
+        # connection manager logger
+        self.manager_logger = torrent_logger('connection manager', SWARM_LOG_FILE, DEBUG)
+
+    """
+        function adds the peer addresses in the candidate pool, the peers
+        already present in the pool or connected earlier are ignored
+    """
+    def add_candidates(self, peers):
+        added_peers = 0
+        for peer_address in peers:
+            peer_address = tuple(peer_address)
+            if peer_address not in self.known_peers:
+                self.known_peers.add(peer_address)
+                self.candidate_peers.append(peer_address)
+                added_peers += 1
+        return added_peers
+
+    """
+        function returns true if there are peers left to be connected
+    """
+    def has_candidates(self):
+        return len(self.candidate_peers) != 0
+
+    """
+        function returns the peers of the active connections
+    """
+    def active_peers(self):
+        return list(self.active_connections.values())
+
+    """
+        function fills the free connection slots from the candidate pool,
+        peer is created by given peer factory and is served by the task of
+        given peer worker coroutine untill the peer connection is closed
+    """
+    def fill_connection_slots(self, create_peer, peer_worker):
+        while self.candidate_peers and len(self.active_connections) < self.max_connections:
+            if self.connection_limit is not None and not self.connection_limit.acquire():
+                return
+            peer_IP, peer_port = self.candidate_peers.popleft()
+            peer = create_peer(peer_IP, peer_port)
+            peer.peer_sock.connect_timeout = self.connect_timeout
+            peer_task = asyncio.create_task(peer_worker(peer))
+            self.active_connections[peer_task] = peer
+
+    """
+        coroutine manages the peer connections untill the given condition is
+        true, returns false if all the peer connections are closed and there
+        are no more candidate peers left to be connected (nor expected)
+    """
+    async def manage_connections(self, create_peer, peer_worker, condition_satisfied):
+        while not condition_satisfied():
+            self.fill_connection_slots(create_peer, peer_worker)
+            if not self.active_connections:
+                # wait for the candidates from trackers or for the connections
+                # released by other torrents sharing the connection limit
+                if self.awaiting_candidates or self.candidate_peers:
+                    await asyncio.sleep(1)
+                    continue
+                self.manager_logger.log('No candidate peers left to be connected !')
+                return False
+            # wait for any of the peer connection to be closed
+            closed_tasks, _ = await asyncio.wait(set(self.active_connections), timeout = 1,
+                                                 return_when = asyncio.FIRST_COMPLETED)
+            for peer_task in closed_tasks:
+                peer = self.active_connections.pop(peer_task)
+                peer.close_peer_connection()
+                if self.connection_limit is not None:
+                    self.connection_limit.release()
+                if not peer_task.cancelled() and peer_task.exception() is not None:
+                    error_log = peer.unique_id + ' connection failed : ' + str(peer_task.exception())
+                    self.manager_logger.log(error_log + ' ' + FAILURE)
+                # used for EXCECUTION LOGGING
+                closed_log  = 'Connection closed ' + peer.unique_id + ', active connections : '
+                closed_log += str(len(self.active_connections)) + ', candidate peers : '
+                closed_log += str(len(self.candidate_peers))
+                self.manager_logger.log(closed_log)
+        return True
+
+    """
+        function closes all the active peer connections
+    """
+    def close_connections(self):
+        for peer in self.active_connections.values():
+            peer.close_peer_connection()
+            if self.connection_limit is not None:
+                self.connection_limit.release()
+        self.active_connections.clear()
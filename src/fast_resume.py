@@ -0,0 +1,148 @@
+import os
+import time
+from threading import *
+
+# bencodepy module for encoding / decoding the resume data
+import bencodepy
+
+# torrent logger module for execution logging
+from torrent_logger import *
+
+# torrent error module for handling the exception
+from torrent_error import *
+
+# piece recheck module for verifying the pieces on disk
+from piece_recheck import piece_recheck
+
+# bitfield of pieces verified by the client
+from piece_bitfield import piece_bitfield
+
+"""
+    Fast resume keeps the state of pieces verified by the client in a resume
+    file next to the downloading file, so that on restarting the download the
+    client only downloads the missing pieces without rehashing the whole file.
+
+    The resume file is bencoded dictionary containing
+    * info-hash     : info hash of the torrent
+    * pieces        : bitfield of pieces verified by the client
+    * files         : list of [file size, file modification time (ns)]
+
+    Resume file is written atomically (temporary file renamed over the resume
+    file) and the writes are batched over pieces verified by the client
+"""
+
+# resume file is written after given number of pieces are verified
+RESUME_SAVE_PIECES   = 64
+# resume file is written after given time from the last write (seconds)
+RESUME_SAVE_INTERVAL = 30
+
+class fast_resume():
+
+    def __init__(self, download_file_path, torrent, file_handler):
+        self.resume_file_path   = download_file_path.rstrip(os.sep) + '.resume'
+        self.torrent            = torrent
+        self.file_handler       = file_handler
+
+        # pieces verified by the client
+        self.verified_pieces = piece_bitfield(torrent.pieces_count)
+        # number of pieces verified since the last resume file write
+        self.unsaved_pieces = 0
+        # time of last resume file write
+        self.last_save_time = time.time()
+
+        # lock for synchronization of resume state
+        self.resume_lock = Lock()
+
+        # fast resume logger
+        self.resume_logger = torrent_logger('fast resume', FILE_LOG_FILE, DEBUG)
+
+    """
+        function returns the list of [file size, modification time] of
+        all the files of torrent, file not present has size of -1
+    """
+    def files_state(self):
+        files_state = []
+        for file_path in self.file_handler.storage_file_paths():
+            try:
+                file_stat = os.stat(file_path)
+                files_state.append([file_stat.st_size, file_stat.st_mtime_ns])
+            except OSError:
+                files_state.append([-1, 0])
+        return files_state
+
+    """
+        function loads the resume file and validates it against the torrent
+        and the files on disk, returns set of pieces that client already has
+    """
+    def load(self):
+        try:
+            with open(self.resume_file_path, 'rb') as resume_file:
+                resume_data = bencodepy.decode(resume_file.read())
+            info_hash       = resume_data[b'info-hash']
+            raw_bitfield    = resume_data[b'pieces']
+            saved_files     = [list(file_state) for file_state in resume_data[b'files']]
+        except (OSError, KeyError, TypeError, bencodepy.DecodingError) as err:
+            self.resume_logger.log('No valid resume file ' + self.resume_file_path + ' : ' + str(err))
+            return self.verified_pieces.copy()
+
+        # resume file must belong to the same torrent
+        if info_hash != self.torrent.torrent_metadata.info_hash:
+            self.resume_logger.log('Resume file of different torrent, ignoring resume file !')
+            return self.verified_pieces.copy()
+
+        resume_pieces = piece_bitfield.from_payload(raw_bitfield, self.torrent.pieces_count)
+        current_files = self.files_state()
+        # file sizes changed, the data on disk cannot be trusted
+        if [size for size, mtime in saved_files] != [size for size, mtime in current_files]:
+            self.resume_logger.log('File sizes changed, ignoring resume file !')
+            return self.verified_pieces.copy()
+        # files modified after the resume file is written, pieces are rehashed
+        if saved_files != current_files:
+            self.resume_logger.log('Files modified after resume, verifying resume pieces ...')
+            resume_pieces = self.verify_pieces(resume_pieces)
+
+        self.verified_pieces = resume_pieces
+        resume_log  = 'Resuming download with ' + str(len(self.verified_pieces)) + ' / '
+        resume_log += str(self.torrent.pieces_count) + ' pieces ' + SUCCESS
+        self.resume_logger.log(resume_log)
+        return self.verified_pieces.copy()
+
+    """
+        function returns the pieces whose data on disk matches the piece hash
+    """
+    def verify_pieces(self, pieces):
+        return piece_recheck(self.torrent, self.file_handler).verify_pieces(pieces)
+
+    """
+        function records the piece verified by the client, the resume file
+        is written only after batch of pieces or time interval
+    """
+    def piece_verified(self, piece_index):
+        with self.resume_lock:
+            self.verified_pieces.add(piece_index)
+            self.unsaved_pieces += 1
+            save_resume = (self.unsaved_pieces >= RESUME_SAVE_PIECES or
+                           time.time() - self.last_save_time >= RESUME_SAVE_INTERVAL)
+        if save_resume:
+            self.save()
+
+    """
+        function writes the resume file atomically, the resume data is
+        written in temporary file which is then renamed over resume file
+    """
+    def save(self):
+        with self.resume_lock:
+            resume_data = { b'info-hash' : self.torrent.torrent_metadata.info_hash,
+                            b'pieces'    : self.verified_pieces.payload(),
+                            b'files'     : self.files_state() }
+            self.unsaved_pieces = 0
+            self.last_save_time = time.time()
+        temporary_file_path = self.resume_file_path + '.tmp'
+        try:
+            with open(temporary_file_path, 'wb') as temporary_file:
+                temporary_file.write(bencodepy.encode(resume_data))
+                temporary_file.flush()
+                os.fsync(temporary_file.fileno())
+            os.replace(temporary_file_path, self.resume_file_path)
+        except OSError as err:
+            self.resume_logger.log('Resume file write failed : ' + str(err) + ' ' + FAILURE)
@@ -4,11 +4,21 @@ import argparse
 # bittorrent client module for P2P sharing
 from client import *
 
+# torrent session module for running many torrents in one process
+from torrent_session import torrent_session
+
 """
     Client bittorrent protocol implementation in python
 """
 
 def main(user_arguments):
+    
+    # many torrents given are run in single session sharing the client port
+    torrent_file_paths = user_arguments[TORRENT_FILE_PATH]
+    if len(torrent_file_paths) > 1:
+        run_session(user_arguments, torrent_file_paths)
+        return
+    user_arguments[TORRENT_FILE_PATH] = torrent_file_paths[0]
    
     # create torrent client object 
     client = bittorrent_client(user_arguments)
@@ -17,11 +27,39 @@ def main(user_arguments):
     client.contact_trackers()
     
     # initialize the swarm of peers
-    client.initialize_swarm()
+    try:
+        client.initialize_swarm()
+    except torrent_error as err_msg:
+        print('KP-Bittorrent : ' + str(err_msg))
+        sys.exit()
     
     # download the file from the swarm
     client.event_loop()
 
+"""
+    runs all the given torrents in the session, every torrent is given the
+    same user arguments (download / seeding directory, limits, etc), the
+    file of every torrent is seeded from the seeding directory by its name
+"""
+def run_session(user_arguments, torrent_file_paths):
+    session_limits = {}
+    if user_arguments[MAX_ACTIVE_TORRENTS]:
+        session_limits['max_active_torrents'] = int(user_arguments[MAX_ACTIVE_TORRENTS])
+    if user_arguments[MAX_SESSION_CONNECTIONS]:
+        session_limits['max_connections'] = int(user_arguments[MAX_SESSION_CONNECTIONS])
+    # rate limit is the global limit shared by all the torrents of session
+    if user_arguments[RATE_LIMIT]:
+        session_limits['download_rate'] = int(user_arguments[RATE_LIMIT])
+        session_limits['upload_rate'] = int(user_arguments[RATE_LIMIT])
+    session = torrent_session(**session_limits)
+    torrents_arguments = []
+    for torrent_file_path in torrent_file_paths:
+        torrent_arguments = dict(user_arguments)
+        torrent_arguments[TORRENT_FILE_PATH] = torrent_file_path
+        torrent_arguments[RATE_LIMIT] = None
+        torrents_arguments.append(torrent_arguments)
+    session.run(torrents_arguments)
+
 if __name__ == '__main__':
     bittorrent_description  = 'KP-Bittorrent Client implementation in python3'
     bittorrent_epilog  = 'Report bugs to : <https://github.com/kishanpatel22/bittorrent/issues>\n'
@@ -29,11 +67,20 @@ if __name__ == '__main__':
 
     # argument parser for bittorrent
     parser = argparse.ArgumentParser(description=bittorrent_description, epilog=bittorrent_epilog)
-    parser.add_argument(TORRENT_FILE_PATH, help='unix file path of torrent file')
+    parser.add_argument(TORRENT_FILE_PATH, nargs='+', help='unix file path of torrent file (many torrents are run in one session)')
     parser.add_argument("-d", "--" + DOWNLOAD_DIR_PATH, help="unix directory path of downloading file")
-    parser.add_argument("-s", "--" + SEEDING_DIR_PATH, help="unix directory path for the seeding file")
+    parser.add_argument("-s", "--" + SEEDING_DIR_PATH, help="unix file path of seeding file (directory of seeding files for many torrents)")
     parser.add_argument("-m", "--" + MAX_PEERS, help="maximum peers participating in upload/download of file")
-    parser.add_argument("-l", "--" + RATE_LIMIT, help="upload / download limits in Kbps")
+    parser.add_argument("--" + MAX_CONNECTIONS, help="maximum peer connections active at a time (default 30)")
+    parser.add_argument("-l", "--" + RATE_LIMIT, help="upload / download limits in Kbps (global limit of session)")
+    parser.add_argument("--" + PEER_RATE_LIMIT, help="upload / download limits of every peer connection in Kbps")
+    parser.add_argument("--" + UPLOAD_SLOTS, help="peers unchoked at a time including optimistic unchoke (default 4)")
+    parser.add_argument("-c", "--" + READ_CACHE, help="read cache size in MB for the pieces uploaded")
+    parser.add_argument("--" + CACHE_POLICY, choices=['lru', 'arc'], help="eviction policy of the read cache")
+    parser.add_argument("--" + STORAGE_MODE, choices=['file', 'mmap'], help="storage mode of the file, file I/O or memory mapped")
+    parser.add_argument("--" + PREALLOCATION, choices=['none', 'sparse', 'full'], help="preallocation of downloading file (default sparse)")
+    parser.add_argument("--" + MAX_ACTIVE_TORRENTS, help="maximum torrents active at a time in session (default 8)")
+    parser.add_argument("--" + MAX_SESSION_CONNECTIONS, help="maximum peer connections of all torrents in session (default 200)")
     parser.add_argument("-a", "--" + AWS, action="store_true", default=False, help="test download from AWS Cloud")
 
     # get the user input option after parsing the command line argument
@@ -47,10 +94,34 @@ if __name__ == '__main__':
         print("KP-Bittorrent client doesn't support more than 50 peer connection !")
         sys.exit()
     
+    if options[MAX_CONNECTIONS] and int(options[MAX_CONNECTIONS]) <= 0:
+        print("KP-Bittorrent client needs atleast one peer connection")
+        sys.exit()
+    
+    if options[MAX_ACTIVE_TORRENTS] and int(options[MAX_ACTIVE_TORRENTS]) <= 0:
+        print("KP-Bittorrent client session needs atleast one active torrent")
+        sys.exit()
+    
+    if options[MAX_SESSION_CONNECTIONS] and int(options[MAX_SESSION_CONNECTIONS]) <= 0:
+        print("KP-Bittorrent client session needs atleast one peer connection")
+        sys.exit()
+    
     if options[RATE_LIMIT] and int(options[RATE_LIMIT]) <= 0:
         print("KP-Bittorrent client upload / download rate must always greater than 0 Kbps")
         sys.exit()
     
+    if options[PEER_RATE_LIMIT] and int(options[PEER_RATE_LIMIT]) <= 0:
+        print("KP-Bittorrent client peer upload / download rate must always greater than 0 Kbps")
+        sys.exit()
+    
+    if options[UPLOAD_SLOTS] and int(options[UPLOAD_SLOTS]) <= 0:
+        print("KP-Bittorrent client needs atleast one upload slot")
+        sys.exit()
+    
+    if options[READ_CACHE] and int(options[READ_CACHE]) < 0:
+        print("KP-Bittorrent client read cache size cannot be negative")
+        sys.exit()
+    
     # call the main function
     main(options)
 
@@ -12,6 +12,8 @@ from peer_wire_messages import *
 from shared_file_handler import torrent_shared_file_handler
 from peer_socket import *
 from peer_state import *
+from peer_request_queue import peer_request_queue
+from piece_bitfield import piece_bitfield
 
 """
     peer class instance maintains the information about the peer participating
@@ -38,14 +40,38 @@ class peer():
         # maximum download block message length 
         self.max_block_length = torrent.block_length
         
+        # outstanding block requests pipelined with the peer
+        self.request_queue = peer_request_queue(self.max_block_length)
+
+        # piece currently being downloaded from the peer
+        self.download_piece_index = None
+        self.download_piece_length = 0
+        # buffer in which recieved blocks of piece are assembled
+        self.download_piece_buffer = None
+        # blocks of the piece not yet requested : list of (offset, length)
+        self.download_pending_blocks = []
+        # bytes of the piece recieved so far
+        self.download_recieved_length = 0
+        # piece download is cancelled since piece is recieved from other peer
+        self.download_cancelled = False
+        # piece selected for downloading by the downloading FSM
+        self.selected_piece_index = None
+        # blocks of piece are only assembled in buffer and written to file
+        # once piece is verified (piece is also downloaded by other peer)
+        self.download_buffered = False
+        # pieces verified by the client, shared by all the peers of swarm
+        self.pieces_downloaded = None
+
         # handshake flag with peer
         self.handshake_flag = False
         
         # bitfield representing which data file pieces peer has
-        self.bitfield_pieces = set([])
+        self.bitfield_pieces = piece_bitfield(self.torrent.pieces_count)
+        # availability index of swarm updated with the pieces peer has
+        self.piece_availability = None
         
         # peer socket for communication
-        self.peer_sock = peer_socket(self.IP, self.port, init_peer_socket)
+        self.peer_sock = self.create_peer_socket(init_peer_socket)
             
         # file handler used for reading/writing the file file
         self.file_handler = None
@@ -76,27 +102,18 @@ class peer():
 
     
     """
-        initializes the socket for seeding the torrent
+        creates the socket used for communicating with the peer
     """
-    def initialize_seeding(self):
-        # first make the socket start seeding
-        self.peer_sock.start_seeding()
-    
+    def create_peer_socket(self, init_peer_socket):
+        max_frame_length = max_message_length(self.torrent)
+        return peer_socket(self.IP, self.port, init_peer_socket, max_frame_length)
+
     """
         sets all the bitfield values
     """
     def set_bitfield(self):
-        for i in range(self.torrent.pieces_count):
-            self.bitfield_pieces.add(i)
+        self.bitfield_pieces = piece_bitfield.full(self.torrent.pieces_count)
 
-    """
-        function attempts to recieve any external TCP connection
-        returns the connection socket and address if connection 
-        if recieved else returns None
-    """
-    def recieve_connection(self):
-        return self.peer_sock.accept_connection()
-    
     """
         attempts to connect the peer using TCP connection 
         returns success/failure for the peer connection
@@ -122,6 +139,7 @@ class peer():
     def close_peer_connection(self):
         self.state.set_null()
         self.peer_sock.disconnect()
+        self.remove_piece_availability()
 
     """
         function helps in recieving data from peers
@@ -153,46 +171,25 @@ class peer():
 
     """
         functions helpes in recieving peer wire protocol messages. Note that 
-        function uses low level function to recieve data and creates peer
-        wire message class object as return value is no had no error and also
-        only one message is recieved by the given function at any time.
+        function uses buffered frame reader of socket to recieve data and 
+        creates peer wire message class object as return value is no had no
+        error and also only one message is recieved by the function at any time.
     """
     def recieve_message(self):
-        # extract the peer wire message information by receiving chunks of data
-        # recieve the message length 
-        raw_message_length = self.recieve(MESSAGE_LENGTH_SIZE)
-        if raw_message_length is None or len(raw_message_length) < MESSAGE_LENGTH_SIZE:
-            return None
-
-        # unpack the message length which is 4 bytes long
-        message_length = struct.unpack_from("!I", raw_message_length)[0]
-        # keep alive messages have no message ID and payload
-        if message_length == 0:
-            return peer_wire_message(message_length, None, None)
-
-        # attempt to recieve the message ID from message
-        raw_message_ID =  self.recieve(MESSAGE_ID_SIZE)
-        if raw_message_ID is None:
+        try:
+            peer_message = self.peer_sock.recieve_message()
+        except torrent_error as err_msg:
+            # used for EXCECUTION LOGGING
+            recieve_log = self.unique_id + ' ' + err_msg.__str__() + ' ' + FAILURE
+            self.peer_logger.log(recieve_log)
+            self.close_peer_connection()
             return None
-        
-        # unpack the message length which is 4 bytes long
-        message_id  = struct.unpack_from("!B", raw_message_ID)[0]
-        # messages having no payload 
-        if message_length == 1:
-            return peer_wire_message(message_length, message_id, None)
-       
-        # extract all the payload
-        payload_length = message_length - 1
-        
-        # extract the message payload 
-        message_payload = self.recieve(payload_length)
-        if message_payload is None:
+        if peer_message is None:
             return None
-        
         # keep alive timer updated 
         self.keep_alive_timer = time.time()
-        # return peer wire message object given the three parameters
-        return peer_wire_message(message_length, message_id, message_payload)
+        # return peer wire message object 
+        return peer_message
  
     """
         functions helps in initiating handshake with peer connection
@@ -219,35 +216,6 @@ class peer():
         # already attempted handshake with the peer
         return False
 
-    """
-        function helps in responding to incoming handshakes
-    """
-    def respond_handshake(self):
-        # if handshake already done then return True
-        if self.handshake_flag:
-            return True
-        # keep alive timer
-        self.keep_alive_timer = time.time()
-        # check if you recieve any handshake message from the peer
-        while not self.check_keep_alive_timeout():
-            raw_handshake_response = self.recieve_handshake()
-            if raw_handshake_response is not None:
-                break
-        # case where timeout occured and couldn't recieved message
-        if raw_handshake_response is None:
-            return False
-        # validate the hanshake message response
-        handshake_response = self.handshake_validation(raw_handshake_response)
-        if handshake_response is None:
-            return False 
-        # extract the peer id
-        self.peer_id = handshake_response.client_peer_id
-        # send handshake message after validation 
-        self.send_handshake()
-        self.handshake_flag = True
-        # handshake done successfully
-        return True
-
     """
         the function helps in building the handshake message
     """
@@ -371,7 +339,13 @@ class peer():
             return None
 
         # DECODE the peer wire message into appropriate peer wire message type type
-        decoded_message = PEER_MESSAGE_DECODER.decode(peer_response_message)
+        try:
+            decoded_message = PEER_MESSAGE_DECODER.decode(peer_response_message)
+        except torrent_error as err_msg:
+            # used for EXCECUTION LOGGING
+            self.peer_logger.log(self.unique_id + ' ' + err_msg.__str__() + ' ' + FAILURE)
+            self.close_peer_connection()
+            return None
         if decoded_message is None:
             return None
 
@@ -451,21 +425,38 @@ class peer():
     """
     def recieved_bitfield(self, bitfield_message):
         # extract the bitfield piece information from the message
-        self.bitfield_pieces = bitfield_message.extract_pieces()
+        bitfield_pieces = bitfield_message.extract_pieces(self.torrent.pieces_count)
+        # update the availability of pieces in swarm
+        if self.piece_availability is not None:
+            self.piece_availability.remove_bitfield(self.bitfield_pieces)
+            self.piece_availability.add_bitfield(bitfield_pieces)
+        self.bitfield_pieces = bitfield_pieces
 
 
     """
         recieved have           : peer sends information of piece that it has
     """
     def recieved_have(self, have_message):
+        piece_index = have_message.piece_index
+        if piece_index >= self.torrent.pieces_count or piece_index in self.bitfield_pieces:
+            return
         # update the piece information in the peer bitfiled 
-        self.bitfield_pieces.add(have_message.piece_index) 
+        self.bitfield_pieces.add(piece_index)
+        # update the availability of piece in swarm
+        if self.piece_availability is not None:
+            self.piece_availability.add_piece(piece_index)
     
         
     """
         recieved request        : peer has requested some piece from client
+                                  returns true if the block is sent to peer
     """
     def recieved_request(self, request_message):
+        # requests of the peer choked by the client are dropped
+        if self.state.am_choking:
+            request_log = self.unique_id + ' dropping request since peer is choked !'
+            self.peer_logger.log(request_log)
+            return False
         # extract block requested
         piece_index     = request_message.piece_index
         block_offset    = request_message.block_offset
@@ -477,24 +468,55 @@ class peer():
             # create response piece message and send it the peer
             response_message = piece(piece_index, block_offset, data_block)
             self.send_message(response_message)
+            return True
         else:
             request_log = self.unique_id + ' dropping request since invalid block requested !' 
             self.peer_logger.log(request_log)
+            return False
 
     """
         recieved piece          : peer has responed with the piece to client
-                                  after recieving any piece, it is written into file
+                                  block is matched with the outstanding request
+                                  and after matching it is written into file
     """
     def recieved_piece(self, piece_message):
-        # write the block of piece into the file
-        self.file_handler.write_block(piece_message) 
+        piece_index     = piece_message.piece_index
+        block_offset    = piece_message.block_offset
+        block_length    = len(piece_message.block)
+        # match the piece message with the outstanding block request
+        block_request = self.request_queue.complete_request(piece_index, block_offset, block_length)
+        if block_request is None:
+            piece_log = self.unique_id + ' dropping block not requested by client !'
+            self.peer_logger.log(piece_log)
+            return
+        # write the block of piece into the file, blocks of piece verified
+        # from other peer must not overwrite the piece in file and blocks
+        # of buffered piece are written once piece is verified
+        if not self.download_buffered and not self.piece_verified(piece_index):
+            self.file_handler.write_block(piece_message) 
+        # assemble the block in the piece being downloaded
+        if piece_index == self.download_piece_index:
+            # blocks written in mapped file need not be assembled in buffer
+            if self.download_piece_buffer is not None:
+                block_end = block_offset + block_length
+                self.download_piece_buffer[block_offset : block_end] = piece_message.block
+            self.download_recieved_length += block_length
+        # update the torrent statistics for downloading
+        self.torrent.statistics.update_start_time(block_request.request_time)
+        self.torrent.statistics.stop_time()
+        self.torrent.statistics.update_download_rate(piece_index, block_length)
      
     """ 
         recieved cancel         : message to cancel a block request from client
+                                  note that the piece messages are written to
+                                  the peer as soon as requested, hence there
+                                  is no queued response to be dropped
     """
     def recieved_cancel(self, cancel_message):
-        # TODO : implementation coming soon
-        pass
+        cancel_log  = self.unique_id + ' cancelled request for piece : '
+        cancel_log += str(cancel_message.piece_index) + ' block offset : '
+        cancel_log += str(cancel_message.block_offset)
+        self.peer_logger.log(cancel_log)
 
     """ 
         recieved port           : 
@@ -559,8 +581,8 @@ class peer():
         send bitfield           : client sends the bitfield message of pieces
     """
     def send_bitfield(self):
-        bitfield_payload = create_bitfield_message(self.bitfield_pieces, self.torrent.pieces_count)
-        self.send_message(bitfield(bitfield_payload))
+        bitfield_message = create_bitfield_message(self.bitfield_pieces, self.torrent.pieces_count)
+        self.send_message(bitfield_message)
     
     
     """
@@ -568,6 +590,12 @@ class peer():
     """
     def send_request(self, piece_index, block_offset, block_length):
         self.send_message(request(piece_index, block_offset, block_length))
+
+    """
+        send cancel             : client cancels the block requested from peer
+    """
+    def send_cancel(self, piece_index, block_offset, block_length):
+        self.send_message(cancel(piece_index, block_offset, block_length))
     
 
     """
@@ -582,31 +610,33 @@ class peer():
         the below function implements the FSM for downloading piece from peer
     """
     def piece_downlaod_FSM(self, piece_index):
-        # if the peer doesn't have the piece
-        if not self.have_piece(piece_index):
+        # if the peer doesn't have the piece or piece is already verified
+        if not self.have_piece(piece_index) or self.piece_verified(piece_index):
             return False
         # initializing keep alive timer
         self.keep_alive_timer = time.time()
+        self.selected_piece_index = piece_index
+        self.download_cancelled = False
         # download status of piece
         download_status = False
         # exchanges message with 
         exchange_messages = True
-        while exchange_messages:
+        while exchange_messages and not self.download_cancelled:
             # checking for timeouts in states 
             if(self.check_keep_alive_timeout()):
                 self.state.set_null()
             # client state 0    : (client = not interested, peer = choking)
-            if(self.state == DSTATE0):
+            if(self.state.downloading_state() == DSTATE0):
                 self.send_interested()
             # client state 1    : (client = interested,     peer = choking)
-            elif(self.state == DSTATE1):
+            elif(self.state.downloading_state() == DSTATE1):
                 response_message = self.handle_response()
             # client state 2    : (client = interested,     peer = not choking)
-            elif(self.state == DSTATE2):
+            elif(self.state.downloading_state() == DSTATE2):
                 download_status = self.download_piece(piece_index)
                 exchange_messages = False
             # client state 3    : (client = None,           peer = None)
-            elif(self.state == DSTATE3):
+            elif(self.state.downloading_state() == DSTATE3):
                 exchange_messages = False
         return download_status
 
@@ -615,42 +645,90 @@ class peer():
         function helps in downloading the given piece from the peer
         function returns success/failure depending upon that piece is 
         downloaed successfully and validated successfully
+        Note : block requests are pipelined, the request queue of peer
+        keeps sending requests untill its depth is filled and responses 
+        are matched with requests by the recieved piece message handler
     """
     def download_piece(self, piece_index):
         if not self.have_piece(piece_index) or not self.download_possible():
             return False
 
-        # recieved piece data from the peer
-        recieved_piece = b''  
-        # block offset for downloading the piece
-        block_offset = 0
-        # block length 
-        block_length = 0
-        # piece length for torrent 
-        piece_length = self.torrent.get_piece_length(piece_index)
+        # initialize the blocks to be downloaded for the piece
+        self.initialize_piece_download(piece_index)
         
         # loop untill you download all the blocks in the piece
-        while self.download_possible() and block_offset < piece_length:
-            # find out how much max length of block that can be requested
-            if piece_length - block_offset >= self.max_block_length:
-                block_length = self.max_block_length
-            else:
-                block_length = piece_length - block_offset
-            
-            block_data = self.download_block(piece_index, block_offset, block_length)
-            if block_data:
-                # increament offset according to size of data block recieved
-                recieved_piece += block_data
-                block_offset   += block_length
+        while self.download_possible() and not self.piece_download_complete():
+            if self.download_cancelled:
+                break
+            # requests lost by the peer are made again, checked on every
+            # message since peer may keep sending other messages
+            self.requeue_expired_requests()
+            # fill the pipeline with block requests
+            self.request_pipelined_blocks()
+            # recieve response message and handle the response
+            self.handle_response()
         
+        # validate the piece recieved from the peer
+        return self.verify_downloaded_piece(piece_index)
+
+    """
+        function initializes the piece buffer and the list of blocks
+        of the given piece which needs to be requested from peer
+    """
+    def initialize_piece_download(self, piece_index):
+        # piece length for torrent 
+        piece_length = self.torrent.get_piece_length(piece_index)
+        
+        self.download_piece_index       = piece_index
+        self.download_piece_length      = piece_length
+        self.download_recieved_length   = 0
+        # piece is read directly from memory mapped file once downloaded
+        if self.file_handler.storage_mapped() and not self.download_buffered:
+            self.download_piece_buffer  = None
+        else:
+            self.download_piece_buffer  = bytearray(piece_length)
+        self.download_pending_blocks    = []
+
+        # divide the piece into blocks of max block length
+        for block_offset in range(0, piece_length, self.max_block_length):
+            block_length = min(self.max_block_length, piece_length - block_offset)
+            self.download_pending_blocks.append((block_offset, block_length))
+        # blocks are requested in order of block offset
+        self.download_pending_blocks.reverse()
+
+    """
+        function stops downloading the piece and validates the piece recieved
+        function returns true if piece recieved is downloaded successfully
+    """
+    def verify_downloaded_piece(self, piece_index):
+        # extract the piece recieved and stop downloading the piece
+        recieved_piece = self.finalize_piece_download()
+        return self.verify_recieved_piece(recieved_piece, piece_index)
+
+    """
+        function validates the piece recieved from the peer, the sha1 hash of
+        piece can be given if it is already computed
+    """
+    def verify_recieved_piece(self, recieved_piece, piece_index, piece_hash = None):
+        # piece was recieved from other peer in endgame mode
+        if self.download_cancelled:
+            return False
+
         # check for connection timeout
         if self.check_keep_alive_timeout():
             return False
         
         # validate the piece and update the peer downloaded bitfield
-        if(not self.validate_piece(recieved_piece, piece_index)):
+        if(not self.validate_piece(recieved_piece, piece_index, piece_hash)):
             return False
         
+        # buffered piece is written into the file once it is verified
+        if self.download_buffered:
+            self.file_handler.write_blocks(piece_index, 0, [recieved_piece])
+
+        # write the piece recieved from page cache to the disk
+        self.file_handler.flush_piece(piece_index)
+        
         # used for EXCECUTION LOGGING
         download_log  = self.unique_id + ' downloaded piece : '
         download_log += str(piece_index) + ' ' + SUCCESS  
@@ -659,37 +737,76 @@ class peer():
         # successfully downloaded and validated piece 
         return True
 
+    """
+        function returns true if all the blocks of piece are recieved
+    """
+    def piece_download_complete(self):
+        return self.download_recieved_length == self.download_piece_length
+
+    """
+        function sends the block requests for the piece untill the 
+        request queue of peer is filled according to its depth
+    """
+    def request_pipelined_blocks(self):
+        while self.download_pending_blocks and self.request_queue.can_request():
+            block_offset, block_length = self.download_pending_blocks.pop()
+            self.download_block(self.download_piece_index, block_offset, block_length)
+
+    """
+        function moves the requests not responded by the peer within 
+        timeout back into list of blocks pending to be requested 
+    """
+    def requeue_expired_requests(self):
+        for block_request in self.request_queue.expire_requests():
+            if block_request.piece_index == self.download_piece_index:
+                block = (block_request.block_offset, block_request.block_length)
+                self.download_pending_blocks.append(block)
+
+    """
+        function cancels downloading of the given piece, the outstanding
+        requests of piece are cancelled by sending cancel messages to peer.
+        used in endgame mode once the piece is recieved from other peer
+    """
+    def cancel_piece_download(self, piece_index):
+        # peer not yet downloading the piece checks the verified pieces
+        # once it starts downloading the piece
+        if self.selected_piece_index != piece_index:
+            return
+        self.download_cancelled = True
+        if self.download_piece_index != piece_index:
+            return
+        self.download_pending_blocks = []
+        for block_request in self.request_queue.cancel_requests(piece_index):
+            self.send_cancel(piece_index, block_request.block_offset, block_request.block_length)
+
+    """
+        function stops downloading the current piece and drops all 
+        outstanding requests, returns the bytes recieved of the piece
+    """
+    def finalize_piece_download(self):
+        if self.download_piece_buffer is None:
+            recieved_piece = self.file_handler.read_piece(self.download_piece_index)
+        else:
+            recieved_piece = self.download_piece_buffer
+        self.request_queue.clear()
+        self.download_piece_index       = None
+        self.download_piece_buffer      = None
+        self.download_pending_blocks    = []
+        self.download_recieved_length   = 0
+        return recieved_piece
     
     """
-        function helps in downlaoding given block of the piece from peer
-        function returns block of data if requested block is successfully 
-        downloaded else returns None 
+        function helps in requesting given block of the piece from peer
+        the request made is added into the outstanding request queue 
+        and the block is recieved by the piece message handler
     """
     def download_block(self, piece_index, block_offset, block_length):
         # create a request message for given piece index and block offset
         request_message = request(piece_index, block_offset, block_length)
+        # add the request in outstanding requests
+        self.request_queue.add_request(piece_index, block_offset, block_length)
         # send request message to peer
         self.send_message(request_message)
-        
-        # torrent statistics starting the timer
-        self.torrent.statistics.start_time()
-        # recieve response message and handle the response
-        response_message = self.handle_response()
-        # torrent statistics stopping the timer
-        self.torrent.statistics.stop_time()
-        
-        # if the message recieved was a piece message
-        if not response_message or response_message.message_id != PIECE:
-            return None
-        # validate if correct response is recieved for the piece message
-        if not self.validate_request_piece_messages(request_message, response_message):
-            return None
-
-        # update the torrent statistics for downloading
-        self.torrent.statistics.update_download_rate(piece_index, block_length)
-
-        # successfully downloaded and validated block of piece
-        return response_message.block
 
     """ 
         piece can be only downloaded only upon given conditions
@@ -707,13 +824,34 @@ class peer():
         if not self.handshake_flag:
             return False
         # finally check if peer is interested and peer is not choking
-        if self.state != DSTATE2:
+        if self.state.downloading_state() != DSTATE2:
             return False
         if self.check_keep_alive_timeout():
             return False
         # all conditions satisfied 
         return True
 
+    """
+        function adds the availability index of swarm which is updated with
+        the pieces peer has untill the peer is disconnected
+    """
+    def add_piece_availability(self, piece_availability):
+        self.piece_availability = piece_availability
+
+    """
+        function removes the pieces of disconnected peer from availability index
+    """
+    def remove_piece_availability(self):
+        if self.piece_availability is not None:
+            self.piece_availability.remove_bitfield(self.bitfield_pieces)
+            self.piece_availability = None
+
+    """
+        function returns the bitfield of pieces peer has which client needs
+    """
+    def interesting_pieces(self, downloaded_pieces):
+        return self.bitfield_pieces - downloaded_pieces
+
     """
         function returns true or false depending upon peer has piece or not
     """
@@ -731,24 +869,12 @@ class peer():
         self.file_handler = file_handler
     
 
-    """
-        function validates if correct block was recieved from peer for the request
-    """
-    def validate_request_piece_messages(self, request, piece):
-        if request.piece_index != piece.piece_index:
-            return False
-        if request.block_offset != piece.block_offset:
-            return False
-        if request.block_length != len(piece.block):
-            return False
-        return True
-
     """
         function validates piece recieved and given the piece index.
         validation is comparing the sha1 hash of the recieved piece 
         with the torrent file pieces value at particular index.
     """
-    def validate_piece(self, piece, piece_index):
+    def validate_piece(self, piece, piece_index, piece_hash = None):
         # compare the length of the piece recieved
         piece_length = self.torrent.get_piece_length(piece_index)
         if (len(piece) != piece_length):
@@ -760,7 +886,8 @@ class peer():
             self.peer_logger.log(download_log)
             return False
 
-        piece_hash = hashlib.sha1(piece).digest()
+        if piece_hash is None:
+            piece_hash = hashlib.sha1(piece).digest()
         index = piece_index * 20
         torrent_piece_hash = self.torrent.torrent_metadata.pieces[index : index + 20]
         
@@ -776,87 +903,11 @@ class peer():
         return True
     
     """
-        function does initial handshake and immediately sends bitfields to peer
-    """
-    def initial_seeding_messages(self):
-        if not self.respond_handshake():
-            return False
-        # after handshake immediately send the bitfield response
-        bitfield = create_bitfield_message(self.bitfield_pieces, self.torrent.pieces_count)
-        self.send_message(bitfield)
-        return True
-    
-    """
-        uploading finite state machine(FSM) for bittorrent client (seeding)
-        the below function implements the FSM for uploading pieces to peer
+        function returns true if the piece is already verified by the client
     """
-    def piece_upload_FSM(self):
-        # initializing keep alive timer
-        self.keep_alive_timer = time.time()
-        # download status of piece
-        download_status = False
-        # exchanges message with 
-        exchange_messages = True
-        while exchange_messages:
-            # checking for timeouts in states 
-            if(self.check_keep_alive_timeout()):
-                self.state.set_null()
-            # client state 0    : (client = not interested, peer = choking)
-            if(self.state == USTATE0):
-                response_message = self.handle_response()
-            # client state 1    : (client = interested,     peer = choking)
-            elif(self.state == USTATE1):
-                self.send_unchoke()
-            # client state 2    : (client = interested,     peer = not choking)
-            elif(self.state == USTATE2):
-                self.upload_pieces()
-                exchange_messages = False
-            # client state 3    : (client = None,           peer = None)
-            elif(self.state == USTATE3):
-                exchange_messages = False
-       
-    """
-        function helps in uploading the torrent file with peer, the function 
-        exchanges the request/piece messages with peer and helps peer get the 
-        pieces of the file that client has in the seeding file
-    """
-    def upload_pieces(self):
-        while self.upload_possible():
-            # torrent statistics starting the timer
-            self.torrent.statistics.start_time()
-            # handle all the request messages
-            request_message = self.handle_response()
-            # torrent statistics starting the timer
-            self.torrent.statistics.stop_time()
-            if request_message and request_message.message_id == REQUEST:
-                piece_index = request_message.piece_index
-                block_length = request_message.block_length
-                self.torrent.statistics.update_upload_rate(piece_index, block_length)
-                self.peer_logger.log(self.torrent.statistics.get_upload_statistics())
+    def piece_verified(self, piece_index):
+        return self.pieces_downloaded is not None and piece_index in self.pieces_downloaded
 
-    """ 
-        piece can be only uploaded only upon given conditions
-        -> the connection still exits 
-        -> handshake done by client and peer successfully
-        -> state of client can download the file
-        -> timeout has not occured
-        function returns true if all above condition are satisfied else false
-    """
-    def upload_possible(self):
-        # socket connection still active to recieve/send
-        if not self.peer_sock.peer_connection_active():
-            return False
-        # if peer has not done handshake piece will never be downloaded
-        if not self.handshake_flag:
-            return False
-        # finally check if peer is interested and peer is not choking
-        if self.state != USTATE2:
-            return False
-        if self.check_keep_alive_timeout():
-            return False
-        # all conditions satisfied 
-        return True
- 
     """
         function checks for timeouts incase of no keep alive recieved from peer
     """
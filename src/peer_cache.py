@@ -0,0 +1,110 @@
+import os
+import time
+from threading import *
+
+# bencodepy module for encoding / decoding the cached peers
+import bencodepy
+
+# torrent logger module for execution logging
+from torrent_logger import *
+
+# torrent error module for handling the exception
+from torrent_error import *
+
+"""
+    Peer cache keeps the peers recieved from the trackers on disk, so that on
+    restarting the download the client connects to the cached peers without
+    waiting for the tracker responses (trackers are announced in background).
+
+    The cache file is kept next to the downloading file (like the resume
+    file), the cache file is bencoded dictionary containing
+    * info-hash     : info hash of the torrent
+    * time          : time at which the peers were cached (seconds)
+    * interval      : announce interval given by the tracker
+    * peers         : list of [peer IP, peer port]
+
+    Cache file is written atomically (temporary file renamed over cache file)
+"""
+
+# cached peers older than given time are not used (seconds)
+PEER_CACHE_MAX_AGE = 24 * 60 * 60
+# maximum number of peers kept in cache file
+PEER_CACHE_MAX_PEERS = 200
+
+class peer_cache():
+
+    def __init__(self, download_file_path, torrent):
+        self.torrent = torrent
+        self.cache_file_path = download_file_path.rstrip(os.sep) + '.peers'
+
+        # peers loaded from cache file, kept while writing new cache
+        self.cached_peers = []
+        # lock for synchronization of cache writes
+        self.cache_lock = Lock()
+
+        # peer cache logger
+        self.cache_logger = torrent_logger('peer cache', TRACKER_LOG_FILE, DEBUG)
+
+    """
+        function loads the peers cached for the torrent, returns the peers
+        data (in same form as given by the tracker) or None if the cache
+        file is not present, is of other torrent or has expired
+    """
+    def load(self):
+        try:
+            with open(self.cache_file_path, 'rb') as cache_file:
+                cache_data = bencodepy.decode(cache_file.read())
+            info_hash   = cache_data[b'info-hash']
+            cache_time  = cache_data[b'time']
+            interval    = cache_data[b'interval']
+            peers = [(peer_IP.decode('utf-8'), peer_port) for peer_IP, peer_port in cache_data[b'peers']]
+        except (OSError, KeyError, TypeError, ValueError, bencodepy.DecodingError) as err:
+            self.cache_logger.log('No valid peer cache ' + self.cache_file_path + ' : ' + str(err))
+            return None
+
+        if info_hash != self.torrent.torrent_metadata.info_hash:
+            self.cache_logger.log('Peer cache of different torrent, ignoring peer cache !')
+            return None
+        cache_age = int(time.time()) - cache_time
+        if cache_age > PEER_CACHE_MAX_AGE or not peers:
+            self.cache_logger.log('Peer cache expired (' + str(cache_age) + ' seconds old), ignoring peer cache !')
+            return None
+
+        self.cached_peers = peers
+        # used for EXCECUTION LOGGING
+        cache_log  = 'Loaded ' + str(len(peers)) + ' cached peers (' + str(cache_age) + ' seconds old, '
+        cache_log += 'tracker interval ' + str(interval) + ' seconds) ' + SUCCESS
+        self.cache_logger.log(cache_log)
+        return {'interval' : interval, 'peers' : peers, 'seeders' : None, 'leechers' : None}
+
+    """
+        function writes the given peers in cache file, the peers cached
+        earlier are kept after the given peers upto the cache size
+    """
+    def save(self, peers, interval):
+        with self.cache_lock:
+            cache_peers = []
+            known_peers = set([])
+            for peer_address in list(peers) + self.cached_peers:
+                peer_address = tuple(peer_address)
+                if peer_address not in known_peers:
+                    known_peers.add(peer_address)
+                    cache_peers.append(peer_address)
+            cache_peers = cache_peers[:PEER_CACHE_MAX_PEERS]
+            if not cache_peers:
+                return False
+            cache_data = { b'info-hash' : self.torrent.torrent_metadata.info_hash,
+                           b'time'      : int(time.time()),
+                           b'interval'  : int(interval or 0),
+                           b'peers'     : [[peer_IP, peer_port] for peer_IP, peer_port in cache_peers] }
+            temporary_file_path = self.cache_file_path + '.tmp'
+            try:
+                with open(temporary_file_path, 'wb') as temporary_file:
+                    temporary_file.write(bencodepy.encode(cache_data))
+                os.replace(temporary_file_path, self.cache_file_path)
+            except OSError as err:
+                self.cache_logger.log('Peer cache write failed : ' + str(err) + ' ' + FAILURE)
+                return False
+            self.cached_peers = cache_peers
+        self.cache_logger.log('Cached ' + str(len(cache_peers)) + ' peers ' + SUCCESS)
+        return True
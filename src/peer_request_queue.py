@@ -0,0 +1,187 @@
+import time
+import math
+from collections import deque
+
+"""
+    Pipelining block requests keeps several request messages in flight with
+    the peer instead of waiting for every piece message before sending next
+    request. The number of outstanding requests (queue depth) follows the
+    bandwidth-delay product measured for the peer connection
+
+        queue depth = download rate x round trip time / block length
+
+    Note that the round trip time used is the minimum observed one (the
+    delay without queueing), hence while the link is not saturated the
+    estimated depth keeps growing and once saturated it stays at BDP.
+"""
+
+"""
+    outstanding block request made to the peer
+"""
+class block_request():
+    def __init__(self, piece_index, block_offset, block_length):
+        self.piece_index    = piece_index
+        self.block_offset   = block_offset
+        self.block_length   = block_length
+        # time at which the request message was sent
+        self.request_time   = time.time()
+
+    # key used for matching the piece message with request
+    def key(self):
+        return (self.piece_index, self.block_offset)
+
+
+"""
+    per peer queue of outstanding block requests, the class matches piece
+    messages with requests by (piece index, block offset) and adapts the
+    queue depth to the bandwidth-delay product of the peer connection
+"""
+class peer_request_queue():
+
+    def __init__(self, block_length, min_depth = 2, max_depth = 64):
+        # block length used for requesting blocks
+        self.block_length = block_length
+
+        # bounds on the number of outstanding requests
+        self.min_depth = min_depth
+        self.max_depth = max_depth
+
+        # current number of outstanding requests allowed
+        self.depth = min_depth
+
+        # outstanding requests : (piece index, block offset) -> block_request
+        self.outstanding_requests = {}
+
+        # extra requests above BDP so that the depth can grow
+        self.depth_headroom = 2
+
+        # minimum round trip time observed (seconds)
+        self.min_rtt = None
+        # minimum rtt sample slowly decays for adapting to route changes
+        self.min_rtt_decay = 1.01
+
+        # recent completions (time, bytes) used for download rate estimation
+        self.rate_window = deque()
+        self.rate_window_size = 32
+
+        # requests not responded within timeout are considered lost (seconds)
+        self.request_timeout = 5
+
+    """
+        function returns true if another request can be made to the peer
+    """
+    def can_request(self):
+        return len(self.outstanding_requests) < self.depth
+
+    """
+        function adds the request made to peer in the outstanding queue
+    """
+    def add_request(self, piece_index, block_offset, block_length):
+        request = block_request(piece_index, block_offset, block_length)
+        self.outstanding_requests[request.key()] = request
+        return request
+
+    """
+        function removes the outstanding request matching the piece message
+        returns the matched block request else None if no request was made
+    """
+    def complete_request(self, piece_index, block_offset, block_length):
+        request = self.outstanding_requests.get((piece_index, block_offset))
+        if request is None or request.block_length != block_length:
+            return None
+        del self.outstanding_requests[request.key()]
+
+        # update the rtt and download rate estimation for the peer
+        response_time = time.time()
+        self.update_rtt(response_time - request.request_time)
+        self.update_rate(response_time, block_length)
+
+        # adapt the queue depth to bandwidth-delay product
+        self.adapt_depth()
+        return request
+
+    """
+        function removes the requests which are not responded within timeout
+        returns the list of expired block requests, and decreases the depth
+    """
+    def expire_requests(self):
+        current_time = time.time()
+        expired_requests = [request for request in self.outstanding_requests.values()
+                            if current_time - request.request_time >= self.request_timeout]
+        for request in expired_requests:
+            del self.outstanding_requests[request.key()]
+        # peer is not able to handle the requests, back off the queue depth
+        if expired_requests:
+            self.depth = max(self.min_depth, self.depth // 2)
+        return expired_requests
+
+    """
+        function removes the outstanding requests of the given piece
+        returns the list of requests which were cancelled
+    """
+    def cancel_requests(self, piece_index):
+        cancelled_requests = [request for request in self.outstanding_requests.values()
+                              if request.piece_index == piece_index]
+        for request in cancelled_requests:
+            del self.outstanding_requests[request.key()]
+        return cancelled_requests
+
+    """
+        function removes all the outstanding requests
+        returns the list of requests which were not responded
+    """
+    def clear(self):
+        pending_requests = list(self.outstanding_requests.values())
+        self.outstanding_requests.clear()
+        return pending_requests
+
+    """
+        updates minimum round trip time given rtt sample
+    """
+    def update_rtt(self, rtt):
+        if self.min_rtt is None or rtt < self.min_rtt:
+            self.min_rtt = rtt
+        else:
+            self.min_rtt = min(rtt, self.min_rtt * self.min_rtt_decay)
+
+    """
+        updates the download rate window given bytes recieved at given time
+    """
+    def update_rate(self, response_time, block_length):
+        self.rate_window.append((response_time, block_length))
+        if len(self.rate_window) > self.rate_window_size:
+            self.rate_window.popleft()
+
+    """
+        function returns the estimated download rate (bytes per second)
+    """
+    def download_rate(self):
+        if len(self.rate_window) < 2:
+            return None
+        time_span = self.rate_window[-1][0] - self.rate_window[0][0]
+        if time_span <= 0:
+            return None
+        # bytes of the first completion were recieved before the time span
+        recieved_bytes = sum(block_length for _, block_length in self.rate_window)
+        recieved_bytes -= self.rate_window[0][1]
+        return recieved_bytes / time_span
+
+    """
+        function adapts the queue depth to bandwidth-delay product of peer
+    """
+    def adapt_depth(self):
+        rate = self.download_rate()
+        if rate is None or self.min_rtt is None:
+            return
+        bdp_requests = math.ceil(rate * self.min_rtt / self.block_length)
+        depth = bdp_requests + self.depth_headroom
+        self.depth = max(self.min_depth, min(self.max_depth, depth))
+
+    def __len__(self):
+        return len(self.outstanding_requests)
+
+    def __str__(self):
+        queue_log  = 'REQUEST QUEUE : '
+        queue_log += '(outstanding : ' + str(len(self.outstanding_requests)) + '), '
+        queue_log += '(depth : ' + str(self.depth) + ')'
+        return queue_log
@@ -3,6 +3,7 @@ from select import *
 from threading import *
 from torrent_error import *
 from torrent_logger import *
+from peer_wire_messages import *
 import sys
 
 """
@@ -15,7 +16,7 @@ import sys
 # class for general peer socket 
 class peer_socket():
 
-    def __init__(self, peer_IP, peer_port, psocket = None):
+    def __init__(self, peer_IP, peer_port, psocket = None, max_frame_length = MAX_BLOCK_MESSAGE_LENGTH):
         if psocket is None:
             # initializing a peer socket for TCP communiction 
             self.peer_sock = socket(AF_INET, SOCK_STREAM)
@@ -40,11 +41,25 @@ class peer_socket():
 
         # socket locks for synchronization 
         self.socket_lock = Lock()
+
+        # buffered reader for the data recieved from peer
+        self.frame_reader = peer_frame_reader(max_frame_length)
         
         # logger for peer socket
         self.socket_logger = torrent_logger(self.unique_id, SOCKET_LOG_FILE, DEBUG)
         
 
+    """
+        function recieves the available data from peer into the frame reader
+        returns false if no data is recieved within timeout or connection closed
+    """
+    def recieve_into_buffer(self, handshake_message = False):
+        try:
+            recieved_length = self.frame_reader.recieve_into(self.peer_sock, handshake_message)
+        except:
+            recieved_length = 0
+        return recieved_length != 0
+
     """
         function returns raw data of given data size which is recieved 
         function returns the exact length data as recieved else return None
@@ -52,25 +67,30 @@ class peer_socket():
     def recieve_data(self, data_size):
         if not self.peer_connection:
             return 
-        peer_raw_data = b''
-        recieved_data_length = 0
-        request_size = data_size
-        
+        handshake_message = (data_size == HANDSHAKE_MESSAGE_LENGTH)
         # loop untill you recieve all the data from the peer
-        while(recieved_data_length < data_size):
-            # attempt recieving requested data size in chunks
-            try:
-                chunk = self.peer_sock.recv(request_size)
-            except:
-                chunk = b''
-            if len(chunk) == 0:
+        while self.frame_reader.unparsed_length() < data_size:
+            if not self.recieve_into_buffer(handshake_message):
                 return None
-            peer_raw_data += chunk
-            request_size -=  len(chunk)
-            recieved_data_length += len(chunk)
-
         # return required size data recieved from peer
-        return peer_raw_data 
+        return self.frame_reader.extract_data(data_size)
+
+    """
+        function returns the peer wire message recieved from the peer, note
+        that the payload of message is valid only untill the next recieve
+        function returns None if complete message is not recieved and raises 
+        torrent error if message recieved exceeds the maximum message length
+    """
+    def recieve_message(self):
+        if not self.peer_connection:
+            return None
+        # loop untill you recieve the complete message from the peer
+        peer_message = self.frame_reader.extract_message()
+        while peer_message is None:
+            if not self.recieve_into_buffer():
+                return None
+            peer_message = self.frame_reader.extract_message()
+        return peer_message
    
     """
         function helps send raw data by the socket
@@ -95,6 +115,8 @@ class peer_socket():
     """
     def start_seeding(self):
         try:
+            # port can be bound again while old connections are in TIME_WAIT
+            self.peer_sock.setsockopt(SOL_SOCKET, SO_REUSEADDR, 1)
             self.peer_sock.bind((self.IP, self.port))
             self.peer_sock.listen(self.max_peer_requests)
         except Exception as err:
@@ -116,23 +138,6 @@ class peer_socket():
         return self.peer_connection
 
 
-    """
-        accepts an incomming connection
-        return connection socket and ip address of incoming connection
-    """
-    def accept_connection(self):
-        connection_log = ''
-        try:
-            connection = self.peer_sock.accept()
-            connection_log += 'Socket connection recieved !'
-        except Exception as err:
-            connection = None
-            connection_log = 'Socket accept connection for seeder ' + self.unique_id + ' : ' 
-            connection_log += str(err)
-        self.socket_logger.log(connection_log)
-        # successfully return connection
-        return connection
-
     """
         checks if the peer connection is active or not
     """
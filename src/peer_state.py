@@ -36,6 +36,20 @@ class peer_state():
         self.peer_choking       = None
         self.peer_interested    = None
 
+    """
+        state of the peer considering only downloading by the client, the
+        client choking / peer interested are changed independently by the
+        choker hence they are not part of downloading state
+    """
+    def downloading_state(self):
+        state = peer_state()
+        if self.am_interested is None:
+            state.set_null()
+        else:
+            state.am_interested = self.am_interested
+            state.peer_choking  = self.peer_choking
+        return state
+
     # overaloading == operation for comparsion with states
     def __eq__(self, other): 
         if self.am_choking      != other.am_choking :
@@ -1,5 +1,6 @@
 import struct
 from torrent_error import *
+from piece_bitfield import piece_bitfield
 
 """
     As per Peer Wire Protocol all the messages exchanged in between 
@@ -36,6 +37,9 @@ HANDSHAKE_MESSAGE_LENGTH = 68
 MESSAGE_LENGTH_SIZE     = 4
 MESSAGE_ID_SIZE         = 1
 
+# maximum length of piece message for block of 16 KB
+MAX_BLOCK_MESSAGE_LENGTH = MESSAGE_ID_SIZE + 8 + 2 ** 14
+
 
 """ class for general peer message exchange in P2P bittorrent """
 class peer_wire_message():
@@ -276,17 +280,8 @@ class bitfield(peer_wire_message):
 
 
     # extract downloaded pieces from bitfield send by peer 
-    def extract_pieces(self):
-        bitfield_pieces = set([])
-        # for every bytes value in payload check for its bits
-        for i, byte_value in enumerate(self.payload):
-            for j in range(8):
-                # check if jth bit is set
-                if((byte_value >> j) & 1):
-                    piece_number = i * 8 + 7 - j
-                    bitfield_pieces.add(piece_number)
-        # return the extracted bitfield pieces
-        return bitfield_pieces
+    def extract_pieces(self, pieces_count):
+        return piece_bitfield.from_payload(self.payload, pieces_count)
 
 
     def __str__(self):
@@ -335,15 +330,21 @@ class piece(peer_wire_message):
     def __init__(self, piece_index, block_offset, block):
         message_length  = 9 + len(block)                    # 4 bytes message length
         message_id      = PIECE                             # 1 byte message id
-        payload         = struct.pack("!I", piece_index)    # variable length payload
-        payload        += struct.pack("!I", block_offset)
-        payload        += block
+        payload         = None                              # block is not copied in payload
         super().__init__(message_length, message_id, payload)
         # actual payload data to be associated with object
         self.piece_index    = piece_index
         self.block_offset   = block_offset
         self.block          = block 
 
+    # returns raw bytes of message header (13 bytes) preceding the block
+    def header(self):
+        return create_piece_header(self.piece_index, self.block_offset, len(self.block))
+
+    # returns raw bytes as peer message
+    def message(self):
+        return self.header() + self.block
+
     def __str__(self):
         message  = 'PIECE : '
         message += '(message paylaod : [ '
@@ -352,83 +353,299 @@ class piece(peer_wire_message):
         message += 'block length : '    + str(len(self.block))      + ' ])'
         return message
 
+
+"""
+    This message is send inorder to cancel the block request made earlier to
+    the remote peer, typically used in endgame mode. The payload is same as
+    the payload of request message
+    | Piece Index(4 bytes) | Block Offset(4 bytes) | Block Length(4 bytes) |
+"""
+class cancel(peer_wire_message):
+    # cancel message for any given block requested from any piece
+    def __init__(self, piece_index, block_offset, block_length):
+        message_length  = 13                                # 4 bytes message length
+        message_id      = CANCEL                            # 1 byte message id
+        payload         = struct.pack("!I", piece_index)    # 12 bytes payload
+        payload        += struct.pack("!I", block_offset) 
+        payload        += struct.pack("!I", block_length) 
+        super().__init__(message_length, message_id, payload)
+        # actual payload data to be associated with object
+        self.piece_index    = piece_index
+        self.block_offset   = block_offset
+        self.block_length   = block_length
+
+    def __str__(self):
+        message  = 'CANCEL : '
+        message += '(message paylaod : [ '
+        message += 'piece index : '     + str(self.piece_index)     + ', '
+        message += 'block offest : '    + str(self.block_offset)    + ', '
+        message += 'block length : '    + str(self.block_length)    + ' ])'
+        return message
+
+"""
+    function creates the piece message header given block that follows it
+    | Message Length | Message ID | Piece Index | Block Offset |
+"""
+def create_piece_header(piece_index, block_offset, block_length):
+    return struct.pack("!IBII", 9 + block_length, PIECE, piece_index, block_offset)
+
 """
     function helps in creating the bitfield message given the bitfield set
 """
 def create_bitfield_message(bitfield_pieces, total_pieces):
-    bitfield_payload = b''
-    piece_byte = 0
-    # check for every torrent piece in bitfield
-    for i in range(total_pieces):
-        if i in bitfield_pieces:
-            piece_byte = piece_byte | (2 ** 8)
-            piece_byte = piece_byte >> 1
-        if (i + 1) % 8 == 0:
-            bitfield_payload += struct.pack("!B", piece_byte)
-            piece_byte = 0
+    if not isinstance(bitfield_pieces, piece_bitfield):
+        bitfield_pieces = piece_bitfield(total_pieces, bitfield_pieces)
+    return bitfield(bitfield_pieces.payload())
 
-    # adding the last piece_bytes 
-    if total_pieces % 8 != 0:
-        bitfield_payload += struct.pack("!B", piece_byte)
 
-    return bitfield(bitfield_payload)
+"""
+    Framed reader for the peer wire messages recieved over a connection. The
+    data is recieved (recv_into) in a preallocated buffer and as many complete
+    messages as recieved by one read are extracted from the buffer. Note that
+    the payloads are memoryviews over the buffer which are valid only untill
+    the next read in the buffer, hence must be consumed before reading again
+"""
+class peer_frame_reader():
+    
+    # initialize the reader given the maximum message length allowed
+    def __init__(self, max_frame_length, buffer_size = None):
+        # maximum message length excluding the message length part itself
+        self.max_frame_length = max_frame_length
+        
+        # buffer must be able to hold any complete message
+        max_message_size = max(MESSAGE_LENGTH_SIZE + max_frame_length, HANDSHAKE_MESSAGE_LENGTH)
+        if buffer_size is None:
+            buffer_size = 2 * max_message_size
+        buffer_size = max(buffer_size, max_message_size)
+
+        # preallocated recieve buffer
+        self.buffer = bytearray(buffer_size)
+        self.buffer_view = memoryview(self.buffer)
+        
+        # data in buffer[parse_position : fill_position] is not yet extracted
+        self.parse_position = 0
+        self.fill_position = 0
+
+        # minimum free space in buffer for reading data from socket
+        self.min_read_size = 2 ** 12
+
+    """
+        function returns the length of data recieved but not yet extracted
+    """
+    def unparsed_length(self):
+        return self.fill_position - self.parse_position
+
+    """
+        function returns the size of message which is being recieved
+    """
+    def pending_message_size(self, handshake_message = False):
+        if handshake_message:
+            return HANDSHAKE_MESSAGE_LENGTH
+        if self.unparsed_length() < MESSAGE_LENGTH_SIZE:
+            return MESSAGE_LENGTH_SIZE
+        message_length = struct.unpack_from("!I", self.buffer, self.parse_position)[0]
+        return MESSAGE_LENGTH_SIZE + min(message_length, self.max_frame_length)
+
+    """
+        function returns the free part of buffer in which data can be recieved
+        the unextracted data is moved to the begining of the buffer when the 
+        free space is not enough for recieving the message being recieved
+    """
+    def writable_buffer(self, handshake_message = False):
+        unparsed_length = self.unparsed_length()
+        if unparsed_length == 0:
+            self.parse_position = 0
+            self.fill_position = 0
+        else:
+            free_length = len(self.buffer) - self.fill_position
+            required_length = self.pending_message_size(handshake_message) - unparsed_length
+            required_length = max(self.min_read_size, required_length)
+            if free_length < required_length and self.parse_position > 0:
+                self.buffer[:unparsed_length] = self.buffer[self.parse_position : self.fill_position]
+                self.parse_position = 0
+                self.fill_position = unparsed_length
+        return self.buffer_view[self.fill_position:]
+
+    """
+        function updates the reader given the bytes recieved in writable buffer
+    """
+    def recieved(self, recieved_length):
+        self.fill_position += recieved_length
+
+    """
+        function recieves the available data from the socket into buffer
+        returns the number of bytes recieved (zero if connection is closed)
+    """
+    def recieve_into(self, sock, handshake_message = False):
+        recieved_length = sock.recv_into(self.writable_buffer(handshake_message))
+        self.recieved(recieved_length)
+        return recieved_length
+
+    """
+        function extracts raw data of given size from the buffer
+        returns the raw data if recieved completely else returns None
+    """
+    def extract_data(self, data_size):
+        if self.unparsed_length() < data_size:
+            return None
+        raw_data = bytes(self.buffer_view[self.parse_position : self.parse_position + data_size])
+        self.parse_position += data_size
+        return raw_data
+
+    """
+        function extracts the handshake message which is not length prefixed
+    """
+    def extract_handshake(self):
+        return self.extract_data(HANDSHAKE_MESSAGE_LENGTH)
+
+    """
+        function extracts the peer wire message from the buffer, returns None
+        if more data needs to be recieved for extracting complete message
+        function raises the error if the message exceeds maximum length
+    """
+    def extract_message(self):
+        if self.unparsed_length() < MESSAGE_LENGTH_SIZE:
+            return None
+        # unpack the message length which is 4 bytes long
+        message_length = struct.unpack_from("!I", self.buffer, self.parse_position)[0]
+        if message_length > self.max_frame_length:
+            err_msg  = 'peer wire message length ' + str(message_length) + 'B '
+            err_msg += 'exceeds maximum length ' + str(self.max_frame_length) + 'B'
+            raise torrent_error(err_msg)
+        message_start = self.parse_position + MESSAGE_LENGTH_SIZE
+        message_end = message_start + message_length
+        if self.fill_position < message_end:
+            return None
+        self.parse_position = message_end
+        # keep alive messages have no message ID and payload
+        if message_length == 0:
+            return peer_wire_message(message_length, None, None)
+        # unpack the message ID which is 1 byte long
+        message_id = self.buffer[message_start]
+        # messages having no payload 
+        if message_length == 1:
+            return peer_wire_message(message_length, message_id, None)
+        # payload is the view of buffer
+        payload = self.buffer_view[message_start + MESSAGE_ID_SIZE : message_end]
+        return peer_wire_message(message_length, message_id, payload)
+
+    """
+        generator extracts all the complete messages recieved in the buffer
+    """
+    def extract_messages(self):
+        peer_message = self.extract_message()
+        while peer_message is not None:
+            yield peer_message
+            peer_message = self.extract_message()
 
 
+"""
+    function returns maximum length of peer wire message for the torrent, the 
+    largest messages are piece message with block and the bitfield message
+"""
+def max_message_length(torrent):
+    max_piece_message_length = MESSAGE_ID_SIZE + 8 + torrent.block_length
+    max_bitfield_message_length = MESSAGE_ID_SIZE + (torrent.pieces_count + 7) // 8
+    return max(max_piece_message_length, max_bitfield_message_length)
+
+
+"""
+    exact payload length of the fixed length peer wire messages
+"""
+MESSAGE_PAYLOAD_LENGTH = { CHOKE        : 0,
+                           UNCHOKE      : 0,
+                           INTERESTED   : 0,
+                           UNINTERESTED : 0,
+                           HAVE         : 4,
+                           REQUEST      : 12,
+                           CANCEL       : 12 }
+
+# piece message payload has piece index and block offset before the block
+PIECE_HEADER_PAYLOAD_LENGTH = 8
+
 """ 
     The class helps in decoding any general peer wire message into its 
-    appropriate message type object instance
+    appropriate message type object instance. Decoder has no state hence
+    single instance is shared by all the threads decoding the messages
 """
 class peer_message_decoder():
 
+    """
+        function validates the payload length of the message recieved from
+        the peer, raises torrent error if the payload length is invalid
+    """
+    def validate_payload(self, peer_message):
+        message_id = peer_message.message_id
+        payload_length = 0 if peer_message.payload is None else len(peer_message.payload)
+        expected_length = MESSAGE_PAYLOAD_LENGTH.get(message_id)
+        if expected_length is not None:
+            valid_length = (payload_length == expected_length)
+        elif message_id == PIECE:
+            valid_length = (payload_length >= PIECE_HEADER_PAYLOAD_LENGTH)
+        elif message_id == BITFIELD:
+            valid_length = (payload_length > 0)
+        else:
+            valid_length = True
+        if not valid_length:
+            err_msg  = 'peer wire message id ' + str(message_id) + ' has invalid '
+            err_msg += 'payload length ' + str(payload_length) + 'B'
+            raise torrent_error(err_msg)
+
     # initialize peer_message_decoder with given peer wire message instance
     def decode(self, peer_message):
+        # raises torrent error for malformed messages
+        self.validate_payload(peer_message)
         
         # deocdes the given peer_message
         if peer_message.message_id == KEEP_ALIVE :
-            self.peer_decoded_message = keep_alive()
+            peer_decoded_message = keep_alive()
 
         elif peer_message.message_id == CHOKE :    
-            self.peer_decoded_message = choke()
+            peer_decoded_message = choke()
 
         elif peer_message.message_id == UNCHOKE :        
-            self.peer_decoded_message = unchoke()
+            peer_decoded_message = unchoke()
 
         elif peer_message.message_id == INTERESTED :     
-            self.peer_decoded_message = interested()
+            peer_decoded_message = interested()
 
         elif peer_message.message_id == UNINTERESTED :
-            self.peer_decoded_message = uninterested()
+            peer_decoded_message = uninterested()
 
         elif peer_message.message_id == HAVE :
             piece_index = struct.unpack_from("!I", peer_message.payload)[0]
-            self.peer_decoded_message = have(piece_index)
+            peer_decoded_message = have(piece_index)
 
         elif peer_message.message_id == BITFIELD :
-            self.peer_decoded_message = bitfield(peer_message.payload)
+            peer_decoded_message = bitfield(peer_message.payload)
 
         elif peer_message.message_id == REQUEST :        
             piece_index  = struct.unpack_from("!I", peer_message.payload, 0)[0]
             block_offset = struct.unpack_from("!I", peer_message.payload, 4)[0]
             block_length = struct.unpack_from("!I", peer_message.payload, 8)[0]
-            self.peer_decoded_message = request(piece_index, block_offset, block_length)
+            peer_decoded_message = request(piece_index, block_offset, block_length)
 
         elif peer_message.message_id == PIECE :          
             piece_index  = struct.unpack_from("!I", peer_message.payload, 0)[0]
             begin_offset = struct.unpack_from("!I", peer_message.payload, 4)[0]
             block = peer_message.payload[8:]
-            self.peer_decoded_message = piece(piece_index, begin_offset, block)
+            peer_decoded_message = piece(piece_index, begin_offset, block)
 
-        # TODO : implement cancel and port 
         elif peer_message.message_id == CANCEL :          
-            self.peer_decoded_message = None
+            piece_index  = struct.unpack_from("!I", peer_message.payload, 0)[0]
+            block_offset = struct.unpack_from("!I", peer_message.payload, 4)[0]
+            block_length = struct.unpack_from("!I", peer_message.payload, 8)[0]
+            peer_decoded_message = cancel(piece_index, block_offset, block_length)
+
+        # TODO : implement port 
 
         elif peer_message.message_id == PORT :           
-            self.peer_decoded_message = None
+            peer_decoded_message = None
         else:
-            self.peer_decoded_message = None
+            peer_decoded_message = None
         
         # returns the peer decoded message
-        return self.peer_decoded_message
+        return peer_decoded_message
 
 
 # creating object instance of type decoder
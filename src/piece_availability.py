@@ -0,0 +1,141 @@
+import random
+import heapq
+
+"""
+    Availability index of the pieces in the swarm used for rarest first piece
+    selection. For every piece the number of peers having the piece is kept
+    and the pieces still wanted by client are bucketed by their count, hence
+    the index is updated in O(1) for every piece on BITFIELD / HAVE messages,
+    peer disconnections and pieces downloaded by the client. The rarest pieces
+    are found by walking the buckets from lowest count without scanning all
+    the pieces of torrent.
+
+    Every bucket is kept as list with position of piece in its bucket, so the
+    piece is moved in O(1) by swapping it with the last piece of bucket. The
+    bucket is walked from a random position, hence the pieces of same count
+    are picked at random by different peers instead of always lowest index
+"""
+class piece_availability():
+
+    def __init__(self, pieces_count):
+        self.pieces_count = pieces_count
+        # number of peers having the piece
+        self.piece_counts = [0] * pieces_count
+        # pieces wanted by the client bucketed by their count
+        self.buckets = [list(range(pieces_count))]
+        # position of the wanted piece in its bucket
+        self.bucket_positions = list(range(pieces_count))
+        # pieces which are not yet downloaded by the client
+        self.wanted = [True] * pieces_count
+        self.wanted_count = pieces_count
+
+    # removes the piece from the bucket by swapping it with the last piece
+    def remove_from_bucket(self, piece_index, count):
+        bucket = self.buckets[count]
+        position = self.bucket_positions[piece_index]
+        last_piece = bucket.pop()
+        if last_piece != piece_index:
+            bucket[position] = last_piece
+            self.bucket_positions[last_piece] = position
+
+    # adds the piece at the end of bucket
+    def add_to_bucket(self, piece_index, count):
+        while len(self.buckets) <= count:
+            self.buckets.append([])
+        self.bucket_positions[piece_index] = len(self.buckets[count])
+        self.buckets[count].append(piece_index)
+
+    # moves the wanted piece from one bucket to the other
+    def move_piece(self, piece_index, old_count, new_count):
+        if not self.wanted[piece_index]:
+            return
+        self.remove_from_bucket(piece_index, old_count)
+        self.add_to_bucket(piece_index, new_count)
+
+    """
+        function updates the index when peer has the given piece (HAVE)
+    """
+    def add_piece(self, piece_index):
+        old_count = self.piece_counts[piece_index]
+        self.piece_counts[piece_index] = old_count + 1
+        self.move_piece(piece_index, old_count, old_count + 1)
+
+    """
+        function updates the index when peer no longer has the given piece
+    """
+    def remove_piece(self, piece_index):
+        old_count = self.piece_counts[piece_index]
+        if old_count == 0:
+            return
+        self.piece_counts[piece_index] = old_count - 1
+        self.move_piece(piece_index, old_count, old_count - 1)
+
+    """
+        function updates the index with all the pieces in bitfield of peer
+    """
+    def add_bitfield(self, bitfield_pieces):
+        for piece_index in bitfield_pieces:
+            self.add_piece(piece_index)
+
+    """
+        function removes all the pieces in bitfield of peer (disconnected)
+    """
+    def remove_bitfield(self, bitfield_pieces):
+        for piece_index in bitfield_pieces:
+            self.remove_piece(piece_index)
+
+    """
+        function removes the piece downloaded by the client from the index
+    """
+    def piece_completed(self, piece_index):
+        if self.wanted[piece_index]:
+            self.remove_from_bucket(piece_index, self.piece_counts[piece_index])
+            self.wanted[piece_index] = False
+            self.wanted_count -= 1
+
+    """
+        function returns the number of peers having the given piece
+    """
+    def availability(self, piece_index):
+        return self.piece_counts[piece_index]
+
+    """
+        function returns the k rarest wanted pieces which the peer has given
+        the bitfield of peer, rarest piece first. The excluded pieces (already
+        being downloaded from other peers) are skipped, pieces of same count
+        are in random order. Returns empty list if peer has no such piece.
+
+        Walking the buckets takes about k * wanted / pieces of peer steps,
+        hence for the peer having few pieces its pieces are ranked directly
+    """
+    def rarest_pieces(self, bitfield_pieces, excluded_pieces, k = 1):
+        peer_pieces_count = len(bitfield_pieces)
+        if peer_pieces_count == 0 or k <= 0:
+            return []
+        if peer_pieces_count * peer_pieces_count <= k * self.wanted_count:
+            candidate_pieces = [(self.piece_counts[piece_index], random.random(), piece_index)
+                                for piece_index in bitfield_pieces
+                                if self.wanted[piece_index] and piece_index not in excluded_pieces]
+            return [piece_index for _, _, piece_index in heapq.nsmallest(k, candidate_pieces)]
+        rarest_pieces = []
+        for count in range(1, len(self.buckets)):
+            bucket = self.buckets[count]
+            if not bucket:
+                continue
+            start_position = random.randrange(len(bucket))
+            for position in range(len(bucket)):
+                piece_index = bucket[(start_position + position) % len(bucket)]
+                if piece_index in bitfield_pieces and piece_index not in excluded_pieces:
+                    rarest_pieces.append(piece_index)
+                    if len(rarest_pieces) == k:
+                        return rarest_pieces
+        return rarest_pieces
+
+    """
+        function returns the rarest wanted piece which the peer has, used by
+        the download workers which pick one piece at a time (None if peer
+        has no such piece)
+    """
+    def rarest_piece(self, bitfield_pieces, excluded_pieces):
+        rarest_pieces = self.rarest_pieces(bitfield_pieces, excluded_pieces, 1)
+        return rarest_pieces[0] if rarest_pieces else None
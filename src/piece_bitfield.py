@@ -0,0 +1,138 @@
+"""
+    Compact bitfield of pieces backed by bytearray, one bit for every piece
+    in the same layout as the bitfield message payload of peer wire protocol
+    (high bit of first byte is piece index 0). The class can be used in place
+    of the set of piece indices : add / discard / in / len / iteration, and
+    provides fast set operations (and, or, andnot) over complete bitfields
+"""
+class piece_bitfield():
+
+    def __init__(self, pieces_count, pieces = None):
+        self.pieces_count = pieces_count
+        # bits of the pieces in the wire payload format
+        self.bits = bytearray((pieces_count + 7) // 8)
+        # number of pieces present in bitfield (popcount)
+        self.count = 0
+        if pieces is not None:
+            for piece_index in pieces:
+                self.add(piece_index)
+
+    """
+        function creates the bitfield from the bitfield message payload
+        the spare bits at the end of payload are ignored
+    """
+    @classmethod
+    def from_payload(cls, payload, pieces_count):
+        piece_bits = cls(pieces_count)
+        payload = bytes(payload[:len(piece_bits.bits)])
+        piece_bits.bits[:len(payload)] = payload
+        piece_bits.clear_spare_bits()
+        piece_bits.count = popcount(piece_bits.bits)
+        return piece_bits
+
+    """
+        function creates the bitfield from integer of bits
+    """
+    @classmethod
+    def from_integer(cls, integer_bits, pieces_count):
+        piece_bits = cls(pieces_count)
+        piece_bits.bits[:] = integer_bits.to_bytes(len(piece_bits.bits), 'big')
+        piece_bits.count = popcount(piece_bits.bits)
+        return piece_bits
+
+    """
+        function creates the bitfield having all the pieces
+    """
+    @classmethod
+    def full(cls, pieces_count):
+        piece_bits = cls(pieces_count)
+        piece_bits.bits[:] = b'\xff' * len(piece_bits.bits)
+        piece_bits.clear_spare_bits()
+        piece_bits.count = pieces_count
+        return piece_bits
+
+    # spare bits after the last piece are always zero
+    def clear_spare_bits(self):
+        spare_bits = len(self.bits) * 8 - self.pieces_count
+        if spare_bits:
+            self.bits[-1] &= (0xff << spare_bits) & 0xff
+
+    # returns the payload of bitfield message
+    def payload(self):
+        return bytes(self.bits)
+
+    # returns the bits of bitfield as integer
+    def integer(self):
+        return int.from_bytes(self.bits, 'big')
+
+    # adds the piece in the bitfield
+    def add(self, piece_index):
+        if not 0 <= piece_index < self.pieces_count:
+            raise IndexError('piece index ' + str(piece_index) + ' out of range')
+        piece_mask = 0x80 >> (piece_index % 8)
+        if not self.bits[piece_index // 8] & piece_mask:
+            self.bits[piece_index // 8] |= piece_mask
+            self.count += 1
+
+    # removes the piece from the bitfield if present
+    def discard(self, piece_index):
+        if piece_index in self:
+            self.bits[piece_index // 8] &= ~(0x80 >> (piece_index % 8)) & 0xff
+            self.count -= 1
+
+    # returns true if all the pieces are present
+    def complete(self):
+        return self.count == self.pieces_count
+
+    def __contains__(self, piece_index):
+        if not 0 <= piece_index < self.pieces_count:
+            return False
+        return bool(self.bits[piece_index // 8] & (0x80 >> (piece_index % 8)))
+
+    def __len__(self):
+        return self.count
+
+    def __bool__(self):
+        return self.count != 0
+
+    # iterates over the pieces present in increasing order of piece index
+    def __iter__(self):
+        for byte_index, byte_value in enumerate(self.bits):
+            if byte_value == 0:
+                continue
+            for bit_index in range(8):
+                if byte_value & (0x80 >> bit_index):
+                    yield byte_index * 8 + bit_index
+
+    # pieces present in both the bitfields
+    def __and__(self, other):
+        return piece_bitfield.from_integer(self.integer() & other.integer(), self.pieces_count)
+
+    # pieces present in any of the bitfields
+    def __or__(self, other):
+        return piece_bitfield.from_integer(self.integer() | other.integer(), self.pieces_count)
+
+    # pieces present in this bitfield but not in other (and not)
+    def __sub__(self, other):
+        return piece_bitfield.from_integer(self.integer() & ~other.integer(), self.pieces_count)
+
+    def __eq__(self, other):
+        if not isinstance(other, piece_bitfield):
+            return NotImplemented
+        return self.pieces_count == other.pieces_count and self.bits == other.bits
+
+    def copy(self):
+        return piece_bitfield.from_payload(self.bits, self.pieces_count)
+
+    def __str__(self):
+        return 'BITFIELD : (' + str(self.count) + ' / ' + str(self.pieces_count) + ' pieces)'
+
+
+"""
+    function returns the number of bits set in the given bytes
+"""
+def popcount(bits):
+    integer_bits = int.from_bytes(bits, 'big')
+    if hasattr(integer_bits, 'bit_count'):
+        return integer_bits.bit_count()
+    return bin(integer_bits).count('1')
@@ -0,0 +1,214 @@
+from threading import *
+from collections import OrderedDict
+
+"""
+    Read cache of pieces used while uploading the file. On the first request
+    of any block the whole piece is read from the file and later requests for
+    the blocks of the piece are served from memory. The cache is bounded by
+    its size in bytes and the eviction policy can be LRU or ARC.
+"""
+
+# eviction policies supported by the piece cache
+LRU_CACHE_POLICY = 'lru'
+ARC_CACHE_POLICY = 'arc'
+
+"""
+    general piece cache maintaining the hit / miss counters of the cache
+    Note that all the functions of cache are synchronized since multiple
+    threads can upload the pieces at same time
+"""
+class piece_cache():
+
+    def __init__(self, cache_size):
+        # maximum bytes of pieces that can be cached
+        self.cache_size = cache_size
+        # bytes of pieces currently cached
+        self.cached_size = 0
+
+        # cache hit / miss counters
+        self.hits = 0
+        self.misses = 0
+
+        # cache lock for synchronization
+        self.cache_lock = Lock()
+
+    """
+        function returns the cached piece data else returns None
+    """
+    def get(self, piece_index):
+        with self.cache_lock:
+            piece_data = self.lookup(piece_index)
+            if piece_data is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return piece_data
+
+    """
+        function adds the piece data in the cache
+    """
+    def put(self, piece_index, piece_data):
+        # pieces bigger than the cache are never cached
+        if len(piece_data) > self.cache_size:
+            return
+        with self.cache_lock:
+            self.insert(piece_index, piece_data)
+
+    """
+        function removes the piece from the cache (piece is modified)
+    """
+    def invalidate(self, piece_index):
+        with self.cache_lock:
+            self.remove(piece_index)
+
+    """
+        function returns the ratio of requests served from the cache
+    """
+    def hit_ratio(self):
+        requests = self.hits + self.misses
+        if requests == 0:
+            return 0.0
+        return round(self.hits / requests, 2)
+
+    def __str__(self):
+        cache_log  = 'PIECE CACHE : '
+        cache_log += '(hits : ' + str(self.hits) + '), '
+        cache_log += '(misses : ' + str(self.misses) + '), '
+        cache_log += '(hit ratio : ' + str(self.hit_ratio()) + '), '
+        cache_log += '(cached : ' + str(round(self.cached_size / (2 ** 20), 2)) + ' MB)'
+        return cache_log
+
+
+"""
+    least recently used piece is evicted from the cache
+"""
+class lru_piece_cache(piece_cache):
+
+    def __init__(self, cache_size):
+        super().__init__(cache_size)
+        # cached pieces ordered from least to most recently used
+        self.cached_pieces = OrderedDict()
+
+    def lookup(self, piece_index):
+        piece_data = self.cached_pieces.get(piece_index)
+        if piece_data is not None:
+            self.cached_pieces.move_to_end(piece_index)
+        return piece_data
+
+    def insert(self, piece_index, piece_data):
+        self.remove(piece_index)
+        # evict least recently used pieces untill the piece fits in cache
+        while self.cached_size + len(piece_data) > self.cache_size:
+            evicted_index, evicted_data = self.cached_pieces.popitem(last = False)
+            self.cached_size -= len(evicted_data)
+        self.cached_pieces[piece_index] = piece_data
+        self.cached_size += len(piece_data)
+
+    def remove(self, piece_index):
+        piece_data = self.cached_pieces.pop(piece_index, None)
+        if piece_data is not None:
+            self.cached_size -= len(piece_data)
+
+
+"""
+    adaptive replacement cache (ARC) balances between pieces requested once
+    recently (recency list t1) and pieces requested many times (frequency
+    list t2). The ghost lists b1 and b2 remember the indices of pieces evicted
+    from t1 and t2, hits on ghost lists adapt the target size of t1.
+    Note that since pieces are of same size the lists are bounded by count
+"""
+class arc_piece_cache(piece_cache):
+
+    def __init__(self, cache_size, piece_length):
+        super().__init__(cache_size)
+        # maximum number of pieces cached
+        self.capacity = max(1, cache_size // piece_length)
+        # target number of pieces in recency list
+        self.target_t1 = 0
+
+        # cached pieces : index -> data
+        self.t1 = OrderedDict()
+        self.t2 = OrderedDict()
+        # ghost lists of evicted pieces : index -> None
+        self.b1 = OrderedDict()
+        self.b2 = OrderedDict()
+
+    def lookup(self, piece_index):
+        # hit in any of the list makes the piece frequently used
+        if piece_index in self.t1:
+            piece_data = self.t1.pop(piece_index)
+            self.t2[piece_index] = piece_data
+            return piece_data
+        if piece_index in self.t2:
+            self.t2.move_to_end(piece_index)
+            return self.t2[piece_index]
+        return None
+
+    def insert(self, piece_index, piece_data):
+        if piece_index in self.t1 or piece_index in self.t2:
+            self.remove(piece_index)
+        # piece was recently evicted from recency list, grow the recency list
+        if piece_index in self.b1:
+            delta = max(1, len(self.b2) // max(1, len(self.b1)))
+            self.target_t1 = min(self.capacity, self.target_t1 + delta)
+            del self.b1[piece_index]
+            self.replace(False)
+            self.t2[piece_index] = piece_data
+        # piece was recently evicted from frequency list, shrink the recency list
+        elif piece_index in self.b2:
+            delta = max(1, len(self.b1) // max(1, len(self.b2)))
+            self.target_t1 = max(0, self.target_t1 - delta)
+            del self.b2[piece_index]
+            self.replace(True)
+            self.t2[piece_index] = piece_data
+        # piece is not in cache or in ghost lists
+        else:
+            if len(self.t1) + len(self.b1) >= self.capacity:
+                if len(self.t1) < self.capacity:
+                    self.b1.popitem(last = False)
+                    self.replace(False)
+                else:
+                    evicted_index, evicted_data = self.t1.popitem(last = False)
+                    self.cached_size -= len(evicted_data)
+            elif len(self.t1) + len(self.t2) + len(self.b1) + len(self.b2) >= self.capacity:
+                if len(self.t1) + len(self.t2) + len(self.b1) + len(self.b2) >= 2 * self.capacity:
+                    self.b2.popitem(last = False)
+                self.replace(False)
+            self.t1[piece_index] = piece_data
+        self.cached_size += len(piece_data)
+
+    """
+        function evicts a piece from t1 or t2 into its ghost list
+    """
+    def replace(self, in_b2):
+        if len(self.t1) + len(self.t2) < self.capacity:
+            return
+        if self.t1 and (len(self.t1) > self.target_t1 or (in_b2 and len(self.t1) == self.target_t1)):
+            evicted_index, evicted_data = self.t1.popitem(last = False)
+            self.b1[evicted_index] = None
+        elif self.t2:
+            evicted_index, evicted_data = self.t2.popitem(last = False)
+            self.b2[evicted_index] = None
+        else:
+            evicted_index, evicted_data = self.t1.popitem(last = False)
+            self.b1[evicted_index] = None
+        self.cached_size -= len(evicted_data)
+
+    def remove(self, piece_index):
+        piece_data = self.t1.pop(piece_index, None)
+        if piece_data is None:
+            piece_data = self.t2.pop(piece_index, None)
+        if piece_data is not None:
+            self.cached_size -= len(piece_data)
+
+
+"""
+    function creates the piece cache given the size and eviction policy
+    returns None if the cache size is zero (caching disabled)
+"""
+def create_piece_cache(cache_size, cache_policy, piece_length):
+    if not cache_size:
+        return None
+    if cache_policy == ARC_CACHE_POLICY:
+        return arc_piece_cache(cache_size, piece_length)
+    return lru_piece_cache(cache_size)
@@ -0,0 +1,113 @@
+import os
+import time
+import hashlib
+from threading import *
+from concurrent.futures import ThreadPoolExecutor
+
+# torrent logger module for execution logging
+from torrent_logger import *
+
+# torrent error module for handling the exception
+from torrent_error import *
+
+# bitfield of pieces verified on disk
+from piece_bitfield import piece_bitfield
+
+"""
+    Recheck of the pieces of file on disk, every piece is read from the file
+    and its sha1 hash is compared with the piece hash in torrent file. The
+    pieces are verified in parallel by a pool of threads, note that both the
+    reading of file (pread) and hashing of piece release the GIL hence the
+    recheck scales with number of cores
+"""
+
+# progress of recheck is logged after given time interval (seconds)
+RECHECK_PROGRESS_INTERVAL = 1
+
+class piece_recheck():
+
+    def __init__(self, torrent, file_handler, worker_count = None, executor = None):
+        self.torrent        = torrent
+        self.file_handler   = file_handler
+        # number of threads hashing the pieces
+        self.worker_count   = worker_count or os.cpu_count() or 1
+        # pool of threads shared by the torrents of session (None if not shared)
+        self.executor       = executor
+
+        # progress of recheck
+        self.checked_pieces = 0
+        self.checked_bytes  = 0
+        self.progress_lock  = Lock()
+
+        # recheck logger
+        self.recheck_logger = torrent_logger('piece recheck', FILE_LOG_FILE, DEBUG)
+        self.recheck_logger.set_console_logging()
+
+    """
+        function returns true if data of given piece on disk matches piece hash
+    """
+    def verify_piece(self, piece_index):
+        try:
+            piece_data = self.file_handler.read_piece(piece_index)
+        except (OSError, ValueError):
+            return False
+        piece_length = self.torrent.get_piece_length(piece_index)
+        piece_valid = False
+        if len(piece_data) == piece_length:
+            piece_hash = hashlib.sha1(piece_data).digest()
+            torrent_piece_hash = self.torrent.torrent_metadata.pieces[piece_index * 20 : piece_index * 20 + 20]
+            piece_valid = (piece_hash == torrent_piece_hash)
+        with self.progress_lock:
+            self.checked_pieces += 1
+            self.checked_bytes  += piece_length
+        return piece_valid
+
+    """
+        function verifies the given pieces in parallel and returns bitfield of
+        pieces whose data is valid, progress is logged during the recheck
+    """
+    def verify_pieces(self, pieces):
+        pieces = list(pieces)
+        self.checked_pieces = 0
+        self.checked_bytes  = 0
+        start_time = time.time()
+        verified_pieces = piece_bitfield(self.torrent.pieces_count)
+
+        executor = self.executor or ThreadPoolExecutor(max_workers = self.worker_count)
+        try:
+            results = executor.map(self.verify_piece, pieces)
+            last_progress_time = start_time
+            for piece_index, piece_valid in zip(pieces, results):
+                if piece_valid:
+                    verified_pieces.add(piece_index)
+                if time.time() - last_progress_time >= RECHECK_PROGRESS_INTERVAL:
+                    last_progress_time = time.time()
+                    self.recheck_logger.log(self.progress_log(len(pieces), start_time))
+        finally:
+            if executor is not self.executor:
+                executor.shutdown()
+
+        # used for EXCECUTION LOGGING
+        recheck_log  = self.progress_log(len(pieces), start_time) + ', valid pieces : '
+        recheck_log += str(len(verified_pieces)) + ' '
+        recheck_log += SUCCESS if len(verified_pieces) == len(pieces) else FAILURE
+        self.recheck_logger.log(recheck_log)
+        return verified_pieces
+
+    """
+        function verifies all the pieces of torrent, returns the bitfield
+        of pieces which are present on disk
+    """
+    def verify_all_pieces(self):
+        return self.verify_pieces(range(self.torrent.pieces_count))
+
+    """
+        function returns the progress and throughput of the recheck
+    """
+    def progress_log(self, pieces_count, start_time):
+        time_taken = max(time.time() - start_time, 0.001)
+        throughput = round(self.checked_bytes / time_taken / (2 ** 20), 2)
+        progress_log  = 'Recheck : ' + str(self.checked_pieces) + ' / ' + str(pieces_count) + ' pieces '
+        progress_log += '(' + str(round(self.checked_pieces * 100 / max(pieces_count, 1), 2)) + ' %) '
+        progress_log += 'at ' + str(throughput) + ' MB/s using ' + str(self.worker_count) + ' threads'
+        return progress_log
@@ -0,0 +1,97 @@
+import sys
+import time
+from threading import Lock
+
+"""
+    Rate limiting of the data downloaded / uploaded by the client using token
+    buckets. Bucket is filled with tokens (bytes) at the given rate upto the
+    burst size and the data sent / recieved takes the tokens from the bucket.
+    The bucket is allowed to go in debt, the data is transferred once and the
+    caller waits for the time in which debt is repaid. Hence the limit remains
+    accurate even for the messages larger than burst size (low limits) and the
+    bucket is updated once per message instead of every byte transferred.
+
+    The limits are applied at three levels : global limit of the session,
+    limit of the torrent and limit of each peer. Rate limiter of peer holds
+    the buckets of all the levels and the data waits for the slowest bucket
+"""
+
+# burst size of the bucket is given time of data at the rate (seconds)
+RATE_LIMIT_BURST_TIME = 1
+
+class token_bucket():
+
+    def __init__(self, rate, burst_time = RATE_LIMIT_BURST_TIME):
+        # rate at which bucket is filled (bytes per second)
+        self.rate = rate
+        # maximum tokens in the bucket (burst size)
+        self.capacity = rate * burst_time
+        self.tokens = self.capacity
+        # time of the last update of tokens
+        self.last_time = time.monotonic()
+        # bucket is shared by the event loop and reactor threads
+        self.bucket_lock = Lock()
+
+    """
+        function takes the tokens for data of given size from the bucket,
+        returns the time for which caller must wait before transferring
+        the next data (zero if the bucket is not in debt)
+    """
+    def reserve(self, data_size):
+        with self.bucket_lock:
+            current_time = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (current_time - self.last_time) * self.rate)
+            self.last_time = current_time
+            self.tokens -= data_size
+            if self.tokens >= 0:
+                return 0
+            return -self.tokens / self.rate
+
+
+"""
+    function creates token bucket given the rate limit in Kbps, returns None
+    if the rate is not limited (same units as the torrent statistics)
+"""
+def create_token_bucket(rate_limit):
+    if rate_limit is None or rate_limit >= sys.maxsize:
+        return None
+    return token_bucket(rate_limit * (2 ** 10))
+
+
+"""
+    rate limiter holding the token buckets of all the levels of limit
+"""
+class rate_limiter():
+
+    def __init__(self, buckets = None):
+        self.buckets = [bucket for bucket in buckets or [] if bucket is not None]
+
+    """
+        function adds the token bucket (ignored if None) in the limiter
+    """
+    def add_bucket(self, bucket):
+        if bucket is not None:
+            self.buckets.append(bucket)
+
+    """
+        function returns true if any of the levels is limited
+    """
+    def limited(self):
+        return len(self.buckets) != 0
+
+    """
+        function takes the tokens for data of given size from all the buckets,
+        returns the time for which caller must wait (slowest bucket)
+    """
+    def reserve(self, data_size):
+        wait_time = 0
+        for bucket in self.buckets:
+            wait_time = max(wait_time, bucket.reserve(data_size))
+        return wait_time
+
+    """
+        function returns the rate limiter of peer, which has the buckets of
+        this limiter and bucket of given per peer rate limit (in Kbps)
+    """
+    def peer_limiter(self, peer_rate_limit = None):
+        return rate_limiter(self.buckets + [create_token_bucket(peer_rate_limit)])
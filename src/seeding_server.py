@@ -0,0 +1,914 @@
+import os
+import time
+import socket
+import selectors
+from collections import deque
+from threading import *
+
+# user defined libraries
+from torrent_error import *
+from torrent_logger import *
+from peer_wire_messages import *
+from peer_socket import peer_socket
+from peer_state import *
+from torrent_statistics import torrent_statistics
+from piece_bitfield import piece_bitfield
+from rate_limiter import rate_limiter
+from choker import choker, RECHOKE_INTERVAL, UPLOAD_SLOTS
+
+"""
+    Seeding server serves all the leechers connected to the client using
+    non blocking sockets multiplexed by selectors (epoll on linux). A small
+    fixed set of reactor threads each run a selector over many connections
+    and every connection is driven by its own uploading state machine.
+
+    Server listens on single port for all the torrents being seeded, every
+    leecher connection is routed to the torrent by info hash in handshake.
+
+    Leechers are unchoked by the choker of torrent, which is run by single
+    choker thread of server over all the connections. Choke / unchoke of the
+    connection is handed over to the reactor thread serving the connection.
+"""
+
+# blocks are streamed from file to socket without copying if sendfile exists
+ZERO_COPY_UPLOAD = hasattr(os, 'sendfile')
+
+# header is sent with more data to follow, so that it is not sent alone
+SEND_MORE_FLAG = getattr(socket, 'MSG_MORE', 0)
+
+# maximum piece messages queued for a leecher, requests above are dropped
+# (leecher requests the blocks again once its requests time out)
+MAX_QUEUED_BLOCKS = 128
+
+# protocol length and name with which every handshake starts
+HANDSHAKE_PROTOCOL = b'\x13BitTorrent protocol'
+
+"""
+    raw message queued for sending to the peer, the message can be given as
+    list of buffers which are sent together by sendmsg (scatter/gather)
+"""
+class message_upload():
+    def __init__(self, message_buffers, block = None):
+        # buffers of the message not yet sent to the peer
+        self.message_buffers = deque(memoryview(buffer) for buffer in message_buffers)
+        # block uploaded by the message : (piece index, block offset, length)
+        self.block = block
+        # length of the message, taken from the upload limit before sending
+        self.length = sum(len(buffer) for buffer in self.message_buffers)
+        self.rate_limited = False
+
+    # sends the message, raises BlockingIOError if socket buffer is full
+    def send(self, sock):
+        while self.message_buffers:
+            sent_length = sock.sendmsg(self.message_buffers)
+            # remove the buffers which are completely sent
+            while sent_length > 0:
+                buffer_length = len(self.message_buffers[0])
+                if sent_length < buffer_length:
+                    self.message_buffers[0] = self.message_buffers[0][sent_length:]
+                    break
+                sent_length -= buffer_length
+                self.message_buffers.popleft()
+
+
+"""
+    piece message queued for sending to the peer, the 13 bytes header of
+    message is sent by sendmsg and the block is streamed directly from the 
+    file descriptor to the socket by sendfile without copying the block
+"""
+class block_upload():
+    def __init__(self, piece_header, file_segments, block):
+        self.header = piece_header
+        # block uploaded by the message : (piece index, block offset, length)
+        self.block = block
+        # bytes of the header sent to the peer
+        self.header_sent_length = 0
+        # segments of block not yet sent : (file, position, length)
+        self.file_segments = deque(file_segments)
+        # length of the message, taken from the upload limit before sending
+        self.length = len(piece_header) + sum(segment[2] for segment in file_segments)
+        self.rate_limited = False
+
+    # sends the message, raises BlockingIOError if socket buffer is full
+    def send(self, sock):
+        header_view = memoryview(self.header)
+        while self.header_sent_length < len(self.header):
+            header_left = [header_view[self.header_sent_length:]]
+            self.header_sent_length += sock.sendmsg(header_left, [], SEND_MORE_FLAG)
+        while self.file_segments:
+            segment_file, file_position, segment_length = self.file_segments[0]
+            # file descriptor remains open while the segment is being sent
+            file_descriptor = segment_file.acquire_descriptor()
+            try:
+                sent_length = os.sendfile(sock.fileno(), file_descriptor, file_position, segment_length)
+            finally:
+                segment_file.release_descriptor()
+            if sent_length == 0:
+                raise OSError('end of file reached while sending block')
+            if sent_length < segment_length:
+                file_position += sent_length
+                segment_length -= sent_length
+                self.file_segments[0] = (segment_file, file_position, segment_length)
+            else:
+                self.file_segments.popleft()
+
+
+"""
+    uploading state machine for a leecher connection, the connection reacts
+    to the readable / writable events given by the reactor selector
+
+    handshake   : waiting for the handshake message from the leecher
+    USTATE0     : (client = choking,     peer = not interested)
+    USTATE1     : (client = choking,     peer = interested)
+    USTATE2     : (client = not choking, peer = interested)
+    USTATE3     : (client = None,        peer = None) connection closed
+"""
+class upload_connection():
+
+    def __init__(self, connection_socket, peer_address, seeding_server):
+        # non blocking connection socket of the leecher
+        self.sock = connection_socket
+        self.IP, self.port = peer_address[:2]
+        self.unique_id = '(' + self.IP + ' : ' + str(self.port) + ')'
+
+        self.server         = seeding_server
+        self.server_logger  = seeding_server.server_logger
+        # reactor serving the connection, set once connection is registered
+        self.reactor        = None
+        # torrent seeded to the leecher, known once handshake is recieved
+        self.seeding_torrent    = None
+        self.torrent            = None
+        self.file_handler       = None
+        self.seeding_pieces     = None
+        # upload limit of the connection (None if not limited)
+        self.upload_limiter     = None
+        # time untill which sending is paused by the upload limit
+        self.throttled_until    = 0
+
+        # initialize the peer_state
+        self.state = peer_state()
+        # handshake flag with peer
+        self.handshake_flag = False
+        # unique peer ID recieved from peer
+        self.peer_id = None
+
+        # buffered reader for the data recieved from peer
+        self.frame_reader = peer_frame_reader(seeding_server.max_frame_length)
+        # messages which are to be sent to the peer
+        self.send_queue = deque()
+
+        # events for which connection is registered with selector
+        self.selector_events = selectors.EVENT_READ
+
+        # upload statistics of the connection
+        self.statistics = None
+        # bytes uploaded to the peer, used by choker for ranking the peer
+        self.uploaded_bytes = 0
+
+        # keep alive timeout : 10 second
+        self.keep_alive_timeout = 10
+        # keep alive timer
+        self.keep_alive_timer = time.time()
+        # time at which keep alive was last sent to the choked peer
+        self.keep_alive_sent_time = time.time()
+
+        # message handler for recieved message
+        self.message_handler = { KEEP_ALIVE    : self.recieved_keep_alive,
+                                 INTERESTED    : self.recieved_interested,
+                                 UNINTERESTED  : self.recieved_uninterested,
+                                 REQUEST       : self.recieved_request,
+                                 CANCEL        : self.recieved_cancel }
+
+    """
+        function reads all the data available on socket and reacts to
+        the complete messages recieved from the peer
+    """
+    def on_readable(self):
+        try:
+            recieved_length = self.frame_reader.recieve_into(self.sock, not self.handshake_flag)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            recieved_length = 0
+        # peer has closed the connection
+        if recieved_length == 0:
+            self.close()
+            return
+        self.keep_alive_timer = time.time()
+
+        # the first message recieved is handshake
+        if not self.handshake_flag:
+            raw_handshake = self.frame_reader.extract_handshake()
+            if raw_handshake is None:
+                return
+            if not self.recieved_handshake(raw_handshake):
+                self.close()
+                return
+
+        # react to all the complete messages recieved
+        try:
+            for peer_message in self.frame_reader.extract_messages():
+                self.handle_message(peer_message)
+                if self.closed():
+                    return
+        except torrent_error as err_msg:
+            self.server_logger.log(self.unique_id + ' ' + err_msg.__str__() + ' ' + FAILURE)
+            self.close()
+        except Exception as err:
+            # error in serving the leecher only closes its own connection
+            self.server_logger.log(self.unique_id + ' unexpected error : ' + repr(err) + ' ' + FAILURE)
+            self.close()
+
+    """
+        function sends the queued messages untill socket send buffer is full
+    """
+    def on_writable(self):
+        while self.send_queue and not self.throttled():
+            # message takes the tokens of upload limit before it is sent, the
+            # messages after it wait untill the bucket debt is repaid
+            upload = self.send_queue[0]
+            if self.upload_limiter is not None and not upload.rate_limited:
+                upload.rate_limited = True
+                wait_time = self.upload_limiter.reserve(upload.length)
+                self.throttled_until = time.monotonic() + wait_time
+            try:
+                self.send_queue[0].send(self.sock)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError:
+                self.close()
+                return
+            except Exception as err:
+                # error in serving the leecher only closes its own connection
+                self.server_logger.log(self.unique_id + ' unexpected error : ' + repr(err) + ' ' + FAILURE)
+                self.close()
+                return
+            self.send_queue.popleft()
+
+    """
+        function returns the number of piece messages queued for the peer
+    """
+    def queued_blocks(self):
+        return sum(1 for upload in self.send_queue if upload.block is not None)
+
+    """
+        function returns true if connection has messages to be sent
+    """
+    def wants_write(self):
+        return len(self.send_queue) != 0 and not self.throttled()
+
+    """
+        function returns true if sending is paused by the upload limit
+    """
+    def throttled(self):
+        return self.throttled_until > 0 and time.monotonic() < self.throttled_until
+
+    """
+        function queues the peer wire message to be sent to the peer
+    """
+    def send_message(self, peer_message):
+        self.send_queue.append(message_upload([peer_message.message()]))
+
+    """
+        function validates the handshake of the leecher and responds with
+        handshake followed by the bitfield of the pieces client has, the
+        connection is bound to the seeding torrent with the same info hash
+    """
+    def recieved_handshake(self, raw_handshake):
+        # leecher must speak the bittorrent protocol
+        if bytes(raw_handshake[:len(HANDSHAKE_PROTOCOL)]) != HANDSHAKE_PROTOCOL:
+            self.server_logger.log(self.unique_id + ' handshake protocol validation ' + FAILURE)
+            return False
+        info_hash = bytes(raw_handshake[28:48])
+        # info hash of the leecher must match with any seeding torrent
+        seeding_torrent = self.server.find_torrent(info_hash)
+        if seeding_torrent is None:
+            self.server_logger.log(self.unique_id + ' handshake validation ' + FAILURE)
+            return False
+        self.seeding_torrent    = seeding_torrent
+        self.torrent            = seeding_torrent.torrent
+        self.file_handler       = seeding_torrent.file_handler
+        self.seeding_pieces     = seeding_torrent.seeding_pieces
+        upload_limiter = seeding_torrent.upload_limiter.peer_limiter(seeding_torrent.peer_rate_limit)
+        if upload_limiter.limited():
+            self.upload_limiter = upload_limiter
+        self.statistics = torrent_statistics(self.torrent.torrent_metadata)
+        self.statistics.start_time()
+
+        self.peer_id = raw_handshake[48:68]
+        self.handshake_flag = True
+        seeding_torrent.add_connection(self)
+        # respond with handshake and bitfield
+        self.send_message(handshake(info_hash, self.torrent.peer_id))
+        self.send_queue.append(message_upload([seeding_torrent.bitfield_message]))
+        self.server_logger.log('Handshake and bitfield sent -----> ' + self.unique_id)
+        return True
+
+    """
+        function decodes and reacts to the peer wire message recieved
+    """
+    def handle_message(self, peer_message):
+        decoded_message = PEER_MESSAGE_DECODER.decode(peer_message)
+        if decoded_message is None:
+            return
+        message_handler = self.message_handler.get(decoded_message.message_id)
+        if message_handler is not None:
+            message_handler(decoded_message)
+
+    """
+        recieved keepalive      : indicates peer is still alive in file sharing
+    """
+    def recieved_keep_alive(self, keep_alive_message):
+        self.keep_alive_timer = time.time()
+
+    """
+        recieved interested     : peer is interested in downloading from client
+                                  client unchokes the interested peer if any
+                                  upload slot is free, else peer waits for
+                                  the rechoke by choker of the torrent
+    """
+    def recieved_interested(self, interested_message):
+        self.state.set_peer_interested()
+        # client state 1    : (client = choking,     peer = interested)
+        if self.state == USTATE1:
+            self.seeding_torrent.unchoke_if_slot_free(self)
+
+    """
+        recieved uninterested   : peer is not interested in downloading from client
+    """
+    def recieved_uninterested(self, uninterested_message):
+        self.state.set_peer_not_interested()
+        self.close()
+
+    """
+        recieved request        : peer has requested some piece from client
+    """
+    def recieved_request(self, request_message):
+        # client state 2    : (client = not choking, peer = interested)
+        if self.state != USTATE2:
+            return
+        piece_index     = request_message.piece_index
+        block_offset    = request_message.block_offset
+        block_length    = request_message.block_length
+        # validate the block requested exits in file and client has the piece
+        if (piece_index not in self.seeding_pieces or 
+            not self.torrent.validate_piece_length(piece_index, block_offset, block_length)):
+            request_log = self.unique_id + ' dropping request since invalid block requested !'
+            self.server_logger.log(request_log)
+            return
+        # memory of queued blocks is bounded for leecher pipelining requests
+        if self.queued_blocks() >= MAX_QUEUED_BLOCKS:
+            request_log = self.unique_id + ' dropping request since ' + str(MAX_QUEUED_BLOCKS)
+            request_log += ' blocks are already queued !'
+            self.server_logger.log(request_log)
+            return
+        # queue the response piece message
+        self.send_block(piece_index, block_offset, block_length)
+        # update the upload statistics of the connection
+        self.statistics.stop_time()
+        self.statistics.update_upload_rate(piece_index, block_length)
+        self.statistics.start_time()
+        self.seeding_torrent.update_uploaded_bytes(block_length)
+        self.uploaded_bytes += block_length
+        self.server_logger.log(self.unique_id + ' ' + self.statistics.get_upload_statistics())
+
+    """
+        recieved cancel         : peer has cancelled the block requested earlier
+                                  the piece message of block is dropped if it
+                                  is still queued and not yet being sent
+    """
+    def recieved_cancel(self, cancel_message):
+        block = (cancel_message.piece_index, cancel_message.block_offset, cancel_message.block_length)
+        # first message in queue may be partially sent to the peer
+        queued_uploads = list(self.send_queue)[1:]
+        remaining_uploads = [upload for upload in queued_uploads if upload.block != block]
+        if len(remaining_uploads) != len(queued_uploads):
+            sending_upload = self.send_queue.popleft()
+            self.send_queue = deque([sending_upload] + remaining_uploads)
+            self.server_logger.log(self.unique_id + ' dropped cancelled block of piece : ' + str(block[0]))
+
+    """
+        function chokes the peer, the queued piece messages which are not
+        yet being sent are dropped (peer requests them again once unchoked)
+    """
+    def send_choke(self):
+        if self.closed() or self.state.am_choking:
+            return
+        sending_uploads = list(self.send_queue)[:1]
+        queued_uploads = [upload for upload in list(self.send_queue)[1:] if upload.block is None]
+        self.send_queue = deque(sending_uploads + queued_uploads)
+        self.send_message(choke())
+        self.state.set_client_choking()
+        self.server_logger.log(self.unique_id + ' choked by client')
+
+    """
+        function unchokes the peer, peer can request the blocks from client
+    """
+    def send_unchoke(self):
+        if self.closed() or not self.state.am_choking:
+            return
+        self.send_message(unchoke())
+        self.state.set_client_unchoking()
+        self.server_logger.log(self.unique_id + ' unchoked by client')
+
+    """
+        functions used by the choker of torrent running in choker thread of
+        server, choke / unchoke is done by the reactor serving the connection
+    """
+    def peer_interested(self):
+        return self.state.peer_interested is True
+
+    def client_choking(self):
+        return self.state.am_choking is not False
+
+    def transferred_bytes(self):
+        return (self.uploaded_bytes, 0)
+
+    def choke_peer(self):
+        self.reactor.call_soon(self, self.send_choke)
+
+    def unchoke_peer(self):
+        self.reactor.call_soon(self, self.send_unchoke)
+
+    """
+        function queues the piece message of block requested by the peer
+    """
+    def send_block(self, piece_index, block_offset, block_length):
+        block = (piece_index, block_offset, block_length)
+        piece_header = create_piece_header(piece_index, block_offset, block_length)
+        if ZERO_COPY_UPLOAD:
+            data_block = self.file_handler.read_block_in_memory(piece_index, block_offset, block_length)
+            if data_block is not None:
+                # the block is sent from the cached piece or mapped file in memory
+                self.send_queue.append(message_upload([piece_header, data_block], block))
+            else:
+                # the block is sent from file when the socket is writable
+                file_segments = self.file_handler.block_file_segments(piece_index, block_offset, block_length)
+                self.send_queue.append(block_upload(piece_header, file_segments, block))
+        elif self.file_handler.blocks_in_memory():
+            # the block is sent from the cached piece or mapped file in memory
+            data_block = self.file_handler.read_block(piece_index, block_offset, block_length)
+            self.send_queue.append(message_upload([piece_header, data_block], block))
+        else:
+            # read the datablock from file into the piece message
+            data_block = self.file_handler.read_block(piece_index, block_offset, block_length)
+            piece_message = piece(piece_index, block_offset, data_block)
+            self.send_queue.append(message_upload([piece_message.message()], block))
+
+    """
+        function checks for timeouts incase of no message recieved from peer
+    """
+    def check_keep_alive_timeout(self):
+        # leecher waiting for the blocks delayed by upload limit is not idle
+        if self.send_queue:
+            self.keep_alive_timer = time.time()
+        # leecher choked by the client is waiting for the unchoke, it is not
+        # idle and is sent keep alive so that it doesn't disconnect client
+        if self.state == USTATE1:
+            self.keep_alive_timer = time.time()
+            if time.time() - self.keep_alive_sent_time >= self.keep_alive_timeout / 2:
+                self.send_message(keep_alive())
+                self.keep_alive_sent_time = time.time()
+        if time.time() - self.keep_alive_timer >= self.keep_alive_timeout:
+            keep_alive_log  = self.unique_id + ' peer keep alive timeout ! ' + FAILURE
+            keep_alive_log += ' disconnecting the peer connection!'
+            self.server_logger.log(keep_alive_log)
+            self.close()
+            return True
+        return False
+
+    """
+        function returns true if the connection is closed
+    """
+    def closed(self):
+        return self.state == USTATE3
+
+    """
+        disconnects the peer connection
+    """
+    def close(self):
+        if self.state == USTATE3:
+            return
+        self.state.set_null()
+        self.send_queue.clear()
+        self.sock.close()
+        self.server.connection_closed()
+        if self.seeding_torrent is not None:
+            self.seeding_torrent.remove_connection(self)
+        # used for EXCECUTION LOGGING
+        if self.file_handler is not None and self.file_handler.piece_cache is not None:
+            self.server_logger.log(self.unique_id + ' ' + str(self.file_handler.piece_cache))
+
+
+"""
+    reactor thread multiplexes many leecher connections using a selector
+    connections accepted by the server are handed over to the reactor
+"""
+class seeding_reactor(Thread):
+
+    def __init__(self, seeding_server, reactor_index):
+        super().__init__(name = 'seeding_reactor_' + str(reactor_index))
+        self.server = seeding_server
+
+        # selector used for multiplexing the connections
+        self.selector = selectors.DefaultSelector()
+
+        # connections accepted by server but not yet registered with selector
+        self.accepted_connections = deque()
+        # calls handed over by other threads : (connection, callback)
+        self.pending_calls = deque()
+
+        # socket pair used for waking up the reactor from select
+        self.wakeup_reader, self.wakeup_writer = socket.socketpair()
+        self.wakeup_reader.setblocking(False)
+        self.wakeup_writer.setblocking(False)
+        self.selector.register(self.wakeup_reader, selectors.EVENT_READ, self.register_connections)
+
+        # all connections served by the reactor
+        self.connections = set()
+        # connections whose sending is paused by the upload limit
+        self.throttled_connections = set()
+
+        # maximum time the reactor waits in select for events (seconds)
+        self.select_timeout = 1
+
+    """
+        function hands over the connection to reactor, can be called from any thread
+    """
+    def add_connection(self, connection):
+        self.accepted_connections.append(connection)
+        self.wakeup()
+
+    """
+        function hands over the callback of connection to the reactor, the
+        callback is run by reactor thread, can be called from any thread
+    """
+    def call_soon(self, connection, callback):
+        self.pending_calls.append((connection, callback))
+        self.wakeup()
+
+    """
+        function wakes up the reactor waiting in select
+    """
+    def wakeup(self):
+        try:
+            self.wakeup_writer.send(b'\x00')
+        except (BlockingIOError, InterruptedError):
+            # reactor is already woken up
+            pass
+
+    """
+        function registers the accepted connections with the selector and
+        runs the callbacks handed over by other threads
+    """
+    def register_connections(self, events):
+        try:
+            while self.wakeup_reader.recv(1024):
+                pass
+        except (BlockingIOError, InterruptedError):
+            pass
+        while self.accepted_connections:
+            connection = self.accepted_connections.popleft()
+            connection.reactor = self
+            self.connections.add(connection)
+            handler = lambda events, connection = connection : self.serve_connection(connection, events)
+            self.selector.register(connection.sock, connection.selector_events, handler)
+        while self.pending_calls:
+            connection, callback = self.pending_calls.popleft()
+            if connection in self.connections:
+                try:
+                    callback()
+                    self.update_connection(connection)
+                except Exception as err:
+                    self.connection_failed(connection, err)
+
+    """
+        function reacts to the events of given connection
+    """
+    def serve_connection(self, connection, events):
+        try:
+            if events & selectors.EVENT_READ:
+                connection.on_readable()
+            if events & selectors.EVENT_WRITE and not connection.closed():
+                connection.on_writable()
+            self.update_connection(connection)
+        except Exception as err:
+            self.connection_failed(connection, err)
+
+    """
+        function removes the connection whose event handler failed, the other
+        connections of the reactor are served as before
+    """
+    def connection_failed(self, connection, err):
+        self.server.server_logger.log(connection.unique_id + ' unexpected error : ' + repr(err) + ' ' + FAILURE)
+        try:
+            self.remove_connection(connection)
+        except Exception:
+            self.connections.discard(connection)
+            self.throttled_connections.discard(connection)
+
+    """
+        function updates the selector registration of connection
+    """
+    def update_connection(self, connection):
+        if connection.closed():
+            self.remove_connection(connection)
+            return
+        selector_events = selectors.EVENT_READ
+        if connection.wants_write():
+            selector_events |= selectors.EVENT_WRITE
+        elif connection.send_queue:
+            # connection is written again once upload limit allows
+            self.throttled_connections.add(connection)
+        if selector_events != connection.selector_events:
+            key = self.selector.get_key(connection.sock)
+            self.selector.modify(connection.sock, selector_events, key.data)
+            connection.selector_events = selector_events
+
+    """
+        function removes the connection from reactor
+    """
+    def remove_connection(self, connection):
+        self.connections.discard(connection)
+        self.throttled_connections.discard(connection)
+        try:
+            self.selector.unregister(connection.sock)
+        except (KeyError, ValueError):
+            pass
+        connection.close()
+
+    """
+        function closes connections which have keep alive timeout
+    """
+    def check_timeouts(self):
+        for connection in list(self.connections):
+            try:
+                if connection.check_keep_alive_timeout():
+                    self.remove_connection(connection)
+                else:
+                    # keep alive may be queued for the connection
+                    self.update_connection(connection)
+            except Exception as err:
+                self.connection_failed(connection, err)
+
+    """
+        function returns the time for which reactor waits for the events, the
+        reactor is woken up when the first throttled connection can send
+    """
+    def wait_timeout(self):
+        if not self.throttled_connections:
+            return self.select_timeout
+        throttled_until = min(connection.throttled_until for connection in self.throttled_connections)
+        return max(0, min(self.select_timeout, throttled_until - time.monotonic()))
+
+    """
+        function registers the connections for writing whose upload limit
+        allows sending the data again
+    """
+    def resume_throttled_connections(self):
+        for connection in list(self.throttled_connections):
+            if not connection.throttled():
+                self.throttled_connections.discard(connection)
+                try:
+                    self.update_connection(connection)
+                except Exception as err:
+                    self.connection_failed(connection, err)
+
+    """
+        event loop of the reactor
+    """
+    def run(self):
+        while self.server.serving:
+            for key, events in self.selector.select(self.wait_timeout()):
+                event_handler = key.data
+                # errors of connections are handled by the handler itself, the
+                # reactor keeps serving even if accepting the connection fails
+                try:
+                    event_handler(events)
+                except Exception as err:
+                    self.server.server_logger.log(self.name + ' unexpected error : ' + repr(err) + ' ' + FAILURE)
+            self.resume_throttled_connections()
+            self.check_timeouts()
+        # close all the connections once server stops
+        for connection in list(self.connections):
+            self.remove_connection(connection)
+        self.selector.close()
+
+
+"""
+    torrent seeded by the server, holds the torrent, file handler and pieces
+    shared by all the leecher connections of torrent
+"""
+class seeding_torrent():
+
+    def __init__(self, torrent, file_handler, seeding_pieces, upload_limiter = None, peer_rate_limit = None,
+                 upload_slots = UPLOAD_SLOTS):
+        self.torrent = torrent
+        self.file_handler = file_handler
+        # upload limit of torrent and of every leecher connection
+        self.upload_limiter = upload_limiter or rate_limiter()
+        self.peer_rate_limit = peer_rate_limit
+        # pieces verified on disk which are uploaded to the leechers
+        self.seeding_pieces = piece_bitfield(torrent.pieces_count, seeding_pieces)
+        # encoded bitfield message sent to every leecher
+        self.bitfield_message = create_bitfield_message(self.seeding_pieces, torrent.pieces_count).message()
+
+        # bytes uploaded by all the connections, updated by reactor threads
+        self.uploaded_bytes = 0
+        self.upload_lock = Lock()
+
+        # connections of torrent, added / removed by reactor threads
+        self.connections = set()
+        self.connections_lock = Lock()
+        # choker ranking the leechers by the upload rate to them
+        self.choker = choker(upload_slots, seeding = True)
+
+    """
+        function adds the bytes uploaded by any connection of the torrent
+    """
+    def update_uploaded_bytes(self, uploaded_bytes):
+        with self.upload_lock:
+            self.uploaded_bytes += uploaded_bytes
+
+    """
+        functions add / remove the connection which completed the handshake
+    """
+    def add_connection(self, connection):
+        with self.connections_lock:
+            self.connections.add(connection)
+
+    def remove_connection(self, connection):
+        with self.connections_lock:
+            self.connections.discard(connection)
+
+    """
+        function unchokes the connection right away if any upload slot is
+        free, called by the reactor thread serving the connection
+    """
+    def unchoke_if_slot_free(self, connection):
+        with self.connections_lock:
+            if self.choker.unchoke_slot_free(self.connections):
+                connection.send_unchoke()
+
+    """
+        function rechokes all the connections of torrent, called periodically
+        by the choker thread of server
+    """
+    def rechoke(self):
+        with self.connections_lock:
+            connections = list(self.connections)
+        self.choker.rechoke(connections)
+
+
+"""
+    seeding server accepts the leecher connections on client port and
+    distributes them among the fixed set of reactor threads
+"""
+class seeding_server():
+
+    def __init__(self, client_IP, client_port, reactor_count = 4, connection_limit = None):
+        # torrents seeded by the server : info hash -> seeding torrent
+        self.seeding_torrents = {}
+        self.torrents_lock = Lock()
+        # maximum length of message recieved from leecher of any torrent
+        self.max_frame_length = MAX_BLOCK_MESSAGE_LENGTH
+
+        # limit of connections shared with other torrents (None if not shared)
+        self.connection_limit = connection_limit
+
+        # server logger object
+        self.server_logger = torrent_logger('seeding server', PEER_LOG_FILE, DEBUG)
+        self.server_logger.set_console_logging()
+
+        # listening socket on the client port
+        self.listen_sock = peer_socket(client_IP, client_port)
+
+        # reactor threads serving the connections
+        self.reactors = [seeding_reactor(self, i) for i in range(reactor_count)]
+        # index of reactor for next accepted connection
+        self.next_reactor = 0
+
+        self.serving = False
+        # event set once the server is stopped
+        self.stop_event = Event()
+
+        # thread rechoking the leechers of all the torrents
+        self.choker_thread = Thread(target = self.run_choker, name = 'seeding_choker', daemon = True)
+
+    """
+        function adds the torrent to be seeded, returns the seeding torrent
+    """
+    def add_torrent(self, torrent, file_handler, seeding_pieces, upload_limiter = None, peer_rate_limit = None,
+                    upload_slots = UPLOAD_SLOTS):
+        new_seeding_torrent = seeding_torrent(torrent, file_handler, seeding_pieces, upload_limiter,
+                                              peer_rate_limit, upload_slots)
+        with self.torrents_lock:
+            self.seeding_torrents[torrent.torrent_metadata.info_hash] = new_seeding_torrent
+            self.max_frame_length = max(self.max_frame_length, max_message_length(torrent))
+        return new_seeding_torrent
+
+    """
+        function stops seeding the torrent of given info hash to new leechers
+    """
+    def remove_torrent(self, info_hash):
+        with self.torrents_lock:
+            self.seeding_torrents.pop(info_hash, None)
+
+    """
+        function returns the seeding torrent of given info hash (or None)
+    """
+    def find_torrent(self, info_hash):
+        with self.torrents_lock:
+            return self.seeding_torrents.get(info_hash)
+
+    """
+        function is called by the connection once it is closed
+    """
+    def connection_closed(self):
+        if self.connection_limit is not None:
+            self.connection_limit.release()
+
+    """
+        function accepts all the pending connections on listening socket
+        accepted connections are distributed in round robin among reactors
+    """
+    def accept_connections(self, events):
+        while True:
+            try:
+                connection_socket, peer_address = self.listen_sock.peer_sock.accept()
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError as err:
+                self.server_logger.log('Socket accept connection for seeder : ' + str(err))
+                return
+            # connections above the limit shared by the torrents are refused
+            if self.connection_limit is not None and not self.connection_limit.acquire():
+                connection_socket.close()
+                self.server_logger.log('Connection limit reached, refused connection from ' + str(peer_address))
+                continue
+            connection_socket.setblocking(False)
+            connection = upload_connection(connection_socket, peer_address, self)
+            self.server_logger.log('Socket connection recieved ! ' + connection.unique_id)
+            self.reactors[self.next_reactor].add_connection(connection)
+            self.next_reactor = (self.next_reactor + 1) % len(self.reactors)
+
+    """
+        function rechokes the leechers of all the seeding torrents every
+        rechoke interval untill the server is stopped
+    """
+    def run_choker(self):
+        while not self.stop_event.wait(RECHOKE_INTERVAL):
+            with self.torrents_lock:
+                seeding_torrents = list(self.seeding_torrents.values())
+            for torrent in seeding_torrents:
+                torrent.rechoke()
+
+    """
+        function binds the listening socket and starts the reactor threads
+    """
+    def start(self):
+        # bind the listening socket and start listening
+        self.listen_sock.start_seeding()
+        self.listen_sock.peer_sock.setblocking(False)
+        # listening socket is multiplexed by the first reactor
+        self.reactors[0].selector.register(self.listen_sock.peer_sock, selectors.EVENT_READ,
+                                           self.accept_connections)
+        seeding_log = 'Seeding started by client at ' + self.listen_sock.unique_id
+        self.server_logger.log(seeding_log)
+        self.serving = True
+        for reactor in self.reactors:
+            reactor.start()
+        self.choker_thread.start()
+
+    """
+        function blocks untill the server is stopped
+    """
+    def wait_stopped(self):
+        self.stop_event.wait()
+
+    """
+        function starts seeding, blocks untill the server is stopped
+    """
+    def serve_forever(self):
+        self.start()
+        for reactor in self.reactors:
+            reactor.join()
+        self.listen_sock.disconnect()
+
+    """
+        stops the seeding server, function can be called from any thread
+    """
+    def stop(self):
+        self.serving = False
+        self.stop_event.set()
+
+    """
+        function stops the server started by start and closes the listening
+        socket once all the reactors have closed their connections
+    """
+    def close(self):
+        self.stop()
+        for reactor in self.reactors:
+            if reactor.is_alive():
+                reactor.join()
+        self.listen_sock.disconnect()
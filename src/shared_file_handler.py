@@ -1,43 +1,416 @@
 import os
+import mmap
+from bisect import bisect_right
 from threading import *
+from collections import OrderedDict
+
+# piece cache module for caching the pieces read while uploading
+from piece_cache import *
+
+# maximum number of buffers written by single vectored write
+MAX_IO_VECTORS = 1024
+
+# maximum number of files of multi file torrent kept open at same time
+MAX_OPEN_FILES = 128
+
+# number of blocks remembered for admitting the pieces into the read cache
+REQUESTED_BLOCKS_HISTORY = 4096
+
+# storage modes of the file handler
+FILE_STORAGE_MODE = 'file'
+MMAP_STORAGE_MODE = 'mmap'
+
+# preallocation modes of the file before downloading
+NO_PREALLOCATION     = 'none'
+SPARSE_PREALLOCATION = 'sparse'
+FULL_PREALLOCATION   = 'full'
+
+"""
+    function preallocates the file of given size before downloading
+    none    : file is not extended, it grows as the blocks are written
+    sparse  : file is extended by ftruncate without allocating disk blocks
+    full    : disk blocks of file are allocated by posix_fallocate, if not
+              supported by the file system null values are written instead
+    Note that the data already present in file is never overwritten
+"""
+def preallocate_file(file_descriptor, file_size, preallocation_mode):
+    if preallocation_mode == NO_PREALLOCATION:
+        return
+    current_file_size = os.fstat(file_descriptor).st_size
+    if preallocation_mode == FULL_PREALLOCATION:
+        try:
+            os.posix_fallocate(file_descriptor, 0, file_size)
+            return
+        except (AttributeError, OSError):
+            # write null values in the region of file not yet allocated
+            null_buffer = bytes(2 ** 20)
+            for file_position in range(current_file_size, file_size, len(null_buffer)):
+                write_size = min(len(null_buffer), file_size - file_position)
+                os.pwrite(file_descriptor, null_buffer[:write_size], file_position)
+            return
+    if current_file_size < file_size:
+        os.ftruncate(file_descriptor, file_size)
+
+"""
+    function writes the complete bitstream at given position in file
+"""
+def write_file_data(file_descriptor, byte_stream, file_position):
+    byte_stream = memoryview(byte_stream)
+    while len(byte_stream) > 0:
+        written_length = os.pwrite(file_descriptor, byte_stream, file_position)
+        byte_stream = byte_stream[written_length:]
+        file_position += written_length
+
+"""
+    function reads given size of data at given position in file, the data
+    read is shorter than buffer size only when end of file is reached
+"""
+def read_file_data(file_descriptor, buffer_size, file_position):
+    byte_stream = os.pread(file_descriptor, buffer_size, file_position)
+    # short read is completed, except when end of file is reached
+    while 0 < len(byte_stream) < buffer_size:
+        remaining_stream = os.pread(file_descriptor, buffer_size - len(byte_stream), 
+                                    file_position + len(byte_stream))
+        if len(remaining_stream) == 0:
+            break
+        byte_stream += remaining_stream
+    return byte_stream
+
 
 """
     General file input and output class, provides read and write data options
     However note that default mode of operations on file in read/write both
+
+    All the operations are positional (pread/pwrite) and never move the shared
+    file offset, hence multiple threads can read and write different parts of
+    the file concurrently without any lock
 """
 class file_io():
     # initializes the file descripter
     def __init__(self, file_path):
+        self.file_path = file_path
         # file descriptor
         self.file_descriptor = os.open(file_path, os.O_RDWR | os.O_CREAT) 
 
-    # writes in file given bitstream
-    def write(self, byte_stream):
-        os.write(self.file_descriptor, byte_stream)   
+    # writes in file given bitstream at given position in file
+    def write(self, byte_stream, file_position):
+        write_file_data(self.file_descriptor, byte_stream, file_position)
+
+    # writes in file the list of bitstreams one after the other from given position
+    def write_vector(self, byte_streams, file_position):
+        if not hasattr(os, 'pwritev'):
+            for byte_stream in byte_streams:
+                self.write(byte_stream, file_position)
+                file_position += len(byte_stream)
+            return
+        byte_streams = [memoryview(byte_stream) for byte_stream in byte_streams]
+        while byte_streams:
+            written_length = os.pwritev(self.file_descriptor, byte_streams[:MAX_IO_VECTORS], file_position)
+            file_position += written_length
+            # remove the bitstreams which are completely written
+            while written_length > 0:
+                if written_length < len(byte_streams[0]):
+                    byte_streams[0] = byte_streams[0][written_length:]
+                    break
+                written_length -= len(byte_streams[0])
+                byte_streams.pop(0)
 
-    # reads from file given size of data to be read
-    def read(self, buffer_size):
-        byte_stream = os.read(self.file_descriptor, buffer_size)
-        return byte_stream
+    # reads from file given size of data to be read at given position in file
+    def read(self, buffer_size, file_position):
+        return read_file_data(self.file_descriptor, buffer_size, file_position)
     
-    # writes file with all values to 0(null) given the size of file
-    def write_null_values(self, data_size):
-        # maximum write buffer
-        max_write_buffer = (2 ** 14)
-        # move the file descriptor position
-        self.move_descriptor_position(0)
-        while(data_size > 0):
-            if data_size >= max_write_buffer:
-                data_size = data_size - max_write_buffer
-                data = b'\x00' * max_write_buffer
+    # preallocates the file of given size with given preallocation mode
+    def preallocate(self, file_size, preallocation_mode):
+        preallocate_file(self.file_descriptor, file_size, preallocation_mode)
+
+    # reads from file given size of data, returns buffer of data read
+    def read_view(self, buffer_size, file_position):
+        return self.read(buffer_size, file_position)
+
+    # flushes the data written in given region of file (written immediately)
+    def flush(self, file_position, data_size):
+        pass
+
+    # returns the segments of file : (file, position in file, segment length)
+    def file_segments(self, file_position, data_size):
+        return [(self, file_position, data_size)]
+
+    # returns the paths of files in which data is stored
+    def file_paths(self):
+        return [self.file_path]
+
+    # returns the file descriptor used for sending file data (sendfile)
+    def acquire_descriptor(self):
+        return self.file_descriptor
+
+    # file descriptor is no longer used for sending file data
+    def release_descriptor(self):
+        pass
+
+    # closes the file descriptor
+    def close(self):
+        if self.file_descriptor is not None:
+            os.close(self.file_descriptor)
+            self.file_descriptor = None
+
+
+"""
+    Memory mapped file input and output class, provides the same operations
+    as file_io class. The complete file is mapped in memory, the blocks are
+    written by slice assignment and read as memoryview slices of the mapping
+    without any system call or copy of data. Dirty regions of file are flushed
+    to the disk using msync.
+
+    Note that file is extended to the given file size before mapping, hence
+    the file being seeded is mapped only if it is of atleast the given size
+"""
+class mmap_file_io():
+    # initializes the file descripter and maps the file in memory
+    def __init__(self, file_path, file_size):
+        self.file_path = file_path
+        # file descriptor
+        self.file_descriptor = os.open(file_path, os.O_RDWR | os.O_CREAT)
+        # file must be of atleast mapping size
+        if os.fstat(self.file_descriptor).st_size < file_size:
+            os.ftruncate(self.file_descriptor, file_size)
+        # memory mapping of the file
+        self.file_map = mmap.mmap(self.file_descriptor, file_size)
+        self.file_view = memoryview(self.file_map)
+
+    # writes in file given bitstream at given position in file
+    def write(self, byte_stream, file_position):
+        self.file_view[file_position : file_position + len(byte_stream)] = byte_stream
+
+    # writes in file the list of bitstreams one after the other from given position
+    def write_vector(self, byte_streams, file_position):
+        for byte_stream in byte_streams:
+            self.write(byte_stream, file_position)
+            file_position += len(byte_stream)
+
+    # reads from file given size of data to be read at given position in file
+    def read(self, buffer_size, file_position):
+        return bytes(self.read_view(buffer_size, file_position))
+
+    # returns memoryview of file given size of data at given position in file
+    def read_view(self, buffer_size, file_position):
+        return self.file_view[file_position : file_position + buffer_size]
+
+    # preallocates the file of given size, note that mapped file is already
+    # extended (sparse) hence only full preallocation needs to be done
+    def preallocate(self, file_size, preallocation_mode):
+        if preallocation_mode == FULL_PREALLOCATION:
+            preallocate_file(self.file_descriptor, file_size, preallocation_mode)
+
+    # flushes the dirty pages of given region of file to disk (msync)
+    def flush(self, file_position, data_size):
+        # msync region must start at page boundary
+        page_offset = file_position % mmap.PAGESIZE
+        self.file_map.flush(file_position - page_offset, data_size + page_offset)
+
+    # returns the segments of file : (file, position in file, segment length)
+    def file_segments(self, file_position, data_size):
+        return [(self, file_position, data_size)]
+
+    # returns the paths of files in which data is stored
+    def file_paths(self):
+        return [self.file_path]
+
+    # returns the file descriptor used for sending file data (sendfile)
+    def acquire_descriptor(self):
+        return self.file_descriptor
+
+    # file descriptor is no longer used for sending file data
+    def release_descriptor(self):
+        pass
+
+    # unmaps the file and closes the file descriptor, if the blocks of file
+    # are still referenced the file is unmapped once they are released
+    def close(self):
+        if self.file_descriptor is None:
+            return
+        self.file_view.release()
+        try:
+            self.file_map.close()
+        except BufferError:
+            pass
+        self.file_map = None
+        os.close(self.file_descriptor)
+        self.file_descriptor = None
+
+
+"""
+    Bounded LRU cache of open file descriptors of multi file torrent, files
+    are opened on first use and least recently used files are closed once
+    number of open files exceeds the limit. The file descriptors in use are
+    pinned and never closed untill they are released by the user.
+"""
+class file_descriptor_cache():
+
+    def __init__(self, max_open_files = MAX_OPEN_FILES):
+        self.max_open_files = max_open_files
+        # open files : file path -> [file descriptor, pin count]
+        self.open_files = OrderedDict()
+        # lock for synchronization of the cache
+        self.cache_lock = Lock()
+
+    """
+        function returns the pinned file descriptor of given file path
+    """
+    def acquire(self, file_path):
+        with self.cache_lock:
+            open_file = self.open_files.get(file_path)
+            if open_file is None:
+                os.makedirs(os.path.dirname(file_path), exist_ok = True)
+                open_file = [os.open(file_path, os.O_RDWR | os.O_CREAT), 0]
+                self.open_files[file_path] = open_file
             else:
-                data = b'\x00' * data_size
-                data_size = 0
-            self.write(data)
-        
-    # moves the file descripter to the given index position from start of file
-    def move_descriptor_position(self, index_position):
-        os.lseek(self.file_descriptor, index_position, os.SEEK_SET)
+                self.open_files.move_to_end(file_path)
+            open_file[1] += 1
+            self.close_unused_files()
+            return open_file[0]
+
+    """
+        function unpins the file descriptor of given file path
+    """
+    def release(self, file_path):
+        with self.cache_lock:
+            self.open_files[file_path][1] -= 1
+            self.close_unused_files()
+
+    """
+        function closes the given files which are not pinned (files of the
+        torrent which is completed)
+    """
+    def close_files(self, file_paths):
+        with self.cache_lock:
+            for file_path in file_paths:
+                open_file = self.open_files.get(file_path)
+                if open_file is not None and open_file[1] == 0:
+                    os.close(open_file[0])
+                    del self.open_files[file_path]
+
+    """
+        function closes the least recently used files which are not pinned
+    """
+    def close_unused_files(self):
+        for file_path in list(self.open_files.keys()):
+            if len(self.open_files) <= self.max_open_files:
+                return
+            file_descriptor, pin_count = self.open_files[file_path]
+            if pin_count == 0:
+                os.close(file_descriptor)
+                del self.open_files[file_path]
+
+
+"""
+    single file of multi file torrent spanning the given region of torrent
+    data, the file descriptor of file is given by file descriptor cache
+"""
+class file_span():
+
+    def __init__(self, file_path, span_offset, file_length, descriptor_cache):
+        self.file_path          = file_path
+        self.span_offset        = span_offset       # position of file in torrent data
+        self.file_length        = file_length
+        self.descriptor_cache   = descriptor_cache
+
+    # returns the file descriptor used for reading / writing the file
+    def acquire_descriptor(self):
+        return self.descriptor_cache.acquire(self.file_path)
+
+    # file descriptor is no longer used for reading / writing the file
+    def release_descriptor(self):
+        self.descriptor_cache.release(self.file_path)
+
+
+"""
+    Multi file input and output class, provides same operations as file_io
+    class over the concatenated data of all files of torrent. The sorted
+    index of cumulative offsets of files is searched by bisect for mapping
+    the region of torrent data into the segments of one or more files.
+"""
+class multi_file_io():
+
+    def __init__(self, root_directory_path, files, max_open_files = MAX_OPEN_FILES, descriptor_cache = None):
+        # open file descriptors of the files (cache can be shared by torrents)
+        self.descriptor_cache = descriptor_cache or file_descriptor_cache(max_open_files)
+        # files of torrent in order : (file length, relative file path)
+        self.file_spans = []
+        span_offset = 0
+        for file_length, file_path in files:
+            file_path = os.path.join(root_directory_path, file_path)
+            self.file_spans.append(file_span(file_path, span_offset, file_length, self.descriptor_cache))
+            span_offset += file_length
+        # span index : cumulative offset at which each file starts
+        self.span_offsets = [span.span_offset for span in self.file_spans]
+
+    # returns the segments of files : (file span, position in file, segment length)
+    def file_segments(self, file_position, data_size):
+        segments = []
+        span_index = max(0, bisect_right(self.span_offsets, file_position) - 1)
+        while data_size > 0 and span_index < len(self.file_spans):
+            span = self.file_spans[span_index]
+            span_position = file_position - span.span_offset
+            segment_length = min(data_size, span.file_length - span_position)
+            if segment_length > 0:
+                segments.append((span, span_position, segment_length))
+                file_position += segment_length
+                data_size -= segment_length
+            span_index += 1
+        return segments
+
+    # returns the paths of files in which data is stored
+    def file_paths(self):
+        return [span.file_path for span in self.file_spans]
+
+    # writes in files given bitstream at given position in torrent data
+    def write(self, byte_stream, file_position):
+        byte_stream = memoryview(byte_stream)
+        for span, span_position, segment_length in self.file_segments(file_position, len(byte_stream)):
+            file_descriptor = span.acquire_descriptor()
+            try:
+                write_file_data(file_descriptor, byte_stream[:segment_length], span_position)
+            finally:
+                span.release_descriptor()
+            byte_stream = byte_stream[segment_length:]
+
+    # writes in files the list of bitstreams one after the other from given position
+    def write_vector(self, byte_streams, file_position):
+        for byte_stream in byte_streams:
+            self.write(byte_stream, file_position)
+            file_position += len(byte_stream)
+
+    # reads from files given size of data at given position in torrent data
+    def read(self, buffer_size, file_position):
+        byte_streams = []
+        for span, span_position, segment_length in self.file_segments(file_position, buffer_size):
+            file_descriptor = span.acquire_descriptor()
+            try:
+                byte_streams.append(read_file_data(file_descriptor, segment_length, span_position))
+            finally:
+                span.release_descriptor()
+        return b''.join(byte_streams)
+
+    # reads from files given size of data, returns buffer of data read
+    def read_view(self, buffer_size, file_position):
+        return self.read(buffer_size, file_position)
+
+    # preallocates all the files with given preallocation mode
+    def preallocate(self, file_size, preallocation_mode):
+        for span in self.file_spans:
+            file_descriptor = span.acquire_descriptor()
+            try:
+                preallocate_file(file_descriptor, span.file_length, preallocation_mode)
+            finally:
+                span.release_descriptor()
+
+    # flushes the data written in given region of files (written immediately)
+    def flush(self, file_position, data_size):
+        pass
+
+    # closes the open files of torrent
+    def close(self):
+        self.descriptor_cache.close_files(self.file_paths())
 
 
 """
@@ -45,11 +418,11 @@ class file_io():
     any order resulting into forming of orignal file using Bittorrent's 
     P2P architecture. Simply class helps in writing/reading pieces in file 
 """
-# TODO : case of multiple torrent files initialization needs to be handled
 class torrent_shared_file_handler():
     
     # initialize the class with torrent and path where file needs to be downloaded
-    def __init__(self, download_file_path, torrent):
+    # the cache of open files can be shared by all the torrents of session
+    def __init__(self, download_file_path, torrent, descriptor_cache = None):
         self.download_file_path = download_file_path
         self.torrent = torrent
         
@@ -59,16 +432,37 @@ class torrent_shared_file_handler():
         self.piece_size = torrent.torrent_metadata.piece_length
 
         # initlizes the file input/output object instance 
-        self.download_file = file_io(self.download_file_path)
-        
-        # shared file lock
-        self.shared_file_lock = Lock()
+        client_request = torrent.client_request
+        self.storage_mode = client_request['storage mode']
+        # mapped file is extended to the torrent size, hence the seeding file
+        # shorter than the torrent is read by file I/O without modifying it
+        # (the recheck reports the pieces missing in file)
+        if self.storage_mode == MMAP_STORAGE_MODE and client_request['seeding'] != None:
+            if not os.path.isfile(download_file_path) or os.path.getsize(download_file_path) < self.file_size:
+                self.storage_mode = FILE_STORAGE_MODE
+        if torrent.torrent_metadata.files:
+            # files of multi file torrent are stored in the download directory
+            self.storage_mode = FILE_STORAGE_MODE
+            self.download_file = multi_file_io(self.download_file_path, torrent.torrent_metadata.files,
+                                               descriptor_cache = descriptor_cache)
+        elif self.storage_mode == MMAP_STORAGE_MODE:
+            self.download_file = mmap_file_io(self.download_file_path, self.file_size)
+        else:
+            self.download_file = file_io(self.download_file_path)
+
+        # read cache of pieces (None if caching is disabled)
+        self.piece_cache = create_piece_cache(client_request['read cache size'],
+                                              client_request['read cache policy'],
+                                              self.piece_size)
+        # blocks requested once and not cached : (piece index, block offset)
+        self.requested_blocks = OrderedDict()
+        self.requested_blocks_lock = Lock()
     
     # initialize the file before downloading 
-    # function writes all null values in the file 
+    # function preallocates the file according to preallocation mode
     def initialize_for_download(self):
-        # initialize the file with all the null values 
-        self.download_file.write_null_values(self.file_size)
+        preallocation_mode = self.torrent.client_request['preallocation mode']
+        self.download_file.preallocate(self.file_size, preallocation_mode)
    
 
     # calculates the position index in file given piece index and block offset
@@ -76,15 +470,92 @@ class torrent_shared_file_handler():
         return piece_index * self.piece_size + block_offset
    
 
-    # initialize the file descriptor given the piece index and block offset
-    def initalize_file_descriptor(self, piece_index, block_offset):
-        
-        # calulcate the position in file using piece index and offset
-        file_descriptor_position = self.calculate_file_position(piece_index, block_offset)
+    """
+        function returns true if the blocks read are already in memory
+        (either the cached pieces or the memory mapped file)
+    """
+    def blocks_in_memory(self):
+        return self.piece_cache is not None or self.storage_mapped()
+
+    """
+        function returns the block if it is in memory (cached piece or memory
+        mapped file) else None, then block is to be sent from the file. On a
+        cache miss the piece is read into the cache only when the block is
+        requested again, i.e. the piece is popular among the leechers
+    """
+    def read_block_in_memory(self, piece_index, block_offset, block_size):
+        if self.storage_mapped():
+            return self.read_block(piece_index, block_offset, block_size)
+        if self.piece_cache is None:
+            return None
+        piece_data = self.piece_cache.get(piece_index)
+        if piece_data is None:
+            if not self.block_requested_again(piece_index, block_offset):
+                return None
+            # read the complete piece from the file
+            piece_data = self.read_piece(piece_index)
+            self.piece_cache.put(piece_index, piece_data)
+        return memoryview(piece_data)[block_offset : block_offset + block_size]
+
+    """
+        function returns true if the block was requested earlier, otherwise
+        the block is remembered for the next request of the block
+    """
+    def block_requested_again(self, piece_index, block_offset):
+        block = (piece_index, block_offset)
+        with self.requested_blocks_lock:
+            if block in self.requested_blocks:
+                del self.requested_blocks[block]
+                return True
+            self.requested_blocks[block] = True
+            if len(self.requested_blocks) > REQUESTED_BLOCKS_HISTORY:
+                self.requested_blocks.popitem(last = False)
+            return False
+
+    """
+        function closes the file once the torrent is downloaded / seeded, the
+        cached pieces are dropped
+    """
+    def close(self):
+        self.piece_cache = None
+        self.download_file.close()
+
+    """
+        function returns the paths of all the files in which data is stored
+    """
+    def storage_file_paths(self):
+        return self.download_file.file_paths()
 
-        # move the file descripter to the desired location 
-        self.download_file.move_descriptor_position(file_descriptor_position)
+    """
+        function returns true if the file is memory mapped
+    """
+    def storage_mapped(self):
+        return self.storage_mode == MMAP_STORAGE_MODE
+
+    """
+        function returns the complete piece data read from the file, note 
+        that for memory mapped file the piece is returned as memoryview
+    """
+    def read_piece(self, piece_index):
+        file_position = self.calculate_file_position(piece_index, 0)
+        return self.download_file.read_view(self.torrent.get_piece_length(piece_index), file_position)
+
+    """
+        function flushes the data written of the given piece to the disk
+    """
+    def flush_piece(self, piece_index):
+        file_position = self.calculate_file_position(piece_index, 0)
+        self.download_file.flush(file_position, self.torrent.get_piece_length(piece_index))
 
+    """
+        function returns the segments of file in which block is stored given
+        the piece index and block offset, each segment of the block is given
+        as tuple of (file, position in file, segment length), where the file
+        gives the descriptor by acquire_descriptor / release_descriptor
+    """
+    def block_file_segments(self, piece_index, block_offset, block_length):
+        file_position = self.calculate_file_position(piece_index, block_offset)
+        return self.download_file.file_segments(file_position, block_length)
 
     """
         function helps in writing a block from piece message recieved
@@ -95,35 +566,57 @@ class torrent_shared_file_handler():
         block_offset    = piece_message.block_offset
         data_block      = piece_message.block
         
-        self.shared_file_lock.acquire()
-
-        # initialize the file descriptor at given piece index and block offset
-        self.initalize_file_descriptor(piece_index, block_offset)
+        # calulcate the position in file using piece index and offset
+        file_position = self.calculate_file_position(piece_index, block_offset)
 
         # write the block of data into the file
-        self.download_file.write(data_block)
+        self.download_file.write(data_block, file_position)
 
-        self.shared_file_lock.release()
+        # cached piece is no longer same as the piece in file
+        if self.piece_cache is not None:
+            self.piece_cache.invalidate(piece_index)
 
+    """
+        function helps in writing consecutive blocks of piece starting from
+        the given block offset, all the blocks are written by single pwritev
+    """
+    def write_blocks(self, piece_index, block_offset, data_blocks):
+        # calulcate the position in file using piece index and offset
+        file_position = self.calculate_file_position(piece_index, block_offset)
+
+        # write all the blocks of data into the file
+        self.download_file.write_vector(data_blocks, file_position)
+
+        # cached piece is no longer same as the piece in file
+        if self.piece_cache is not None:
+            self.piece_cache.invalidate(piece_index)
 
     """
         function helps in reading a block for file given piece index and block offset
         function returns the block of bytes class data that is read
     """
     def read_block(self, piece_index, block_offset, block_size):
-            
-        self.shared_file_lock.acquire()
         
-        # initialize the file descriptor at given piece index and block offset
-        self.initalize_file_descriptor(piece_index, block_offset)
-        
-        # read the block of data into the file
-        data_block  = self.download_file.read(block_size)
+        # block is served from the cached piece if caching is enabled
+        if self.piece_cache is not None:
+            return self.read_cached_block(piece_index, block_offset, block_size)
 
-        self.shared_file_lock.release()
+        # calulcate the position in file using piece index and offset
+        file_position = self.calculate_file_position(piece_index, block_offset)
         
-        # return the read block of data
-        return data_block
-    
+        # read the block of data from the file (memoryview for mapped file)
+        return self.download_file.read_view(block_size, file_position)
 
+    """
+        function reads the block from the cached piece, on cache miss the
+        whole piece is read from the file and added to the cache. Function
+        returns the memoryview of block in piece (no copy of the block)
+    """
+    def read_cached_block(self, piece_index, block_offset, block_size):
+        piece_data = self.piece_cache.get(piece_index)
+        if piece_data is None:
+            # read the complete piece from the file
+            piece_data = self.read_piece(piece_index)
+            self.piece_cache.put(piece_index, piece_data)
+        return memoryview(piece_data)[block_offset : block_offset + block_size]
 
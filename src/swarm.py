@@ -1,10 +1,15 @@
-import sys
 import time
-import random
+import asyncio
 from copy import deepcopy
 from datetime import timedelta
-from threading import *
-from peer import peer
+from async_engine import async_engine
+from async_peer import *
+from seeding_server import seeding_server
+from piece_bitfield import piece_bitfield
+from piece_availability import piece_availability
+from connection_manager import connection_manager
+from rate_limiter import rate_limiter, create_token_bucket
+from choker import choker, RECHOKE_INTERVAL
 from torrent_error import *
 from torrent_logger import *
 
@@ -29,20 +34,24 @@ class swarm():
         self.seeders    = peers_data['seeders']
         self.leechers   = peers_data['leechers']
     
-        # create a peer instance for all the peers recieved 
-        self.peers_list = []
+        # peers recieved are kept as candidates, the peer instances are
+        # created only when connection manager connects to the peer
+        self.connection_manager = connection_manager(self.torrent.client_request['max connections'])
         # used for AWS Cloud test
         if self.torrent.client_request['AWS']:
-            self.peers_list.append(peer('34.238.166.126', 6881, torrent))
-
-        for peer_IP, peer_port in peers_data['peers']:
-            self.peers_list.append(peer(peer_IP, peer_port, torrent))
+            self.connection_manager.add_candidates([('34.238.166.126', 6881)])
+        else:
+            self.connection_manager.add_candidates(peers_data['peers'])
         
-        # bitfields from all peers
-        self.bitfield_pieces_count = dict()
+        # availability of pieces in swarm updated by the bitfields of peers
+        self.piece_availability = piece_availability(self.torrent.pieces_count)
 
         # selecting the top N peers / pieces
         self.top_n = self.torrent.client_request['max peers']
+        # pieces currently being downloaded : piece -> list of peers
+        self.pieces_downloading = dict()
+        # endgame mode : remaining pieces are requested from all the peers
+        self.endgame = False
 
         # peers logger object
         self.swarm_logger = torrent_logger('swarm', SWARM_LOG_FILE, DEBUG)
@@ -51,34 +60,57 @@ class swarm():
         self.torrent_stats_logger.set_console_logging()
 
         # bitfield for pieces downloaded from peers
-        self.bitfield_pieces_downloaded = set([])
+        self.bitfield_pieces_downloaded = piece_bitfield(self.torrent.pieces_count)
                 
         # file handler for downloading / uploading file data
         self.file_handler = None
-    
-        # minimum pieces to recieve randomly
-        self.minimum_pieces = 10
-
-        # check if the torrent file is for seeding
-        if torrent.client_request['seeding'] != None:
-            # client peer only need incase of seeding torrent
-            self.client_peer = peer(self.torrent.client_IP, self.torrent.client_port, self.torrent)
-            self.client_peer.initialize_seeding()
-        
-        # swarm lock for required for updating the global state
-        self.swarm_lock = Lock()
+
+        # fast resume state of pieces verified by client
+        self.fast_resume = None
+
+        # bytes uploaded to the peers which are closed
+        self.uploaded_bytes = 0
+        # seeding server uploading the pieces to leechers
+        self.seeding_server = None
+        # torrent seeded by the seeding server
+        self.seeding_torrent = None
+
+        # event loop driving all the peer connections of the swarm
+        self.engine = async_engine()
+        # pool of threads hashing the downloaded pieces (None hashes inline)
+        self.hashing_pool = None
+
+        # rate limits of the torrent, every peer is given the limiter of
+        # torrent along with its own per peer limit
+        self.download_limiter = rate_limiter([create_token_bucket(self.torrent.client_request['downloading rate'])])
+        self.upload_limiter = rate_limiter([create_token_bucket(self.torrent.client_request['uploading rate'])])
+        self.peer_rate_limit = self.torrent.client_request['peer rate']
+
+        # choker unchoking the peers which upload fastest to client, the
+        # seeding server ranks the leechers by its own choker
+        self.upload_slots = self.torrent.client_request['upload slots']
+        self.choker = choker(self.upload_slots)
+
+        # session shared by the torrents running in same process (if any)
+        self.session = None
 
     """
-        Updates bitfield count values obtained from peers in swarm
-        global state of count of different pieces available in swarm
-    """
-    def update_bitfield_count(self, bitfield_pieces):
-        for piece in bitfield_pieces:
-            if piece in self.bitfield_pieces_count.keys():
-                self.bitfield_pieces_count[piece] += 1
-            else:
-                self.bitfield_pieces_count[piece] = 1
- 
+        function makes the swarm use the resources shared by all torrents of
+        the session : event loop, connection limit, seeding server listening
+        on single port and the pool of threads hashing the pieces
+    """
+    def add_session(self, session):
+        self.session = session
+        # event loop of swarm is replaced by the event loop of session
+        self.engine.loop.close()
+        self.engine = session.engine
+        self.connection_manager.connection_limit = session.connection_limit
+        self.seeding_server = session.seeding_server
+        self.hashing_pool = session.hashing_pool
+        # global rate limits shared by all the torrents of session
+        self.download_limiter.add_bucket(session.download_bucket)
+        self.upload_limiter.add_bucket(session.upload_bucket)
+
     """
         The peer class must handle the downloaded file writing and reading 
         thus peer class must have the file handler for this purpose.
@@ -87,9 +119,36 @@ class swarm():
     def add_shared_file_handler(self, file_handler):
         # instantiate the torrent shared file handler class object
         self.file_handler = file_handler
-        for peer in self.peers_list:
+        for peer in self.connection_manager.active_peers():
             peer.add_file_handler(self.file_handler)
+
+    """
+        function creates the peer instance for the candidate peer which is
+        connected by the connection manager
+    """
+    def create_peer(self, peer_IP, peer_port):
+        peer = async_peer(peer_IP, peer_port, self.torrent)
+        peer.add_file_handler(self.file_handler)
+        peer.add_piece_availability(self.piece_availability)
+        peer.pieces_downloaded = self.bitfield_pieces_downloaded
+        peer.hashing_pool = self.hashing_pool
+        peer.peer_sock.set_rate_limiters(self.upload_limiter.peer_limiter(self.peer_rate_limit),
+                                         self.download_limiter.peer_limiter(self.peer_rate_limit))
+        return peer
     
+    """
+        function adds the fast resume state, the pieces client already has
+        from earlier download are not downloaded again from the peers
+    """
+    def add_fast_resume(self, fast_resume, resume_pieces):
+        self.fast_resume = fast_resume
+        self.bitfield_pieces_downloaded = piece_bitfield(self.torrent.pieces_count, resume_pieces)
+        for piece in self.bitfield_pieces_downloaded:
+            self.piece_availability.piece_completed(piece)
+        # used for EXCECUTION LOGGING
+        resume_log  = 'Pieces resumed from earlier download : ' + str(len(resume_pieces))
+        self.swarm_logger.log(resume_log)
+
     """
         functions checks if the file handler has been added or not
     """
@@ -102,26 +161,23 @@ class swarm():
         return True
 
     """
-        function performs the initial connection with peer by doing handshakes 
-        initializing bitfields and updating the global bitfield count
+        coroutine performs the initial connection with peer by doing handshakes 
+        and initializing bitfields, note that availability of pieces in swarm
+        is updated by the peer on recieving the bitfield and have messages
     """
-    def connect_to_peer(self, peer_index):
+    async def connect_to_peer(self, peer):
         # perfrom handshake with peer
-        self.peers_list[peer_index].initiate_handshake()
+        await peer.initiate_handshake()
         # recieve the bitfields from peer
-        peer_bitfield_pieces = self.peers_list[peer_index].initialize_bitfield()
-        self.swarm_lock.acquire()
-        # update the bitfield count value in swarm
-        self.update_bitfield_count(peer_bitfield_pieces) 
-        self.swarm_lock.release()
+        await peer.initialize_bitfield()
         # used for EXCECUTION LOGGING
-        self.swarm_logger.log(self.peers_list[peer_index].get_handshake_log())
+        self.swarm_logger.log(peer.get_handshake_log())
     
     """
         function checks if there are any active connections in swarm
     """
     def have_active_connections(self):
-        for peer in self.peers_list:
+        for peer in self.connection_manager.active_peers():
             if peer.peer_sock.peer_connection_active():
                 return True
         return False
@@ -130,7 +186,7 @@ class swarm():
         function checks if the download is completed or not
     """
     def download_complete(self):
-        return len(self.bitfield_pieces_downloaded) == self.torrent.pieces_count
+        return self.bitfield_pieces_downloaded.complete()
    
     """ 
         function helps in downloading torrrent file from peers
@@ -140,36 +196,42 @@ class swarm():
         # check if file handler is initialized
         if not self.have_file_handler():
             return False
-        # initialize bitfields asynchronously
-        for peer_index in range(len(self.peers_list)):
-            connect_peer_thread = Thread(target = self.connect_to_peer, args=(peer_index, ))
-            connect_peer_thread.start()
-        # asynchornously start downloading pieces of file from peers
-        download_thread = Thread(target = self.download_using_stratergies)
-        download_thread.start()
+        # download pieces of file from peers on the event loop
+        try:
+            download_status = self.engine.run(self.download_using_stratergies())
+        finally:
+            # stop the event loop once the file is downloaded, the event loop
+            # of session keeps running for the other torrents
+            if self.session is None:
+                self.engine.stop()
+            # write the resume state of all the pieces verified
+            if self.fast_resume is not None:
+                self.fast_resume.save()
+        return download_status
 
     """
         downloads the file from peers in swarm using some stratergies of peice
-        selection and peer selection respectively
+        selection and peer selection respectively. Every peer connected by the
+        connection manager is served by its own worker coroutine which picks
+        the next piece as soon as it finishes the current one, hence slow
+        peers never stall the fast peers
     """
-    def download_using_stratergies(self):
+    async def download_using_stratergies(self):
         self.download_start_time = time.time()
-        while not self.download_complete():
-            # select the pieces and peers for downloading
-            pieces = self.piece_selection_startergy()
-            peer_indices = self.peer_selection_startergy()
-
-            # asynchornously download the rarest pieces from the top four peers
-            downloading_thread_pool = []
-            for i in range(min(len(pieces), len(peer_indices))):
-                piece = pieces[i]
-                peer_index = peer_indices[i]
-                downloading_thread = Thread(target=self.download_piece, args=(piece, peer_index, ))
-                downloading_thread_pool.append(downloading_thread)
-                downloading_thread.start()
-            # wait untill you finish the downloading of the pieces
-            for downloading_thread in downloading_thread_pool:
-                downloading_thread.join()
+        # limits the number of pieces downloaded concurrently from peers
+        self.download_slots = asyncio.Semaphore(self.top_n)
+
+        # peers are rechoked by single task while the workers download
+        choker_task = asyncio.ensure_future(self.run_choker())
+        try:
+            # peers are connected and served by the downloading workers
+            await self.connection_manager.manage_connections(self.create_peer, self.peer_download_worker,
+                                                             self.download_complete)
+        finally:
+            choker_task.cancel()
+        if not self.download_complete():
+            self.swarm_logger.log('No active peer connections left in swarm ! ' + FAILURE)
+            return False
         self.download_end_time = time.time()
         
         # used for EXCECUTION LOGGING
@@ -180,138 +242,191 @@ class swarm():
         download_log += 'Happy Bittorrenting !'
         self.torrent_stats_logger.log(download_log)
 
+        # disconnect all the peers after downloading
+        self.connection_manager.close_connections()
+        return True
+
     """
-        function downloads piece given the peer index and updates the 
+        worker coroutine connects to the peer and keeps downloading pieces
+        from the peer untill the file is downloaded or peer is disconnected,
+        the pieces are selected from the shared state of the swarm
+    """
+    async def peer_download_worker(self, peer):
+        try:
+            await self.connect_to_peer(peer)
+            while not self.download_complete() and peer.peer_sock.peer_connection_active():
+                piece = self.piece_selection_startergy(peer)
+                # peer has no pieces which are not being downloaded, wait for
+                # the have messages from peer or pieces released by other peers
+                if piece is None:
+                    await peer.wait_for_message(1)
+                    continue
+                self.pieces_downloading.setdefault(piece, []).append(peer)
+                # duplicate download of piece in endgame mode is buffered
+                peer.download_buffered = len(self.pieces_downloading[piece]) > 1
+                try:
+                    # pieces requested again in endgame don't wait for free slot
+                    if self.endgame:
+                        await self.download_piece(piece, peer)
+                    else:
+                        async with self.download_slots:
+                            await self.download_piece(piece, peer)
+                finally:
+                    self.pieces_downloading[piece].remove(peer)
+                    if not self.pieces_downloading[piece]:
+                        del self.pieces_downloading[piece]
+        finally:
+            # bytes uploaded to the peer are added once peer is closed
+            self.uploaded_bytes += peer.torrent.statistics.num_bytes_uploaded
+            peer.torrent.statistics.num_bytes_uploaded = 0
+
+    """
+        coroutine rechokes all the connected peers every rechoke interval,
+        peers uploading fastest to the client are unchoked (tit-for-tat)
+    """
+    async def run_choker(self):
+        while True:
+            await asyncio.sleep(RECHOKE_INTERVAL)
+            self.choker.rechoke(self.connection_manager.active_peers())
+
+    """
+        coroutine downloads piece from the given peer and updates the 
         of downloaded pieces from the peers in swarm
     """
-    def download_piece(self, piece, peer_index):
+    async def download_piece(self, piece, peer):
         start_time = time.time()
-        is_piece_downloaded = self.peers_list[peer_index].piece_downlaod_FSM(piece)
+        is_piece_downloaded = await peer.piece_downlaod_FSM(piece)
         end_time = time.time()
-        if is_piece_downloaded:
-            # acquire lock for update the global data items
-            self.swarm_lock.acquire() 
+        if is_piece_downloaded and piece not in self.bitfield_pieces_downloaded:
             # update the bifields pieces downloaded
             self.bitfield_pieces_downloaded.add(piece)
-            # delete the pieces from the count of pieces
-            del self.bitfield_pieces_count[piece]
+            # record the verified piece for resuming the download
+            if self.fast_resume is not None:
+                self.fast_resume.piece_verified(piece)
+            # piece is no longer wanted from the swarm
+            self.piece_availability.piece_completed(piece)
+            # cancel the piece requested from other peers in endgame mode
+            for other_peer in self.pieces_downloading.get(piece, []):
+                if other_peer is not peer:
+                    other_peer.cancel_piece_download(piece)
             # update the torrent statistics
             self.torrent.statistics.update_start_time(start_time)
             self.torrent.statistics.update_end_time(end_time)
-            self.torrent.statistics.update_download_rate(piece, self.torrent.piece_length)
+            self.torrent.statistics.update_download_rate(piece, self.torrent.get_piece_length(piece))
             self.torrent_stats_logger.log(self.torrent.statistics.get_download_statistics())
-            # release the lock after downloading
-            self.swarm_lock.release() 
 
     """
         piece selection stratergy is completely based on the bittorrent client
         most used piece selection stratergies are random piece selection stratergy
         and rarest first piece selection startergy
     """
-    def piece_selection_startergy(self):
-        return self.rarest_pieces_first()
+    def piece_selection_startergy(self, peer):
+        piece = self.rarest_piece_first(peer)
+        if piece is None and self.endgame_mode():
+            piece = self.endgame_piece(peer)
+        return piece
 
     """ 
         rarest first piece selection stratergy always selects the rarest piece
-        in the swarm, note if there are multiple rarest pieces then the
-        function returns any random rarest piece.
-    """
-    def rarest_pieces_first(self):
-        # check if bitfields are recieved else wait for some time
-        while(len(self.bitfield_pieces_count) == 0):
-            time.sleep(5)
-        # get the rarest count of the pieces
-        rarest_piece_count = min(self.bitfield_pieces_count.values())
-        # find all the pieces with the rarest piece
-        rarest_pieces = [piece for piece in self.bitfield_pieces_count if 
-                         self.bitfield_pieces_count[piece] == rarest_piece_count] 
-        # shuffle among the random pieces 
-        random.shuffle(rarest_pieces)
-        # rarest pieces
-        return rarest_pieces[:self.top_n]
-
-    """
-        peer selection stratergy for selecting peer having particular piece
-        function returns the peer index from the list of peers in swarm
-    """
-    def peer_selection_startergy(self):
-        # used for AWS Cloud test
-        if self.torrent.client_request['AWS']:
-            return [self.select_specific_peer()]
-        # select random peers untill you have some pieces
-        if len(self.bitfield_pieces_downloaded) < self.minimum_pieces:
-            return self.select_random_peers()
-        # select the top peers with high download rates
-        else:
-            return self.top_peers()
+        in the swarm which the given peer has, the pieces being downloaded from
+        other peers are not selected again
+    """
+    def rarest_piece_first(self, peer):
+        return self.piece_availability.rarest_piece(peer.bitfield_pieces, self.pieces_downloading)
 
     """
-        random peer selection is implemented as given below.
+        function checks if the download has entered endgame mode, that is all
+        the remaining pieces are already being downloaded from the peers
+    """
+    def endgame_mode(self):
+        if not self.endgame:
+            pieces_remaining = self.torrent.pieces_count - len(self.bitfield_pieces_downloaded)
+            if 0 < pieces_remaining <= len(self.pieces_downloading):
+                self.endgame = True
+                # used for EXCECUTION LOGGING
+                endgame_log = 'Endgame mode : requesting ' + str(pieces_remaining) + ' pieces from all peers'
+                self.swarm_logger.log(endgame_log)
+        return self.endgame
+
     """
-    def select_random_peers(self):
-        peer_indices = []
-        # select all the peers that have pieces to offer
-        for index in range(len(self.peers_list)):
-            if len(self.peers_list[index].bitfield_pieces) != 0:
-                peer_indices.append(index)
-        random.shuffle(peer_indices)
-        return peer_indices[:self.top_n]
-    
+        endgame piece selection selects the piece being downloaded from other
+        peers which the given peer has, the piece requested from least number
+        of peers is selected. The first copy of piece recieved cancels others
+    """
+    def endgame_piece(self, peer):
+        endgame_pieces = [piece for piece, downloading_peers in self.pieces_downloading.items()
+                          if peer.have_piece(piece) and peer not in downloading_peers
+                          and piece not in self.bitfield_pieces_downloaded]
+        if not endgame_pieces:
+            return None
+        return min(endgame_pieces, key=lambda piece : len(self.pieces_downloading[piece]))
+
     """
-        selects the specific peer in the list(used only for testing of seeding)
+        function adds the peers recieved by announcing to the trackers in the
+        candidate peers of swarm, function can be called from any thread
     """
-    def select_specific_peer(self):
-        peer_index = 0
-        return peer_index
-        
+    def add_peers(self, peers):
+        if self.engine.engine_started and not self.engine.loop.is_closed():
+            try:
+                self.engine.loop.call_soon_threadsafe(self.connection_manager.add_candidates, peers)
+            except RuntimeError:
+                pass
+        else:
+            self.connection_manager.add_candidates(peers)
+
+    """
+        function sets whether more peers are expected from the trackers, the
+        swarm keeps waiting for the peers while trackers have not responded
     """
-        selects the top fours peer having maximum download rates
-        sort the peers in by the rate of downloading and selects top four
+    def awaiting_peers(self, awaiting):
+        if self.engine.engine_started and not self.engine.loop.is_closed():
+            try:
+                self.engine.loop.call_soon_threadsafe(setattr, self.connection_manager, 'awaiting_candidates', awaiting)
+            except RuntimeError:
+                pass
+        else:
+            self.connection_manager.awaiting_candidates = awaiting
+
     """
-    def top_peers(self):
-        # sort the peer list according peer comparator
-        self.peers_list = sorted(self.peers_list, key=self.peer_comparator, reverse=True)
-        # top 4 peer index
-        return [peer_index for peer_index in range(self.top_n)]
+        function returns the bytes (uploaded, downloaded, left) of torrent
+        in this session of client, used for announcing to the trackers
+    """
+    def transfer_statistics(self):
+        uploaded = self.uploaded_bytes
+        if self.seeding_torrent is not None:
+            uploaded += self.seeding_torrent.uploaded_bytes
+        for peer in self.connection_manager.active_peers():
+            uploaded += peer.torrent.statistics.num_bytes_uploaded
+        downloaded = self.torrent.statistics.num_bytes_downloaded
+        if self.torrent.client_request['seeding'] != None:
+            return (uploaded, downloaded, 0)
+        left = sum(self.torrent.get_piece_length(piece) for piece in range(self.torrent.pieces_count)
+                   if piece not in self.bitfield_pieces_downloaded)
+        return (uploaded, downloaded, left)
 
     """
-        comparator function for sorting the peer with highest downloading rate
+        function helps in seeding the given pieces of file in swarm, all the 
+        leecher connections are served by the event driven seeding server.
+        Note that seeding server of session is shared by all the seeding
+        torrents, the torrent is only added to it and function returns
+        immediately (torrent is seeded untill stop_seeding is called)
+    """
+    def seed_file(self, seeding_pieces):
+        if self.session is None:
+            self.seeding_server = seeding_server(self.torrent.client_IP, self.torrent.client_port)
+        self.seeding_torrent = self.seeding_server.add_torrent(self.torrent, self.file_handler, seeding_pieces,
+                                                               self.upload_limiter, self.peer_rate_limit,
+                                                               self.upload_slots)
+        if self.session is not None:
+            return
+        try:
+            self.seeding_server.serve_forever()
+        finally:
+            self.stop_seeding()
+
     """
-    def peer_comparator(self, peer):
-        if not peer.peer_sock.peer_connection_active():
-            return -sys.maxsize
-        return peer.torrent.statistics.avg_download_rate
-    
+        function stops seeding the torrent to new leechers
     """
-        function helps in seeding the file in swarm
-    """
-    def seed_file(self):
-        seeding_log = 'Seeding started by client at ' + self.client_peer.unique_id
-        self.swarm_logger.log(seeding_log)
-        seeding_file_forever = True
-        while seeding_file_forever:
-            recieved_connection = self.client_peer.recieve_connection()
-            if recieved_connection != None:
-                # extract the connection socket and IP address of connection
-                peer_socket, peer_address = recieved_connection
-                peer_IP, peer_port = peer_address
-                # make peer class object  
-                peer_object = peer(peer_IP, peer_port, self.torrent, peer_socket)
-                peer_object.set_bitfield() 
-                peer_object.add_file_handler(self.file_handler)
-                # start uploading file pieces to this peer
-                Thread(target = self.upload_file, args=(peer_object,)).start()
-            else:
-                time.sleep(1)
-
-    """
-        function helps in uploading the file pieces to given peer when requested
-    """
-    def upload_file(self, peer):
-        # initial seeding messages
-        if not peer.initial_seeding_messages():
-            return 
-        # after inital messages start exchanging uploading message
-        peer.piece_upload_FSM()
-
+    def stop_seeding(self):
+        self.seeding_server.remove_torrent(self.torrent.torrent_metadata.info_hash)
 
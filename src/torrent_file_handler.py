@@ -1,3 +1,4 @@
+import os
 import sys
 
 # bencodepy module for reading the torrent metadata
@@ -139,8 +140,11 @@ class torrent_file_reader(torrent_metadata):
             # if the current torrent file could have multiple files with paths
             elif type(value) == list and new_key == 'files':
                 torrent_extract[new_key] = list(map(lambda x : self.extract_torrent_metadata(x), value))
-            elif type(value) == list and new_key == 'path':
-                torrent_extract[new_key] = value[0].decode(self.encoding)
+            elif type(value) == list and new_key in ('path', 'path.utf-8'):
+                torrent_extract[new_key] = self.extract_file_path(value)
+            # tiers of the tracker urls, all the trackers in every tier are used
+            elif type(value) == list and new_key == 'announce-list':
+                torrent_extract[new_key] = self.extract_tracker_urls(value)
             # url list parameter
             elif type(value) == list and new_key == 'url-list' or new_key == 'collections':
                 torrent_extract[new_key] = list(map(lambda x : x.decode(self.encoding), value))
@@ -162,6 +166,24 @@ class torrent_file_reader(torrent_metadata):
         # torrent extracted metadata
         return torrent_extract
 
+    # tracker urls from all the tiers of announce list without duplicates
+    def extract_tracker_urls(self, tracker_tiers):
+        tracker_urls = []
+        for tracker_tier in tracker_tiers:
+            for raw_tracker_url in tracker_tier:
+                tracker_url = raw_tracker_url.decode(self.encoding)
+                if tracker_url not in tracker_urls:
+                    tracker_urls.append(tracker_url)
+        return tracker_urls
+
+    # relative file path from the list of path components of the file, the
+    # components which can escape the download directory are ignored
+    def extract_file_path(self, path_components):
+        path_components = [component.decode(self.encoding) for component in path_components]
+        path_components = [component for component in path_components 
+                           if component not in ('', '.', '..') and os.sep not in component]
+        return os.path.join(*path_components) if path_components else '_'
+
     # info_hash from the torrent file
     def generate_info_hash(self):
         sha1_hash = hashlib.sha1()
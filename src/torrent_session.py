@@ -0,0 +1,199 @@
+import os
+import time
+from copy import copy
+from threading import *
+from concurrent.futures import ThreadPoolExecutor, wait
+
+# bittorrent client module downloading / seeding single torrent
+from client import *
+
+# asyncio engine running the event loop shared by the torrents
+from async_engine import async_engine
+
+# connection limit shared by all the torrents of session
+from connection_manager import connection_limit
+
+# seeding server listening on single port for all the torrents
+from seeding_server import seeding_server
+
+# cache of open files shared by all the torrents of session
+from shared_file_handler import file_descriptor_cache
+
+# global rate limits shared by all the torrents of session
+from rate_limiter import create_token_bucket
+
+# torrent logger module for execution logging
+from torrent_logger import *
+
+# torrent error module for handling the exception
+from torrent_error import *
+
+"""
+    Torrent session runs many torrents in the same process, every torrent is
+    handled by its own bittorrent client however the resources are shared by
+    all the torrents of session :
+    * single listening port, leechers are routed to torrent by info hash
+    * single event loop driving the peer connections of all the downloads
+    * pool of threads hashing the pieces and cache of open files
+    * limit on peer connections and on the number of active torrents
+    * global download / upload rate limits (in Kbps)
+
+    The torrents above the limit of active torrents are queued and started
+    once the active torrent is completed (downloading torrent is completed
+    when the file is downloaded, seeding torrent once its pieces are checked
+    and it is added to the seeding server, where it is seeded untill session
+    is stopped without holding the active torrent)
+"""
+
+# maximum number of torrents downloading / seeding at the same time
+SESSION_ACTIVE_TORRENTS = 8
+# maximum number of peer connections of all the torrents
+SESSION_MAX_CONNECTIONS = 200
+# time for which the active torrents are given to stop (seconds)
+SESSION_STOP_TIMEOUT = 10
+
+class torrent_session():
+
+    def __init__(self, max_active_torrents = SESSION_ACTIVE_TORRENTS,
+                 max_connections = SESSION_MAX_CONNECTIONS, client_IP = '', client_port = 6881,
+                 download_rate = None, upload_rate = None):
+        self.max_active_torrents = max_active_torrents
+
+        # event loop shared by the swarms of all the torrents
+        self.engine = async_engine('session_engine')
+        # limit of peer connections made and accepted by all the torrents
+        self.connection_limit = connection_limit(max_connections)
+        # seeding server on the client port serving all seeding torrents
+        self.seeding_server = seeding_server(client_IP, client_port, connection_limit = self.connection_limit)
+        # pool of threads hashing the pieces of all the torrents
+        self.hashing_pool = ThreadPoolExecutor(max_workers = os.cpu_count() or 1, thread_name_prefix = 'hashing')
+        # open files of all the multi file torrents
+        self.descriptor_cache = file_descriptor_cache()
+        # token buckets of global rate limits (None if not limited)
+        self.download_bucket = create_token_bucket(download_rate)
+        self.upload_bucket = create_token_bucket(upload_rate)
+
+        # every active torrent is run by a thread of the pool, the torrents
+        # above the limit are queued untill active torrent is completed
+        self.torrents_pool = ThreadPoolExecutor(max_workers = max_active_torrents, thread_name_prefix = 'torrent')
+        self.torrent_futures = []
+        # clients of the torrents seeded by the seeding server of session
+        self.seeding_clients = []
+        self.seeding_lock = Lock()
+        self.stopping = False
+
+        # session logger
+        self.session_logger = torrent_logger('session', BITTORRENT_LOG_FILE, DEBUG)
+        self.session_logger.set_console_logging()
+
+    """
+        function starts the shared event loop and seeding server
+    """
+    def start(self):
+        self.engine.start()
+        self.seeding_server.start()
+        # used for EXCECUTION LOGGING
+        session_log  = 'Session started (active torrents : ' + str(self.max_active_torrents)
+        session_log += ', connections : ' + str(self.connection_limit.max_connections) + ')'
+        self.session_logger.log(session_log)
+
+    """
+        function adds the torrent in session given the user arguments of
+        torrent, torrent is queued if limit of active torrents is reached
+    """
+    def add_torrent(self, user_arguments):
+        torrent_future = self.torrents_pool.submit(self.run_torrent, copy(user_arguments))
+        self.torrent_futures.append(torrent_future)
+        return torrent_future
+
+    """
+        function runs the torrent in thread of the pool, returns true if the
+        torrent is downloaded / seeded successfully
+    """
+    def run_torrent(self, user_arguments):
+        torrent_file_path = user_arguments[TORRENT_FILE_PATH]
+        try:
+            client = bittorrent_client(user_arguments, self)
+            client.contact_trackers()
+            client.initialize_swarm()
+            client.event_loop()
+        except Exception as err:
+            self.session_logger.log('Torrent ' + torrent_file_path + ' failed : ' + str(err) + ' ' + FAILURE)
+            return False
+        if client.client_request['seeding'] is not None:
+            self.add_seeding_client(client)
+            self.session_logger.log('Torrent ' + torrent_file_path + ' seeding ' + SUCCESS)
+            return True
+        self.session_logger.log('Torrent ' + torrent_file_path + ' completed ' + SUCCESS)
+        return True
+
+    """
+        function adds the client whose torrent is seeded in background, the
+        torrent added while session is stopping is stopped immediately
+    """
+    def add_seeding_client(self, client):
+        with self.seeding_lock:
+            if not self.stopping:
+                self.seeding_clients.append(client)
+                return
+        client.stop_seeding()
+
+    """
+        function stops all the torrents seeded in background concurrently,
+        every torrent announces the stopped event to its trackers
+    """
+    def stop_seeding_clients(self):
+        with self.seeding_lock:
+            self.stopping = True
+            seeding_clients = self.seeding_clients
+            self.seeding_clients = []
+        stop_threads = [Thread(target = client.stop_seeding, name = 'stop_seeding', daemon = True)
+                        for client in seeding_clients]
+        for stop_thread in stop_threads:
+            stop_thread.start()
+        stop_deadline = time.time() + SESSION_STOP_TIMEOUT
+        for stop_thread in stop_threads:
+            stop_thread.join(max(stop_deadline - time.time(), 0))
+
+    """
+        function blocks untill all the torrents of session are completed, the
+        seeding torrents are seeded untill the session is stopped
+    """
+    def wait_torrents(self):
+        wait(self.torrent_futures)
+        with self.seeding_lock:
+            seeding = len(self.seeding_clients) != 0
+        if seeding:
+            self.seeding_server.wait_stopped()
+
+    """
+        function stops the session, the seeding torrents announce stopped
+        event to the trackers and shared resources are closed
+    """
+    def stop(self):
+        # queued torrents are not started once session is stopped (futures
+        # are cancelled by hand since cancel_futures needs python 3.9)
+        for torrent_future in self.torrent_futures:
+            torrent_future.cancel()
+        self.torrents_pool.shutdown(wait = False)
+        self.seeding_server.stop()
+        wait(self.torrent_futures, timeout = SESSION_STOP_TIMEOUT)
+        # leechers are disconnected before the seeded files are closed
+        self.seeding_server.close()
+        self.stop_seeding_clients()
+        self.engine.stop()
+        self.hashing_pool.shutdown(wait = False)
+        self.session_logger.log('Session stopped !')
+
+    """
+        function runs all the given torrents in session untill they are
+        completed or the session is interrupted by the user
+    """
+    def run(self, torrents_arguments):
+        self.start()
+        try:
+            for user_arguments in torrents_arguments:
+                self.add_torrent(user_arguments)
+            self.wait_torrents()
+        finally:
+            self.stop()
@@ -1,5 +1,6 @@
 import time
 from datetime import timedelta
+from piece_bitfield import piece_bitfield
 
 """
     Torrent statistics included number of pieces downloaded/uploaded. The
@@ -10,8 +11,11 @@ from datetime import timedelta
 class torrent_statistics():
     # initialize all the torrent statics information
     def __init__(self, torrent_metadata):
-        self.uploaded               = set([])   # pieces uploaded
-        self.downloaded             = set([])   # pieces downloaded
+        # total pieces in file to be downloaded
+        self.total_pieces           = int(len(torrent_metadata.pieces) / 20)
+
+        self.uploaded               = piece_bitfield(self.total_pieces)   # pieces uploaded
+        self.downloaded             = piece_bitfield(self.total_pieces)   # pieces downloaded
         self.upload_rate            = 0.0       # upload rate   (kbps)
         self.download_rate          = 0.0       # download rate (kbps)
     
@@ -26,16 +30,17 @@ class torrent_statistics():
         
         self.event_start_time       = 0         # start time of event
         self.event_end_time         = 0         # end time of event
+        self.min_event_time         = 0.001     # time resolution of event
         
         self.num_pieces_downloaded  = 0         # blocks/pieces downloaded
         self.num_pieces_uploaded    = 0         # blocks/pieces uplaoded
         self.num_pieces_left        = 0         # blocks/pieces left
+        self.num_bytes_downloaded   = 0         # bytes downloaded
+        self.num_bytes_uploaded     = 0         # bytes uploaded
         
 
         # file in bytes to be downloaded
         self.file_size              = torrent_metadata.file_size
-        # total pieces in file to be downloaded
-        self.total_pieces           = int(len(torrent_metadata.pieces) / 20)
         # percentage of file downloaded by the client 
         self.file_downloading_percentage = 0.0
         # time remaining for complete download 
@@ -61,6 +66,8 @@ class torrent_statistics():
     def update_download_rate(self, piece_index, piece_size):
         # calculate the time for downloading
         time = (self.event_end_time - self.event_start_time) / 2
+        # pipelined blocks can be recieved at same instant of time
+        time = max(time, self.min_event_time)
 
         piece_size_kb = piece_size / (2 ** 10)
         self.download_rate = round(piece_size_kb / time, 2)
@@ -69,6 +76,7 @@ class torrent_statistics():
         self.downloaded.add(piece_index)
         # update the num blocks downloaded
         self.num_pieces_downloaded += 1
+        self.num_bytes_downloaded += piece_size
 
         # update the avg download rate
         self.total_download_rate += self.download_rate
@@ -90,12 +98,15 @@ class torrent_statistics():
     def update_upload_rate(self, piece_index, piece_size):
         # calculate the time for uploading
         time = (self.event_end_time - self.event_start_time) / 2
+        # pipelined blocks can be recieved at same instant of time
+        time = max(time, self.min_event_time)
 
         piece_size_kb = piece_size / (2 ** 10)
         self.upload_rate = round(piece_size_kb / time, 2)
         
         # update the num blocks downloaded
         self.num_pieces_uploaded += 1
+        self.num_bytes_uploaded += piece_size
 
         # update the avg download rate
         self.total_upload_rate += self.upload_rate
@@ -18,6 +18,10 @@ from beautifultable import BeautifulTable
 # socket module for tracker requests
 from socket import *
 
+# threads for announcing the trackers concurrently
+import queue
+from threading import Thread, Lock, Event
+
 """
     Trackers are required to obtain the list of peers currently participating
     in the file sharing process and client must know how to communicate with 
@@ -29,24 +33,81 @@ from socket import *
     Tracker class stores the information that is needed for communicating with
     the tracker URL servers. The request paramters are included as given below
 """
+
+# announce events sent to the tracker, no event is sent on regular announce
+STARTED_EVENT   = 'started'
+COMPLETED_EVENT = 'completed'
+STOPPED_EVENT   = 'stopped'
+
+# number of peers requested from the tracker in every announce
+TRACKER_NUMWANT = 200
+
+"""
+    functions parse the compact peers given by the trackers, every peer is
+    given by IP address (4 bytes IPv4 or 16 bytes IPv6) and 2 bytes port
+    in network byte order. Peers are unpacked in bulk over the peers data
+"""
+def parse_compact_peers(raw_peers_data):
+    raw_peers_data = memoryview(raw_peers_data)
+    raw_peers_data = raw_peers_data[:len(raw_peers_data) - len(raw_peers_data) % 6]
+    return [(inet_ntoa(peer_IP), peer_port) for peer_IP, peer_port in struct.iter_unpack("!4sH", raw_peers_data)]
+
+def parse_compact_peers6(raw_peers_data):
+    raw_peers_data = memoryview(raw_peers_data)
+    raw_peers_data = raw_peers_data[:len(raw_peers_data) - len(raw_peers_data) % 18]
+    return [(inet_ntop(AF_INET6, peer_IP), peer_port) for peer_IP, peer_port in struct.iter_unpack("!16sH", raw_peers_data)]
+
+"""
+    function parses the peers given as list of dictionaries (non compact)
+"""
+def parse_dictionary_peers(raw_peers_list):
+    peers_list = []
+    for raw_peer in raw_peers_list:
+        if b'ip' not in raw_peer or b'port' not in raw_peer:
+            continue
+        peer_IP = raw_peer[b'ip']
+        if type(peer_IP) == bytes:
+            peer_IP = peer_IP.decode('utf-8', 'replace')
+        peers_list.append((peer_IP, raw_peer[b'port']))
+    return peers_list
+
+# HTTP session shared by all the HTTP trackers, keeps the connections alive
+http_tracker_session = requests.Session()
+
 class tracker_data():
     # contructs the tracker request data 
     def __init__(self, torrent):
         self.compact = 1
+        # bytes left to be downloaded when client starts
+        if torrent.client_request['seeding'] != None:
+            left = 0
+        else:
+            left = torrent.torrent_metadata.file_size
         # the request parameters of the torrent 
         self.request_parameters = {
             'info_hash' : torrent.torrent_metadata.info_hash,
             'peer_id'   : torrent.peer_id,
             'port'      : torrent.client_port,
-            'uploaded'  : torrent.statistics.num_pieces_uploaded,
-            'downloaded': torrent.statistics.num_pieces_downloaded,
-            'left'      : torrent.statistics.num_pieces_left,
-            'compact'   : self.compact
+            'uploaded'  : 0,
+            'downloaded': 0,
+            'left'      : left,
+            'compact'   : self.compact,
+            'event'     : STARTED_EVENT,
+            'numwant'   : TRACKER_NUMWANT,
+            'trackerid' : None
         }
-        self.interval   = None
-        self.complete   = None
-        self.incomplete = None
-        self.peers_list = [] 
+        self.interval       = None
+        self.min_interval   = None
+        self.complete       = None
+        self.incomplete     = None
+        self.peers_list     = [] 
+
+    # updates the request parameters for the next announce to the tracker
+    def update_request_parameters(self, uploaded, downloaded, left, event = None):
+        self.request_parameters['uploaded']     = uploaded
+        self.request_parameters['downloaded']   = downloaded
+        self.request_parameters['left']         = left
+        self.request_parameters['event']        = event
 
 
 
@@ -70,16 +131,28 @@ class http_torrent_tracker(tracker_data):
         # try establishing a connection to the tracker
         try:
             # the reponse from HTTP tracker is an bencoded dictionary 
-            bencoded_response = requests.get(self.tracker_url, self.request_parameters, timeout=5)
+            bencoded_response = http_tracker_session.get(self.tracker_url, params=self.request_parameters, timeout=5)
             # decode the bencoded dictionary to python ordered dictionary 
             raw_response_dict = bencodepy.decode(bencoded_response.content)
-            # parse the dictionary containing raw data
-            self.parse_http_tracker_response(raw_response_dict)
-            return True
         except Exception as error_msg:
             # cannont establish a connection with the tracker
             self.tracker_logger.log(self.tracker_url + ' connection failed !' + FAILURE) 
             return False
+        # tracker has rejected the announce request
+        if b'failure reason' in raw_response_dict:
+            failure_reason = raw_response_dict[b'failure reason'].decode('utf-8', 'replace')
+            self.tracker_logger.log(self.tracker_url + ' failure : ' + failure_reason + FAILURE)
+            return False
+        if b'warning message' in raw_response_dict:
+            warning_message = raw_response_dict[b'warning message'].decode('utf-8', 'replace')
+            self.tracker_logger.log(self.tracker_url + ' warning : ' + warning_message)
+        # parse the dictionary containing raw data
+        try:
+            self.parse_http_tracker_response(raw_response_dict)
+        except (struct.error, TypeError, ValueError, OSError) as error_msg:
+            self.tracker_logger.log(self.tracker_url + ' invalid response : ' + str(error_msg) + FAILURE)
+            return False
+        return True
 
     # extract the important information for the HTTP response dictionary 
     def parse_http_tracker_response(self, raw_response_dict):
@@ -88,21 +161,23 @@ class http_torrent_tracker(tracker_data):
         if b'interval' in raw_response_dict:
             self.interval = raw_response_dict[b'interval']
 
+        # min interval : client must not reannounce more frequently than this
+        if b'min interval' in raw_response_dict:
+            self.min_interval = raw_response_dict[b'min interval']
+
         # list of peers form the participating the torrent
+        self.peers_list = []
         if b'peers' in raw_response_dict:
-            self.peers_list = []
-            # extract the raw peers data 
             raw_peers_data = raw_response_dict[b'peers']
-            # create a list of each peer information which is of 6 bytes
-            raw_peers_list = [raw_peers_data[i : 6 + i] for i in range(0, len(raw_peers_data), 6)]
-            # extract all the peer id, peer IP and peer port
-            for raw_peer_data in raw_peers_list:
-                # extract the peer IP address 
-                peer_IP = ".".join(str(int(a)) for a in raw_peer_data[0:4])
-                # extract the peer port number
-                peer_port = raw_peer_data[4] * 256 + raw_peer_data[5]
-                # append the (peer IP, peer port)
-                self.peers_list.append((peer_IP, peer_port))
+            # peers are given either in compact form or list of dictionaries
+            if type(raw_peers_data) == bytes:
+                self.peers_list += parse_compact_peers(raw_peers_data)
+            else:
+                self.peers_list += parse_dictionary_peers(raw_peers_data)
+        
+        # list of IPv6 peers in compact form
+        if b'peers6' in raw_response_dict:
+            self.peers_list += parse_compact_peers6(raw_response_dict[b'peers6'])
             
         # number of peers with the entire file aka seeders
         if b'complete' in raw_response_dict:
@@ -114,7 +189,32 @@ class http_torrent_tracker(tracker_data):
         
         # tracker id must be sent back by the user on announcement
         if b'tracker id' in raw_response_dict:
-            self.tracker_id = raw_response_dict[b'tracker id']
+            self.request_parameters['trackerid'] = raw_response_dict[b'tracker id']
+
+    # scrape URL of the tracker is given by replacing announce in the last
+    # component of the announce URL, returns None if scrape isn't supported
+    def scrape_url(self):
+        url_components = self.tracker_url.rsplit('/', 1)
+        if len(url_components) != 2 or not url_components[1].startswith('announce'):
+            return None
+        return url_components[0] + '/scrape' + url_components[1][len('announce'):]
+
+    # scrapes the HTTP tracker for the swarm of torrent, returns dictionary
+    # of seeders, completed and leechers else None if tracker doesn't respond
+    def scrape(self):
+        scrape_url = self.scrape_url()
+        if scrape_url is None:
+            return None
+        info_hash = self.request_parameters['info_hash']
+        try:
+            bencoded_response = http_tracker_session.get(scrape_url, params={'info_hash' : info_hash}, timeout=5)
+            torrent_scrape = bencodepy.decode(bencoded_response.content)[b'files'][info_hash]
+            return {'seeders'   : torrent_scrape[b'complete'], 
+                    'completed' : torrent_scrape[b'downloaded'],
+                    'leechers'  : torrent_scrape[b'incomplete']}
+        except Exception as error_msg:
+            self.tracker_logger.log(self.tracker_url + ' scrape failed !' + FAILURE) 
+            return None
 
     # API function for creating the getting the peer data recivied by HTTP tracker
     def get_peers_data(self):
@@ -136,19 +236,117 @@ class http_torrent_tracker(tracker_data):
         # number of seeders
         tracker_table.rows.append(['Number of seeders', str(self.complete)])
         # number of peers recieved
-        peer_data  = '(' +  self.peers_list[0][0] + ' : '
-        peer_data += str(self.peers_list[0][1]) + ')\n'
-        peer_data += '... ' + str(len(self.peers_list) - 1) + ' more peers'
+        peer_data = 'No peers recieved'
+        if self.peers_list:
+            peer_data  = '(' +  self.peers_list[0][0] + ' : '
+            peer_data += str(self.peers_list[0][1]) + ')\n'
+            peer_data += '... ' + str(len(self.peers_list) - 1) + ' more peers'
         tracker_table.rows.append(['Peers in swarm', peer_data])
 
         return str(tracker_table)
 
 
+# event codes used in announce request of UDP tracker
+UDP_ANNOUNCE_EVENTS = { None : 0, COMPLETED_EVENT : 1, STARTED_EVENT : 2, STOPPED_EVENT : 3 }
+
+# actions of the UDP tracker protocol
+UDP_CONNECT_ACTION  = 0
+UDP_ANNOUNCE_ACTION = 1
+UDP_SCRAPE_ACTION   = 2
+UDP_ERROR_ACTION    = 3
+
+# magic connection id used for the connect request
+UDP_PROTOCOL_ID = 0x41727101980
+# request is retransmitted after 15 * 2 ^ n seconds, n = 0, 1, ... 8
+UDP_BASE_TIMEOUT = 15
+UDP_MAX_RETRIES  = 8
+# retries for scrape and stopped announce, which must not block for long
+UDP_SHORT_RETRIES = 1
+# retries and overall time of the started announce which client waits for
+UDP_STARTED_RETRIES  = 2
+UDP_STARTED_DEADLINE = 45
+# overall time of the scrape and stopped announce (seconds)
+UDP_SHORT_DEADLINE = 10
+# connection id can be used for one minute after recieving it (seconds)
+UDP_CONNECTION_ID_VALIDITY = 60
+
+"""
+    UDP socket shared by all the UDP trackers, the requests of all trackers
+    are sent over the same socket and the responses recieved by a background
+    thread are matched with the requests by their 32 bit transaction id
+"""
+class udp_tracker_socket():
+
+    def __init__(self):
+        self.sock = socket(AF_INET, SOCK_DGRAM)
+        self.sock.bind(('', 0))
+        # pending transactions : transaction id -> [event, response]
+        self.pending_transactions = {}
+        self.transactions_lock = Lock()
+        # thread recieving the responses of all the trackers
+        self.reciever_thread = Thread(target = self.recieve_responses, name = 'udp_tracker_socket', daemon = True)
+        self.reciever_thread.start()
+
+    # creates new transaction with unique random transaction id
+    def new_transaction(self):
+        with self.transactions_lock:
+            transaction_id = rd.getrandbits(32)
+            while transaction_id in self.pending_transactions:
+                transaction_id = rd.getrandbits(32)
+            self.pending_transactions[transaction_id] = [Event(), None]
+        return transaction_id
+
+    # sends the request payload to the tracker address
+    def send(self, payload, tracker_address):
+        self.sock.sendto(payload, tracker_address)
+
+    # waits for the response of the transaction, returns None on timeout
+    def wait_response(self, transaction_id, timeout):
+        transaction = self.pending_transactions[transaction_id]
+        transaction[0].wait(timeout)
+        return transaction[1]
+
+    # removes the transaction once the response is recieved or timed out
+    def end_transaction(self, transaction_id):
+        with self.transactions_lock:
+            self.pending_transactions.pop(transaction_id, None)
+
+    # recieves the responses and hands them to the pending transactions
+    def recieve_responses(self):
+        while True:
+            try:
+                raw_response, tracker_address = self.sock.recvfrom(65536)
+            except OSError:
+                continue
+            if len(raw_response) < 8:
+                continue
+            transaction_id = struct.unpack_from("!I", raw_response, 4)[0]
+            with self.transactions_lock:
+                transaction = self.pending_transactions.get(transaction_id)
+                if transaction is not None and transaction[1] is None:
+                    transaction[1] = raw_response
+                    transaction[0].set()
+
+
+# UDP socket shared by the UDP trackers created on first use
+shared_udp_socket = None
+shared_udp_socket_lock = Lock()
+
+def get_udp_tracker_socket():
+    global shared_udp_socket
+    with shared_udp_socket_lock:
+        if shared_udp_socket is None:
+            shared_udp_socket = udp_tracker_socket()
+    return shared_udp_socket
+
+
 """
     Class UDP torrent tracker helps the client communicate to any UDP torrent 
     tracker. However the base class data of torrent remains the same only way
     to communicate will change. Note that given below class implements the
     UDP Tracker Protcol mentioned at "https://libtorrent.org/udp_tracker_protocol.html"
+    (BEP 15) : requests are retransmitted after 15 * 2 ^ n seconds and the
+    connection id is reused for one minute after it is recieved
 """
 class udp_torrent_tracker(tracker_data):
     
@@ -160,13 +358,16 @@ class udp_torrent_tracker(tracker_data):
         # tracker logger 
         self.tracker_logger = torrent_logger(self.tracker_url, TRACKER_LOG_FILE, DEBUG)
         
-        # connection id : initially a magic number
-        self.connection_id = 0x41727101980                       
-        # action : initially set to connection request action
-        self.action = 0x0                                            
-        # transaction id : random id to be set by the client
-        self.transaction_id = int(rd.randrange(0, 255))          
-        
+        # connection id and the time at which it was recieved
+        self.connection_id = None
+        self.connection_time = 0
+        # key identifying the client across announces
+        self.key = rd.getrandbits(32)
+        # resolved address of the tracker
+        self.tracker_address = None
+
+        self.leechers = None
+        self.seeders = None
     
     # parse the UDP tracker URL : the function returns (hostname, port)
     def parse_udp_tracker_url(self, tracker_url):
@@ -176,101 +377,101 @@ class udp_torrent_tracker(tracker_data):
         return (udp_tracker_url, udp_tracker_port)
 
 
-    # attempts to connect to UDP tracker
-    # returns true if conncetion is established false otherwise
+    # attempts to announce to the UDP tracker
+    # returns true if announce response is recieved false otherwise
     def request_torrent_information(self):
-
-        # create a socket for sending request and recieving responses
-        self.tracker_sock = socket(AF_INET, SOCK_DGRAM) 
-        self.tracker_sock.settimeout(5)
-
-        # connection payload for UDP tracker connection request
-        connection_payload = self.build_connection_payload()
-        
-        # attempt connecting and announcing the UDP tracker
+        # client waits for the started announce and the stopped announce is
+        # made while stopping, hence they are not retransmitted for long
+        if self.request_parameters['event'] == STARTED_EVENT:
+            max_retries, deadline = UDP_STARTED_RETRIES, time.time() + UDP_STARTED_DEADLINE
+        elif self.request_parameters['event'] == STOPPED_EVENT:
+            max_retries, deadline = UDP_SHORT_RETRIES, time.time() + UDP_SHORT_DEADLINE
+        else:
+            max_retries, deadline = UDP_MAX_RETRIES, None
         try:
-            # get the connection id from the connection request 
-            self.connection_id = self.udp_connection_request(connection_payload)
-            
-            # annouce payload for UDP tracker 
-            announce_payload = self.build_announce_payload()
-            self.raw_announce_reponse = self.udp_announce_request(announce_payload)
-            
+            raw_announce_reponse = self.udp_request(UDP_ANNOUNCE_ACTION, self.build_announce_payload(),
+                                                    max_retries, deadline)
             # extract the peers IP, peer port from the announce response
-            self.parse_udp_tracker_response(self.raw_announce_reponse)
-            
-            # close the socket once the reponse is obtained
-            self.tracker_sock.close()
-            
-            if self.peers_list and len(self.peers_list) != 0:
-                return True
-            else:
-                return False
-        except Exception as error_msg:
-            self.tracker_logger.log(self.tracker_url + str(error_msg) + FAILURE)
-            # close the socket if the response is not obtained
-            self.tracker_sock.close()
+            self.parse_udp_tracker_response(raw_announce_reponse)
+            return True
+        except (OSError, struct.error, torrent_error) as error_msg:
+            self.tracker_logger.log(self.tracker_url + ' ' + str(error_msg) + FAILURE)
             return False
-            
 
-    # creates the connection payload for the UDP tracker 
-    def build_connection_payload(self):
-        req_buffer  = struct.pack("!q", self.connection_id)     # first 8 bytes : connection_id
-        req_buffer += struct.pack("!i", self.action)            # next 4 bytes  : action
-        req_buffer += struct.pack("!i", self.transaction_id)    # next 4 bytes  : transaction_id
-        return req_buffer
 
-
-    # recieves the connection reponse from the tracker
-    def udp_connection_request(self, connection_payload):
-        # send the connection payload to the tracker
-        self.tracker_sock.sendto(connection_payload, (self.tracker_url, self.tracker_port))
-        # recieve the raw connection data
+    # returns true if connection id recieved from tracker can be used
+    def connection_valid(self):
+        if self.connection_id is None:
+            return False
+        return time.time() - self.connection_time < UDP_CONNECTION_ID_VALIDITY
+
+
+    # makes the request with given action to the tracker retransmitting it
+    # with exponential backoff, connection id is obtained before request
+    # when it has expired. The request is given up after the retries or
+    # the deadline (if given). returns the raw response of the request
+    def udp_request(self, action, request_payload, max_retries, deadline = None):
+        if self.tracker_address is None:
+            self.tracker_address = (gethostbyname(self.tracker_url), self.tracker_port)
+        retry = 0
+        while retry <= max_retries and (deadline is None or time.time() < deadline):
+            # get the connection id using the same retransmission timeouts
+            if not self.connection_valid():
+                raw_connection_data = self.udp_transaction(UDP_CONNECT_ACTION, UDP_PROTOCOL_ID, b'', retry, deadline)
+                if raw_connection_data is None:
+                    retry += 1
+                    continue
+                self.connection_id = self.parse_connection_response(raw_connection_data)
+                self.connection_time = time.time()
+            raw_response = self.udp_transaction(action, self.connection_id, request_payload, retry, deadline)
+            if raw_response is not None:
+                return raw_response
+            retry += 1
+        raise torrent_error('UDP tracker not responding after ' + str(retry) + ' attempts')
+
+
+    # sends the request and waits for response untill the timeout of the
+    # given retry (or the deadline), returns the raw response or None
+    def udp_transaction(self, action, connection_id, request_payload, retry, deadline = None):
+        timeout = UDP_BASE_TIMEOUT * (2 ** retry)
+        if deadline is not None:
+            timeout = max(0, min(timeout, deadline - time.time()))
+        tracker_socket = get_udp_tracker_socket()
+        transaction_id = tracker_socket.new_transaction()
         try:
-            raw_connection_data, conn = self.tracker_sock.recvfrom(2048)
-        except :
-            raise torrent_error('UDP tracker connection request failed')
-        
-        return self.parse_connection_response(raw_connection_data)
+            # first 8 bytes connection id, next 4 bytes action, next 4 bytes transaction id
+            payload = struct.pack("!QII", connection_id, action, transaction_id) + request_payload
+            tracker_socket.send(payload, self.tracker_address)
+            raw_response = tracker_socket.wait_response(transaction_id, timeout)
+        finally:
+            tracker_socket.end_transaction(transaction_id)
+        if raw_response is None:
+            error_log = self.tracker_url + ' no response for request attempt ' + str(retry + 1)
+            self.tracker_logger.log(error_log + FAILURE)
+            return None
+        # check if the response contains any error message
+        response_action = struct.unpack_from("!I", raw_response)[0]
+        if response_action == UDP_ERROR_ACTION:
+            error_msg = raw_response[8:].decode('utf-8', 'replace')
+            raise torrent_error('UDP tracker reponse error : ' + error_msg)
+        if response_action != action:
+            raise torrent_error('UDP tracker wrong response action ' + str(response_action))
+        return raw_response
 
 
     # extracts the reponse connection id send by UDP tracker
-    # function also check if tracker not send appropriate response
     def parse_connection_response(self, raw_connection_data):
         # check if it is less than 16 bytes
         if(len(raw_connection_data) < 16):
             raise torrent_error('UDP tracker wrong reponse length of connection ID !')
-        
-        # extract the reponse action : first 4 bytes
-        response_action = struct.unpack_from("!i", raw_connection_data)[0]       
-        # error reponse from tracker 
-        if response_action == 0x3:
-            error_msg = struct.unpack_from("!s", raw_connection_data, 8)
-            raise torrent_error('UDP tracker reponse error : ' + error_msg)
-        
-        # extract the reponse transaction id : next 4 bytes
-        response_transaction_id = struct.unpack_from("!i", raw_connection_data, 4)[0]
-        # compare the request and response transaction id
-        if(response_transaction_id != self.transaction_id):
-            raise torrent_error('UDP tracker wrong response transaction ID !')
-        
-        # extract the response connection id : next 8 bytes
-        reponse_connection_id = struct.unpack_from("!q", raw_connection_data, 8)[0]
-        return reponse_connection_id
+        # extract the response connection id : last 8 bytes
+        return struct.unpack_from("!Q", raw_connection_data, 8)[0]
 
 
-    # returns the annouce request payload
+    # returns the annouce request payload following the request header
     def build_announce_payload(self):
-        # action = 1 (annouce)
-        self.action = 0x1            
-        # first 8 bytes connection_id
-        announce_payload =  struct.pack("!q", self.connection_id)    
-        # next 4 bytes is action
-        announce_payload += struct.pack("!i", self.action)  
-        # next 4 bytes is transaction id
-        announce_payload += struct.pack("!i", self.transaction_id)  
-        # next 20 bytes the info hash string of the torrent 
-        announce_payload += struct.pack("!20s", self.request_parameters['info_hash'])
+        # 20 bytes the info hash string of the torrent 
+        announce_payload  = struct.pack("!20s", self.request_parameters['info_hash'])
         # next 20 bytes the peer_id 
         announce_payload += struct.pack("!20s", self.request_parameters['peer_id'])         
         # next 8 bytes the number of bytes downloaded
@@ -279,59 +480,24 @@ class udp_torrent_tracker(tracker_data):
         announce_payload += struct.pack("!q", self.request_parameters['left'])
         # next 8 bytes the number of bytes uploaded 
         announce_payload += struct.pack("!q", self.request_parameters['uploaded']) 
-        # event 2 denotes start of downloading
-        announce_payload += struct.pack("!i", 0x2) 
+        # event : 0 none, 1 completed, 2 started, 3 stopped
+        announce_payload += struct.pack("!I", UDP_ANNOUNCE_EVENTS[self.request_parameters['event']])
         # your IP address, set this to 0 if you want the tracker to use the sender
-        announce_payload += struct.pack("!i", 0x0) 
-        # some random key
-        announce_payload += struct.pack("!i", int(rd.randrange(0, 255)))
-        # number of peers require, set this to -1 by defualt
-        announce_payload += struct.pack("!i", -1)                   
+        announce_payload += struct.pack("!I", 0x0) 
+        # key identifying the client
+        announce_payload += struct.pack("!I", self.key)
+        # number of peers required from the tracker
+        announce_payload += struct.pack("!i", self.request_parameters['numwant'])
         # port on which response will be sent 
         announce_payload += struct.pack("!H", self.request_parameters['port'])   
-        # extension is by default 0x2 which is request string
-        # announce_payload += struct.pack("!H", 0x2)
         return announce_payload
 
-
-    # recieves the announce reponse from the tracker
-    # UDP beign an unreliable protocol the function attemps 
-    # some trails for requests the annouce response 
-    def udp_announce_request(self, announce_payload):
-        raw_announce_data = None
-        trails = 0
-        while(trails < 8):
-            # try connection request after some interval of time
-            try:
-                self.tracker_sock.sendto(announce_payload, (self.tracker_url, self.tracker_port))    
-                # recieve the raw announce data
-                raw_announce_data, conn = self.tracker_sock.recvfrom(2048)
-                break
-            except:
-                error_log = self.tracker_url + ' failed announce request attempt ' + str(trails + 1)
-                self.tracker_logger.log(error_log + FAILURE)
-            trails = trails + 1
-        return raw_announce_data
-
     
     # parses the UDP tracker annouce response 
     def parse_udp_tracker_response(self, raw_announce_reponse):
         if(len(raw_announce_reponse) < 20):
             raise torrent_error('Invalid response length in announcing!')
         
-        # first 4 bytes is action
-        response_action = struct.unpack_from("!i", raw_announce_reponse)[0]     
-        # next 4 bytes is transaction id
-        response_transaction_id = struct.unpack_from("!i", raw_announce_reponse, 4)[0]
-        # compare for the transaction id
-        if response_transaction_id != self.transaction_id:
-            raise torrent_error('The transaction id in annouce response do not match')
-        
-        # check if the response contains any error message
-        if response_action != 0x1:
-            error_msg = struct.unpack_from("!s", raw_announce_reponse, 8)
-            raise torrent_error("Error while annoucing: %s" % error_msg)
-
         offset = 8
         # interval : specifies minimum time client show wait for sending next request 
         self.interval = struct.unpack_from("!i", raw_announce_reponse, offset)[0]
@@ -346,19 +512,21 @@ class udp_torrent_tracker(tracker_data):
         
         offset = offset + 4
         # obtains the peers list of (peer IP, peer port)
-        self.peers_list = []
-        while(offset != len(raw_announce_reponse)):
-            # raw data of peer IP, peer port
-            raw_peer_data = raw_announce_reponse[offset : offset + 6]    
-
-            # extract the peer IP address 
-            peer_IP = ".".join(str(int(a)) for a in raw_peer_data[0:4])
-            # extract the peer port number
-            peer_port = raw_peer_data[4] * 256 + raw_peer_data[5]
-               
-            # append to IP, port tuple to peer list
-            self.peers_list.append((peer_IP, peer_port))
-            offset = offset + 6
+        self.peers_list = parse_compact_peers(memoryview(raw_announce_reponse)[offset:])
+
+
+    # scrapes the UDP tracker for the swarm of torrent, returns dictionary of
+    # seeders, completed and leechers else None if tracker doesn't respond
+    def scrape(self):
+        scrape_payload = struct.pack("!20s", self.request_parameters['info_hash'])
+        try:
+            raw_scrape_response = self.udp_request(UDP_SCRAPE_ACTION, scrape_payload, UDP_SHORT_RETRIES,
+                                                   time.time() + UDP_SHORT_DEADLINE)
+            seeders, completed, leechers = struct.unpack_from("!iii", raw_scrape_response, 8)
+        except (OSError, struct.error, torrent_error) as error_msg:
+            self.tracker_logger.log(self.tracker_url + ' scrape ' + str(error_msg) + FAILURE)
+            return None
+        return {'seeders' : seeders, 'completed' : completed, 'leechers' : leechers}
 
 
     # API function for creating the getting the peer data recivied by UDP tracker
@@ -368,10 +536,6 @@ class udp_torrent_tracker(tracker_data):
         return peer_data
        
     
-    # ensure that socket used for tracker request is closed
-    def __exit__(self):
-        self.tracker_sock.close()
-
     
     # logs the information obtained by the HTTP tracker 
     def __str__(self):
@@ -387,19 +551,27 @@ class udp_torrent_tracker(tracker_data):
         # number of seeders
         tracker_table.rows.append(['Number of seeders', str(self.seeders)])
         # number of peers recieved
-        peer_data  = '(' + self.peers_list[0][0] + ' : '
-        peer_data += str(self.peers_list[0][1]) + ')\n'
-        peer_data += '... ' + str(len(self.peers_list) - 1) + ' more peers'
+        peer_data = 'No peers recieved'
+        if self.peers_list:
+            peer_data  = '(' + self.peers_list[0][0] + ' : '
+            peer_data += str(self.peers_list[0][1]) + ')\n'
+            peer_data += '... ' + str(len(self.peers_list) - 1) + ' more peers'
         tracker_table.rows.append(['Peers in swarm', peer_data])
 
         return str(tracker_table)
 
 
 
+# time for which trackers are scraped (seconds)
+TRACKER_SCRAPE_TIMEOUT = 10
+# time for which client waits for the first tracker response (seconds)
+TRACKER_RESPONSE_TIMEOUT = UDP_STARTED_DEADLINE
+
 """
     Torrent tracker class helps then client to connect to any of the trackers
     provided. Note it will identify http or udp trackers and will communicate
-    with them accordingly
+    with them accordingly. All the trackers are announced concurrently and the
+    peers recieved from the trackers are merged without duplicates
 """
 class torrent_tracker():
 
@@ -425,35 +597,126 @@ class torrent_tracker():
             # classify HTTP and UDP torrent trackers
             if 'http' in tracker_url[:4]:
                 tracker = http_torrent_tracker(torrent, tracker_url)
-            if 'udp' in tracker_url[:4]:
+            elif 'udp' in tracker_url[:4]:
                 tracker = udp_torrent_tracker(torrent, tracker_url)
+            else:
+                self.trackers_logger.log('Unsupported tracker ' + tracker_url + ' ' + FAILURE)
+                continue
             # append the tracker class instance 
             self.trackers_list.append(tracker)
             # append the connection status 
             self.trackers_connection_status.append(self.connection_not_attempted)
 
+        # peers recieved from all the trackers : (peer IP, peer port)
+        self.peers_list = []
+        self.known_peers = set([])
+        # function called with new peers recieved from the trackers
+        self.peers_listener = None
+        # lock for merging the peers recieved by the tracker threads
+        self.trackers_lock = Lock()
+
     # the torrent tracker requests for the list of peers 
-    # Note : function attempts to connect to tracker for given all the tracker
-    #        instances and any tracker url reponse is recieved that is retunred
+    # Note : function announces all the trackers concurrently and returns
+    #        the first tracker that responds (None if no tracker responds
+    #        within the timeout), the trackers responding later add their
+    #        peers in the merged peers given to the peers listener
     def request_connection(self):
-        # attempts connecting with any of the tracker obtained in the list
-        for i, tracker in enumerate(self.trackers_list):
-            # check if you can request for torrent information 
-            if(tracker.request_torrent_information()):
-                self.trackers_connection_status[i] = self.connection_success
+        tracker_responses = queue.Queue()
+        for tracker_index in range(len(self.trackers_list)):
+            tracker_thread = Thread(target = self.announce_tracker, 
+                                    args = (tracker_index, tracker_responses), daemon = True)
+            tracker_thread.start()
+
+        # wait for the first tracker which responds successfully with peers
+        response_deadline = time.time() + TRACKER_RESPONSE_TIMEOUT
+        for _ in range(len(self.trackers_list)):
+            try:
+                tracker, tracker_status = tracker_responses.get(timeout = max(response_deadline - time.time(), 0))
+            except queue.Empty:
+                self.trackers_logger.log('Trackers not responded within ' + str(TRACKER_RESPONSE_TIMEOUT) + ' seconds')
+                break
+            if tracker_status and self.client_tracker is None:
+                self.client_tracker = tracker
+            if tracker_status and tracker.get_peers_data()['peers']:
                 self.client_tracker = tracker
                 break
-            else:
-                self.trackers_connection_status[i] = self.connection_failure
         
         # log the information about connecting to trackers
         self.trackers_logger.log(str(self))
         
         # returns tracker instance for which successful connection was established
         return self.client_tracker
+
+    # announces the tracker at given index and merges the peers recieved
+    def announce_tracker(self, tracker_index, tracker_responses):
+        tracker = self.trackers_list[tracker_index]
+        tracker_status = tracker.request_torrent_information()
+        with self.trackers_lock:
+            if tracker_status:
+                self.trackers_connection_status[tracker_index] = self.connection_success
+                new_peers = self.merge_peers(tracker.get_peers_data()['peers'])
+            else:
+                self.trackers_connection_status[tracker_index] = self.connection_failure
+                new_peers = []
+            peers_listener = self.peers_listener
+        # new peers are given to the listener before the response is reported
+        if peers_listener is not None and new_peers:
+            peers_listener(new_peers)
+        tracker_responses.put((tracker, tracker_status))
+
+    # returns the trackers which responded successfully to the announce
+    def responding_trackers(self):
+        with self.trackers_lock:
+            return [tracker for tracker, status in zip(self.trackers_list, self.trackers_connection_status)
+                    if status == self.connection_success]
+
+    # adds the peers in merged peers list, returns peers not recieved earlier
+    def merge_peers(self, peers):
+        new_peers = []
+        for peer_address in peers:
+            if peer_address not in self.known_peers:
+                self.known_peers.add(peer_address)
+                self.peers_list.append(peer_address)
+                new_peers.append(peer_address)
+        return new_peers
+
+    # scrapes the given trackers (all trackers by default) concurrently, returns
+    # list of (tracker, scrape) sorted by peers in swarm, healthiest swarm first
+    def scrape_trackers(self, trackers = None):
+        if trackers is None:
+            trackers = self.trackers_list
+        scrape_responses = queue.Queue()
+        for tracker in trackers:
+            scrape_thread = Thread(target = lambda tracker = tracker : scrape_responses.put((tracker, tracker.scrape())),
+                                   daemon = True)
+            scrape_thread.start()
         
+        tracker_scrapes = []
+        scrape_deadline = time.time() + TRACKER_SCRAPE_TIMEOUT
+        for _ in range(len(trackers)):
+            try:
+                tracker, scrape = scrape_responses.get(timeout = max(scrape_deadline - time.time(), 0))
+            except queue.Empty:
+                break
+            if scrape is not None:
+                tracker_scrapes.append((tracker, scrape))
+        
+        tracker_scrapes.sort(key = lambda tracker_scrape : (tracker_scrape[1]['seeders'], 
+                                                            tracker_scrape[1]['leechers']), reverse = True)
+        # used for EXCECUTION LOGGING
+        for tracker, scrape in tracker_scrapes:
+            self.trackers_logger.log('Scrape ' + tracker.tracker_url + ' : ' + str(scrape))
+        return tracker_scrapes
+
+    # adds the function which is given the peers recieved from all trackers,
+    # the peers merged so far are given immediately
+    def add_peers_listener(self, peers_listener):
+        with self.trackers_lock:
+            self.peers_listener = peers_listener
+            merged_peers = list(self.peers_list)
+        if merged_peers:
+            peers_listener(merged_peers)
 
-    
     # logs the tracker connections information 
     def __str__(self):
         trackers_table = BeautifulTable()
@@ -493,7 +756,7 @@ class torrent_tracker():
             if not_attempted_tracker_url_count > 1:
                 not_attempted_log += '\n ... ' + str(not_attempted_tracker_url_count)
                 not_attempted_log += ' connections '
-            trackers_table.rows.append([not_attempted_log, 'not attempted connection '])
+            trackers_table.rows.append([not_attempted_log, 'connection in progress '])
 
         return str(trackers_table)
 
@@ -0,0 +1,180 @@
+from threading import *
+
+# torrent logger module for execution logging
+from torrent_logger import *
+
+# torrent error module for handling the exception
+from torrent_error import *
+
+# announce events sent to the tracker
+from tracker import COMPLETED_EVENT, STOPPED_EVENT
+
+"""
+    Tracker announcer periodically reannounces the client to the tracker in
+    a background thread, after the interval given by the tracker (and not
+    before the min interval). Every announce contains the bytes uploaded,
+    downloaded and left of the torrent, and the new peers recieved from the
+    tracker are merged into the swarm. The completed and stopped events are
+    announced once the download completes and when client stops.
+
+    Every tracker that responded is announced concurrently (the tiers of the
+    announce list are flattened into the trackers of torrent), the interval
+    is given by the primary tracker which responded first to the client. The
+    responding trackers are scraped after every announce and the tracker with
+    the healthiest swarm (most seeders, then leechers) becomes the primary.
+
+    Note that tracker may be given to the announcer after it is started (when
+    client restarts from the cached peers the trackers respond in background)
+"""
+
+# interval used if the tracker does not give any interval (seconds)
+DEFAULT_ANNOUNCE_INTERVAL = 1800
+# time for which stopped announce waits for the ongoing announce (seconds)
+STOPPED_ANNOUNCE_TIMEOUT = 10
+
+class tracker_announcer():
+
+    def __init__(self, trackers, tracker, transfer_statistics, add_peers):
+        # torrent trackers, all the responding trackers are announced
+        self.trackers = trackers
+        # primary tracker giving the announce interval
+        self.tracker = tracker
+        # event set once the tracker to be announced is known
+        self.tracker_event = Event()
+        if tracker is not None:
+            self.tracker_event.set()
+        # function returning bytes (uploaded, downloaded, left) of torrent
+        self.transfer_statistics = transfer_statistics
+        # function adding the peers recieved from tracker in the swarm
+        self.add_peers = add_peers
+
+        # event set when the announcer is stopped
+        self.stop_event = Event()
+        # thread periodically announcing to the tracker
+        self.announcer_thread = Thread(target = self.run, name = 'tracker_announcer', daemon = True)
+        # only one announce request is made at a time to a tracker
+        self.announce_locks = {}
+        self.announce_locks_lock = Lock()
+
+        # announcer logger
+        self.announcer_logger = torrent_logger('tracker announcer', TRACKER_LOG_FILE, DEBUG)
+
+    """
+        function returns the time after which tracker must be announced
+    """
+    def announce_interval(self):
+        interval = self.tracker.interval or DEFAULT_ANNOUNCE_INTERVAL
+        if self.tracker.min_interval:
+            interval = max(interval, self.tracker.min_interval)
+        return interval
+
+    """
+        function announces the client to all the responding trackers with
+        given event, returns true if any of the trackers responded
+    """
+    def announce(self, event = None):
+        if self.tracker is None:
+            self.announcer_logger.log('Announce (event : ' + str(event) + ') no tracker responded ' + FAILURE)
+            return False
+        trackers = self.trackers.responding_trackers() or [self.tracker]
+        announce_status = [False] * len(trackers)
+        announce_threads = []
+        for tracker_index in range(len(trackers)):
+            announce_thread = Thread(target = self.announce_tracker, name = 'tracker_announce',
+                                     args = (trackers[tracker_index], event, announce_status, tracker_index),
+                                     daemon = True)
+            announce_thread.start()
+            announce_threads.append(announce_thread)
+        for announce_thread in announce_threads:
+            announce_thread.join()
+        return any(announce_status)
+
+    """
+        function announces the client to tracker with given event, the peers
+        recieved in the response are added in the swarm
+    """
+    def announce_tracker(self, tracker, event, announce_status, tracker_index):
+        with self.announce_locks_lock:
+            announce_lock = self.announce_locks.setdefault(tracker, Lock())
+        # stopped event doesn't wait for long on tracker being announced
+        lock_timeout = STOPPED_ANNOUNCE_TIMEOUT if event == STOPPED_EVENT else -1
+        if not announce_lock.acquire(timeout = lock_timeout):
+            self.announcer_logger.log('Announce (event : ' + str(event) + ') ' + tracker.tracker_url + 
+                                      ' busy ' + FAILURE)
+            return
+        try:
+            uploaded, downloaded, left = self.transfer_statistics()
+            tracker.update_request_parameters(uploaded, downloaded, left, event)
+            tracker_status = tracker.request_torrent_information()
+            peers = tracker.get_peers_data()['peers'] if tracker_status else []
+        finally:
+            announce_lock.release()
+        # used for EXCECUTION LOGGING
+        announce_log  = 'Announce ' + tracker.tracker_url + ' (event : ' + str(event) 
+        announce_log += ', uploaded : ' + str(uploaded) + ', downloaded : ' + str(downloaded) 
+        announce_log += ', left : ' + str(left) + ') '
+        if not tracker_status:
+            self.announcer_logger.log(announce_log + FAILURE)
+            return
+        if event != STOPPED_EVENT:
+            self.add_peers(peers)
+        self.announcer_logger.log(announce_log + 'recieved ' + str(len(peers)) + ' peers ' + SUCCESS)
+        announce_status[tracker_index] = True
+
+    """
+        announcer thread reannounces after every interval untill stopped
+    """
+    def run(self):
+        while not self.tracker_event.wait(1):
+            if self.stop_event.is_set():
+                return
+        self.select_tracker()
+        while not self.stop_event.wait(self.announce_interval()):
+            self.announce()
+            self.select_tracker()
+
+    """
+        function scrapes the responding trackers and makes the tracker with
+        healthiest swarm the primary tracker giving the announce interval
+    """
+    def select_tracker(self):
+        responding_trackers = self.trackers.responding_trackers()
+        if len(responding_trackers) < 2:
+            return
+        for tracker, scrape in self.trackers.scrape_trackers(responding_trackers):
+            if tracker is not self.tracker:
+                # used for EXCECUTION LOGGING
+                self.announcer_logger.log('Primary tracker ' + tracker.tracker_url + ' (seeders : ' + 
+                                          str(scrape['seeders']) + ', leechers : ' + 
+                                          str(scrape['leechers']) + ') ' + SUCCESS)
+                self.tracker = tracker
+            return
+
+    """
+        function gives the primary tracker to the announcer, the other
+        responding trackers are announced along with it
+    """
+    def set_tracker(self, tracker):
+        self.tracker = tracker
+        self.tracker_event.set()
+
+    """
+        starts the periodic announcing, the started event is sent by the
+        first announce made by client while contacting the trackers
+    """
+    def start(self):
+        self.announcer_thread.start()
+
+    """
+        function announces the trackers that download is completed
+    """
+    def completed(self):
+        return self.announce(COMPLETED_EVENT)
+
+    """
+        function stops the periodic announcing and announces the trackers
+        that client has stopped
+    """
+    def stop(self):
+        self.stop_event.set()
+        return self.announce(STOPPED_EVENT)